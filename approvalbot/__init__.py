@@ -23,6 +23,18 @@ Copyright::
     |                                                   |
     +===================================================+
 """
-from approvalbot.bot import *
+import importlib
 from approvalbot.core import *
 from approvalbot.objects import MessageStore
+
+
+def __getattr__(name: str):
+    # approvalbot.bot builds the Discord client, and imports discord-py-interactions, which is slow - so it's
+    # only imported the first time something from it is used, e.g. ``from approvalbot import run``
+    if name.startswith('__'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    bot = importlib.import_module('approvalbot.bot')
+    try:
+        return getattr(bot, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
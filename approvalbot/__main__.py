@@ -20,7 +20,7 @@ Copyright::
     |                                                   |
     +===================================================+
 """
-from approvalbot.bot import bot
+from approvalbot.bot import run
 
 if __name__ == '__main__':
-    bot.start()
+    run()
@@ -20,14 +20,16 @@ Copyright::
     |                                                   |
     +===================================================+
 """
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from decimal import ROUND_UP, Decimal
 import math
-from typing import Union
-from privex.helpers import dec_round, empty, empty_if, DictObject
-from approvalbot.core import load_config, save_config
-from approvalbot.objects import MessageStore, ApprovalsDB, auto_relative, default_endtime, ApprovalOutcome, Approval, get_relative_seconds, now_plus_minutes, datetime_to_unix
-from approvalbot import settings
+from typing import Awaitable, Dict, List, NamedTuple, Optional, Tuple, TypeVar, Union
+import time
+from privex.helpers import convert_datetime, dec_round, empty, empty_if, DictObject
+from approvalbot.core import init, load_config, save_config, asave_config, guild_config, CONFIG_WRITER
+from approvalbot.objects import MessageStore, TTLCache, ApprovalsDB, auto_relative, default_endtime, ApprovalOutcome, Approval, RoleIndex, VoteChoice, VoteDispatcher, EditCoalescer, ExpiryScheduler, get_relative_seconds, now_plus_minutes, datetime_to_unix, snowflake_to_unix
+from approvalbot import metrics, settings, tracing
+from approvalbot.shared import FINALIZE_CLAIM_TTL, get_state
 from approvalbot.settings import CONFIG, SERVER_IDS, TOKEN, VERSION, GH_URL
 import interactions
 import logging
@@ -35,18 +37,105 @@ import logging
 
 log = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 CommandContext = interactions.context.CommandContext
 ComponentContext = interactions.context.ComponentContext
 
-bot = interactions.Client(token=TOKEN)
+if settings.SHARD_COUNT > 0:
+    bot = interactions.Client(token=TOKEN, shards=[settings.SHARD_ID, settings.SHARD_COUNT])
+else:
+    bot = interactions.Client(token=TOKEN)
+
+PERM_CACHE = TTLCache(maxsize=settings.PERM_CACHE_SIZE, ttl=settings.PERM_CACHE_TTL)
+"""
+Caches whether a user is a Discord Server Administrator, keyed by ``(guild_id, user_id)``.
+
+Shared by every command/button which checks for admin rights, so that a vote click doesn't need
+a fresh ``get_guild_permissions`` lookup for each check. Entries are invalidated by the
+member/role update gateway events below, or otherwise expire after ``PERM_CACHE_TTL`` seconds.
+"""
+
+GUILD_ROLES: Dict[Optional[int], RoleIndex] = {}
+"""
+Each Discord server's moderator/admin lists and majority threshold from it's :func:`.guild_config`, keyed by
+server ID - built by :func:`.roles_for` the first time they're needed, and dropped by :func:`.config_changed`
+whenever a command changes that server's config.
+"""
+
+
+def roles_for(guild_id: Optional[Union[int, str]] = None) -> RoleIndex:
+    """Get the :class:`.RoleIndex` for the Discord server ``guild_id`` (``None`` - the top-level ``CONFIG``)"""
+    guild_id = None if empty(guild_id) else int(guild_id)
+    roles = GUILD_ROLES.get(guild_id)
+    if roles is None:
+        roles = GUILD_ROLES[guild_id] = RoleIndex(guild_config(guild_id))
+        log.debug("Built role index for server %s: %s", guild_id, roles)
+    return roles
+
+
+async def config_changed(guild_id: Optional[Union[int, str]] = None):
+    """
+    Drop the cached :class:`.RoleIndex` for ``guild_id`` (or every server's, if it's ``None``) after
+    it's config was changed, and schedule the config to be saved - with the shared state backend, the
+    server's config is also published to the other bot processes
+    """
+    if empty(guild_id):
+        GUILD_ROLES.clear()
+    else:
+        GUILD_ROLES.pop(int(guild_id), None)
+        state = get_state()
+        if state is not None:
+            await state.publish_config(guild_id)
+    await asave_config()
+
+
+async def _remote_config_changed(guild_id: int):
+    """Called when another bot process changed ``guild_id``'s config, after it's been re-loaded from the shared state"""
+    GUILD_ROLES.pop(guild_id, None)
+    await asave_config()
+
 
 @bot.event
 async def on_ready():
-    log.debug(f"Bot ready. Server IDs: {SERVER_IDS}")
+    log.debug("Bot ready. Server IDs: %s", SERVER_IDS)
     log.debug("Creating tables + indexes im sqlite")
-    log.debug("Result from create_schemas:", await ApprovalsDB().create_schemas())
+    adb = ApprovalsDB()
+    log.debug("Result from create_schemas: %s", await adb.create_schemas())
+    ended_after = datetime.utcnow().astimezone(tz=timezone.utc) - timedelta(seconds=settings.EXPIRY_LOOKBACK)
+    for row in await adb.get_unfinalized(ended_after):
+        EXPIRY.add(row['id'], datetime_to_unix(convert_datetime(row['end_time'])))
+    log.debug("Scheduled %s unfinalized approval(s) for expiry", len(EXPIRY))
+    state = get_state()
+    if state is not None:
+        loaded = await state.load_configs()
+        GUILD_ROLES.clear()
+        await state.listen(_remote_config_changed, EXPIRY.add)
+        log.info("Using shared state at %s - loaded config for %s server(s)", settings.STATE_REDIS_URL, len(loaded))
+    await metrics.start_server()
     print("Ready!")
 
+@bot.event
+async def on_guild_member_update(member: interactions.GuildMember):
+    PERM_CACHE.remove((int(member.guild_id), int(member.id)))
+
+@bot.event
+async def on_guild_member_remove(member: interactions.GuildMember):
+    PERM_CACHE.remove((int(member.guild_id), int(member.id)))
+
+def _invalidate_guild_perms(role: interactions.GuildRole):
+    guild_id = int(role.guild_id)
+    removed = PERM_CACHE.remove_where(lambda k: k[0] == guild_id)
+    log.debug("Roles changed in guild %s - removed %s cached permission entries", guild_id, removed)
+
+@bot.event
+async def on_guild_role_update(role: interactions.GuildRole):
+    _invalidate_guild_perms(role)
+
+@bot.event
+async def on_guild_role_delete(role: interactions.GuildRole):
+    _invalidate_guild_perms(role)
+
 # guild_ids = [789032594456576001] # Put your server ID in this array.
 
 @bot.command(name="ping", scope=SERVER_IDS, description="Test that the bot is working and check for any latency issues")
@@ -63,7 +152,9 @@ async def get_version(ctx: Union[CommandContext, ComponentContext]):
     """)
 
 
-def template_approve(action: str, post: str, reason:str, sender: str = "", approvals: int = 0, disapprovals: int = 0, expires_at: datetime = None, db_id=None) -> interactions.Embed:
+def request_embed(action: str, post: str, reason: str, sender: str = "", expires_at: datetime = None, db_id=None,
+                  outcome: ApprovalOutcome = None) -> interactions.Embed:
+    """The first embed of a poll message - the details of the approval request, which don't change while voting"""
     # time_left = auto_relative(datetime.utcnow(), expires_at)
     relsecs = get_relative_seconds(datetime.utcnow(), expires_at)
     expires_at_unix = datetime_to_unix(expires_at)
@@ -71,125 +162,284 @@ def template_approve(action: str, post: str, reason:str, sender: str = "", appro
     time_left = f"<t:{expires_at_unix}:R>"
     if relsecs < 0:
         time_left = "ENDED"
-    
+    fields = [
+        # interactions.EmbedField(name="Requested by", value=f"{sender}"),
+        interactions.EmbedField(name="Desired Action", value=f"{action}"),
+        interactions.EmbedField(name="Post", value=f"{post}"),
+        interactions.EmbedField(name="Reason for Action", value=f"{reason}"),
+        interactions.EmbedField(name="Voting ends at:", value=f"{'n/a' if expires_at is None else expires_at_dsc}"),
+        interactions.EmbedField(name="Time left (updated after each vote):", value=time_left),
+    ]
+    if outcome is not None:
+        fields.append(interactions.EmbedField(name="Final outcome", value=outcome.value.replace('_', ' ')))
+
+    return interactions.Embed(
+        title=f"Moderator Approval Request (ID: {db_id})",
+        # description=f"""
+        # Moderator Approval request
+
+        # Requested by: {sender}
+        # Post: {post}
+        # Desired Action: {action}
+        # Reason for action: {reason}
+
+        # Approvals: {approvals}
+        # Disapprovals: {disapprovals}
+        # """,
+        color=interactions.Color.yellow(),
+        author=interactions.EmbedAuthor(name=f"Requested by: {sender}"),
+        fields=fields,
+        # footer=interactions.EmbedFooter(
+        #     text=f"Approvals: {approvals}\nDisapprovals: {disapprovals}"
+        # )
+    )
+
+
+def tally_embeds(approvals: int = 0, disapprovals: int = 0) -> List[interactions.Embed]:
+    """The approval / disapproval count embeds shown below a poll's :func:`.request_embed`"""
     return [
-        interactions.Embed(
-            title=f"Moderator Approval Request (ID: {db_id})",
-            # description=f"""
-            # Moderator Approval request
-
-            # Requested by: {sender}
-            # Post: {post}
-            # Desired Action: {action}
-            # Reason for action: {reason}
-
-            # Approvals: {approvals}
-            # Disapprovals: {disapprovals}
-            # """,
-            color=interactions.Color.yellow(),
-            author=interactions.EmbedAuthor(name=f"Requested by: {sender}"),
-            fields=[
-                # interactions.EmbedField(name="Requested by", value=f"{sender}"),
-                interactions.EmbedField(name="Desired Action", value=f"{action}"),
-                interactions.EmbedField(name="Post", value=f"{post}"),
-                interactions.EmbedField(name="Reason for Action", value=f"{reason}"),
-                interactions.EmbedField(name="Voting ends at:", value=f"{'n/a' if expires_at is None else expires_at_dsc}"),
-                interactions.EmbedField(name="Time left (updated after each vote):", value=time_left),
-            ],
-            # footer=interactions.EmbedFooter(
-            #     text=f"Approvals: {approvals}\nDisapprovals: {disapprovals}"
-            # )
-        ),
         interactions.Embed(
             title="Approvals", description=f"{approvals}", color=interactions.Color.green()
         ),
         interactions.Embed(
             title="Disapprovals", description=f"{disapprovals}", color=interactions.Color.red()
         )
-    
     ]
 
 
+@metrics.timed(metrics.STEP_SECONDS, 'template_approve')
+def template_approve(action: str, post: str, reason:str, sender: str = "", approvals: int = 0, disapprovals: int = 0, expires_at: datetime = None, db_id=None,
+                     outcome: ApprovalOutcome = None) -> List[interactions.Embed]:
+    return [
+        request_embed(action, post, reason, sender, expires_at, db_id=db_id, outcome=outcome),
+        *tally_embeds(approvals, disapprovals)
+    ]
+
+
+class PollRenderer:
+    """
+    Renders the edit payload for a poll message after a vote. The request embed never changes while a poll is open
+    (the time left is a Discord relative timestamp), so it's serialized once per approval and the same dict is reused
+    for every edit - only the two tally embeds depend on the vote counts, and those are copies of a serialized
+    template with just their counts replaced.
+
+    The payload only holds ``embeds`` - the buttons and the rest of the message are left as they are.
+
+    Usage::
+
+        >>> payload = RENDERER.votes_payload(aprv)
+        >>> await bot._http.edit_interaction_response(payload, ctx.token, str(ctx.application_id))
+
+    """
+    def __init__(self, maxsize: int = 500):
+        self._requests = TTLCache(maxsize=maxsize, ttl=settings.DEFAULT_APPROVAL_END)
+        self._tallies: Optional[Tuple[dict, dict]] = None
+
+    def request_json(self, aprv: Approval) -> dict:
+        """The serialized :func:`.request_embed` for ``aprv``, built on first use and kept until voting ends"""
+        data = self._requests.get(aprv.id)
+        if data is None:
+            data = request_embed(aprv.action, aprv.url, aprv.reason, aprv.username, aprv.end_time, db_id=aprv.id)._json
+            ttl = datetime_to_unix(aprv.end_time) - time.time()
+            self._requests.set(aprv.id, data, ttl=max(ttl, 60))
+        return data
+
+    @metrics.timed(metrics.STEP_SECONDS, 'render_votes')
+    def votes_payload(self, aprv: Approval) -> dict:
+        if self._tallies is None:
+            self._tallies = tuple(e._json for e in tally_embeds())
+        approvals, disapprovals = self._tallies
+        return dict(embeds=[
+            self.request_json(aprv),
+            dict(approvals, description=str(aprv.approvals)), dict(disapprovals, description=str(aprv.disapprovals)),
+        ])
+
+    def forget(self, approval_id: int):
+        """Drop the cached request embed for ``approval_id`` - e.g. once it's been finalized"""
+        self._requests.remove(approval_id)
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+
+RENDERER = PollRenderer(maxsize=settings.APPROVAL_CACHE_SIZE)
+"""Renders poll message edits after votes, reusing each poll's serialized request embed - see :class:`.PollRenderer`"""
+
+class AuthContext:
+    """
+    Resolves the calling user's identity and roles once per interaction, so that command/button
+    handlers don't need to rebuild the ``username#discriminator`` string, re-scan the moderator/admin
+    lists, or re-await the server admin check for every permission test.
+
+    Usage::
+
+        >>> auth = await AuthContext.from_ctx(ctx)
+        >>> auth.user
+        'SomeUser#1234'
+        >>> if not auth.is_admin_mod:
+        ...     return await ctx.send("ERROR: You must be a bot moderator or server admin!", ephemeral=True)
+
+    """
+    user: str
+    """The calling user as ``username#discriminator``"""
+    is_server_admin: bool
+    """``True`` if the calling user is a Discord Server Administrator"""
+    is_local_admin: bool
+    """``True`` if the calling user is in the server's bot admin list (``admins``)"""
+    is_moderator: bool
+    """``True`` if the calling user is in the server's bot moderator list (``moderators``)"""
+    roles: RoleIndex
+    """The :class:`.RoleIndex` for the Discord server the interaction came from"""
+
+    def __init__(self, user: str, is_server_admin: bool = False, guild_id: Optional[int] = None):
+        self.user = user
+        self.is_server_admin = is_server_admin
+        self.roles = roles_for(guild_id)
+        self.is_local_admin = self.roles.is_admin(user)
+        self.is_moderator = self.roles.is_moderator(user)
+
+    @classmethod
+    async def from_ctx(cls, ctx: Union[CommandContext, ComponentContext]) -> "AuthContext":
+        with tracing.span('auth'):
+            server_admin = await metrics.timed_call(metrics.STEP_SECONDS, 'permission_check', is_server_admin(ctx))
+            return cls(f"{ctx.user.username}#{ctx.user.discriminator}", server_admin, ctx.guild_id)
+
+    @property
+    def is_admin(self) -> bool:
+        """``True`` if the calling user is either a server admin, or in the bot's admin list"""
+        return self.is_server_admin or self.is_local_admin
+
+    @property
+    def is_admin_mod(self) -> bool:
+        """``True`` if the calling user is either an admin or a moderator"""
+        return self.is_admin or self.is_moderator
+
+    @property
+    def can_vote(self) -> bool:
+        """
+        ``True`` if the calling user is allowed to vote - moderators can always vote, while admins
+        who aren't moderators can only vote when ``admins_can_vote`` is enabled
+        """
+        return self.is_moderator or (self.roles.admins_can_vote and self.is_admin)
+
+    def __repr__(self) -> str:
+        return f"<AuthContext {self.user=} {self.is_server_admin=} {self.is_local_admin=} {self.is_moderator=} />"
+
+
 async def is_admin_mod(ctx: Union[CommandContext, ComponentContext]) -> bool:
     """Returns :bool:`True` if the calling user is either an admin or a moderator"""
-    return (await is_admin(ctx)) or is_moderator(ctx)
+    return (await AuthContext.from_ctx(ctx)).is_admin_mod
 
-def is_local_admin(n: Union[CommandContext, ComponentContext, str]) -> bool:
+def is_local_admin(n: Union[CommandContext, ComponentContext, str], guild_id: Optional[int] = None) -> bool:
     """
-    Returns :bool:`True` if the passed username `n` is an admin in the CONFIG
+    Returns :bool:`True` if the passed username `n` is an admin in the config for server ``guild_id``
     
-    if `n` is a context object, returns True if the calling user is a an admin in the CONFIG
+    if `n` is a context object, returns True if the calling user is a an admin in the config for the context's server
     """
     if isinstance(n, (CommandContext, ComponentContext)):
-        n = f"{n.user.username}#{n.user.discriminator}"
+        n, guild_id = f"{n.user.username}#{n.user.discriminator}", n.guild_id
     
-    return n in CONFIG.get('admins', [])
+    return roles_for(guild_id).is_admin(n)
 
 async def is_admin(ctx: Union[CommandContext, ComponentContext]) -> bool:
-    return (await is_server_admin(ctx)) or is_local_admin(ctx)
+    return (await AuthContext.from_ctx(ctx)).is_admin
 
 
 async def is_server_admin(ctx: Union[CommandContext, ComponentContext]) -> bool:
-    """Returns :bool:`True` if the calling user is a Discord Server Administrator"""
-    perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.debug("Guild perms for user %s are: %s", f"{ctx.user.username}#{ctx.user.discriminator}", perms)
-    return interactions.Permissions.ADMINISTRATOR in perms
+    """
+    Returns :bool:`True` if the calling user is a Discord Server Administrator
+
+    The result is cached in :data:`.PERM_CACHE`, so repeated checks within ``PERM_CACHE_TTL``
+    seconds don't need to look up the user's guild permissions again.
+    """
+    key = (int(ctx.guild_id), int(ctx.author.id))
+    server_admin = PERM_CACHE.get(key)
+    if server_admin is None:
+        perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
+        log.debug("Guild perms for user %s are: %s", f"{ctx.user.username}#{ctx.user.discriminator}", perms)
+        server_admin = interactions.Permissions.ADMINISTRATOR in perms
+        PERM_CACHE.set(key, server_admin)
+    return server_admin
 
 
-def is_moderator(n: Union[CommandContext, ComponentContext, str]) -> bool:
+def is_moderator(n: Union[CommandContext, ComponentContext, str], guild_id: Optional[int] = None) -> bool:
     """
-    Returns :bool:`True` if the passed username `n` is a moderator, or if `n` is a context 
-    object - True if the calling user is a moderator
+    Returns :bool:`True` if the passed username `n` is a moderator in server ``guild_id``, or if `n` is a context 
+    object - True if the calling user is a moderator in the context's server
     """
     if isinstance(n, (CommandContext, ComponentContext)):
-        n = f"{n.user.username}#{n.user.discriminator}"
+        n, guild_id = f"{n.user.username}#{n.user.discriminator}", n.guild_id
     
-    return n in CONFIG.get('moderators', [])
+    return roles_for(guild_id).is_moderator(n)
 
-def get_total_mods() -> int:
-    return len(CONFIG.get('moderators', []))
+def get_total_mods(guild_id: Optional[int] = None) -> int:
+    return len(roles_for(guild_id).moderators)
 
-def get_total_admins() -> int:
-    return len(CONFIG.get('admins', []))
+def get_total_admins(guild_id: Optional[int] = None) -> int:
+    return len(roles_for(guild_id).admins)
 
-def get_total_mods_admins() -> int:
+def get_total_mods_admins(guild_id: Optional[int] = None) -> int:
     """
-    Get total number of mods + admins, filter the combined list so only unique names so that
-    a user who's both an admin + mod isn't counted twice.
+    Get total number of mods + admins, a user who's both an admin + mod isn't counted twice.
     """
-    combo = CONFIG.get('moderators', []) + CONFIG.get('admins', [])
-    uniquecombo = set(combo)
-    return len(list(uniquecombo))
+    return len(roles_for(guild_id).mods_admins)
 
-def get_total_mods_admins_elig() -> int:
+def get_total_mods_admins_elig(guild_id: Optional[int] = None) -> int:
     """
     Return the total mods/admins that are ELIGIBLE for majority counts based on the 
     ``majority_include_admins`` / ``admins_can_vote`` settings
     """
-    log.debug("get_total_mods_admins_elig - Calculating total mods/admins that are eligible")
-    return get_total_mods_admins() if CONFIG.majority_include_admins and CONFIG.admins_can_vote else get_total_mods()
+    return roles_for(guild_id).eligible
 
-def get_majority_number() -> int:
+def get_majority_number(guild_id: Optional[int] = None) -> int:
     """
     Get the number of votes required for a majority vote, while automatically
     handling the ``majority_include_admins`` / ``admins_can_vote`` settings
     to determine whether to base it on admins + mods, or just mods
     """
-    log.debug("get_majority_number - Getting majority number")
-    if CONFIG.majority_include_admins and CONFIG.admins_can_vote:
-        log.debug("get_majority_number - Admins can vote")
-        return int(math.floor(get_total_mods_admins() / 2) + 1)
-    log.debug("get_majority_number - Admins CANNOT vote")
-    return int(math.floor(get_total_mods() / 2) + 1)
+    return roles_for(guild_id).majority
     
-async def can_vote(user: Union[CommandContext, ComponentContext, str]) -> bool:
+async def can_vote(user: Union[CommandContext, ComponentContext, str], guild_id: Optional[int] = None) -> bool:
     """
     Returns ``True`` if the user ``user`` (string or command/component context) is allowed to
     vote based on the ``admins_can_vote`` setting
     """
-    if CONFIG.admins_can_vote:
-        return await is_admin(user) if isinstance(user, (CommandContext, ComponentContext)) else is_local_admin(user)
-    return is_moderator(user)
+    if isinstance(user, (CommandContext, ComponentContext)):
+        return (await AuthContext.from_ctx(user)).can_vote
+    return AuthContext(user, guild_id=guild_id).can_vote
+
+ACK_DEADLINE: float = 3.0
+"""Discord shows "This interaction failed" if an interaction isn't responded to within this many seconds"""
+INTERACTION_LIFETIME: float = 15 * 60.0
+"""How long an interaction's token can be used for follow-up messages / edits after it was created"""
+
+
+async def acknowledge(ctx: Union[CommandContext, ComponentContext], handler: str, call: str, response: Awaitable[T]) -> T:
+    """
+    Await ``response`` - the first response to the interaction ``ctx``, e.g. ``ctx.defer()`` - recording how much
+    of Discord's :data:`.ACK_DEADLINE` was left once it was sent in :data:`.metrics.ACK_MARGIN_SECONDS`.
+
+    The interaction's age is taken from the timestamp in it's snowflake ID, so it includes the time the event
+    spent in transit before it's handler ran. Ages outside of an interaction's lifetime (e.g. the local clock is
+    badly skewed) aren't recorded.
+    """
+    with tracing.span('ack'):
+        res = await metrics.timed_call(metrics.DISCORD_SECONDS, call, response)
+    interaction_id = getattr(ctx, 'id', None)
+    if interaction_id is None:
+        return res
+    margin = ACK_DEADLINE - (time.time() - snowflake_to_unix(interaction_id))
+    if not (ACK_DEADLINE - INTERACTION_LIFETIME) < margin <= ACK_DEADLINE:
+        return res
+    metrics.ACK_MARGIN_SECONDS.observe(margin, handler)
+    tracing.annotate(ack_margin_ms=round(margin * 1000, 1))
+    if margin < 0:
+        metrics.ACK_MISSED.inc(handler)
+        log.warning("Interaction %s (%s) was acknowledged %.0fms after Discord's deadline", interaction_id, handler, -margin * 1000)
+    elif margin < settings.ACK_WARN_MARGIN:
+        log.warning("Interaction %s (%s) was acknowledged with only %.0fms to spare", interaction_id, handler, margin * 1000)
+    return res
+
 
 approve_button = interactions.Button(
     style=interactions.ButtonStyle.SUCCESS,
@@ -208,53 +458,69 @@ disapprove_button = interactions.Button(
 @interactions.option("A link to the post in question")
 @interactions.option("The reason for this action to be taken")
 @interactions.option("No more votes can be made after this many minutes")
+@metrics.timed(metrics.HANDLER_SECONDS, 'approval')
+@tracing.traced('approval')
 async def approval(ctx: interactions.CommandContext, action: str, post: str, reason: str, expire_minutes: int = settings.DEFAULT_APPROVAL_END / 60):
     """
     /approval - Create an approval request for moderators/admins to vote on
     """
-    full_user = f"{ctx.user.username}#{ctx.user.discriminator}"
-    log.debug("/approval called - checking if user is admin/mod")
-    if not await is_admin_mod(ctx):
+    auth = await AuthContext.from_ctx(ctx)
+    full_user = auth.user
+    tracing.annotate(user=full_user)
+    if not auth.is_admin_mod:
         log.info("Rejected user %s from running command /approval as they're neither a moderator nor an admin", full_user)
         return await ctx.send("ERROR: You must be a bot moderator or server admin to use this command!", ephemeral=True)
-    log.debug("/approval - creating Approval object")
+    with tracing.span('db_load'):
+        existing = await ApprovalsDB().find_open_approval(post, ctx.guild_id)
+    if existing is not None and existing['message_id'] is not None:
+        log.info("User %s tried to create an approval for %s, but approval %s is already open for it", full_user, post, existing['id'])
+        link = f" - https://discord.com/channels/{ctx.guild_id}/{existing['channel_id']}/{existing['message_id']}" \
+            if existing['channel_id'] is not None else ""
+        return await ctx.send(f"There's already an open approval poll for this post (ID: {existing['id']}){link}", ephemeral=True)
     aprv = Approval(
         message_id=None, action=action, url=post, reason=reason, username=full_user,
-        total_all_mods=get_total_mods_admins_elig(), outcome=ApprovalOutcome.UNKNOWN,
-        end_time=now_plus_minutes(expire_minutes)
-    )
-    log.debug("/approval - saving Approval object")
-    aprv_id = await aprv.save()
-    log.debug("Approval slash command was ran by user: %s", full_user)
-    log.debug(f"Command arguments: {action=} {post=} {reason=}")
-    log.debug("Sending initial approval template message...")
-    msg = await ctx.send(
-        components=[approve_button, disapprove_button], 
-        embeds=template_approve(action, post, reason, full_user, expires_at=aprv.end_time, db_id=aprv.id),
+        total_all_mods=auth.roles.eligible, outcome=ApprovalOutcome.UNKNOWN,
+        end_time=now_plus_minutes(expire_minutes), channel_id=int(ctx.channel_id), guild_id=int(ctx.guild_id)
     )
-    log.debug(f"Storing data into Approval under MSG ID: %s and DB ID: %s", msg.id, aprv_id)
-    log.debug("/approval - setting message ID and saving object")
+    with tracing.span('save'):
+        await aprv.save()
+    tracing.annotate(poll=aprv.id)
+    with tracing.span('render'):
+        embeds = template_approve(action, post, reason, full_user, expires_at=aprv.end_time, db_id=aprv.id)
+    msg = await acknowledge(ctx, 'approval', 'send', ctx.send(
+        components=[approve_button, disapprove_button], embeds=embeds,
+    ))
+    metrics.POLLS_CREATED.inc()
     aprv.message_id = int(msg.id)
-    await aprv.save()
-    log.debug(f"Storing data into MessageStore under MSG ID: %s", msg.id)
-    MessageStore.create(msg.id, action=action, post=post, reason=reason, sender=full_user)
+    with tracing.span('save'):
+        await aprv.save()
+        await MessageStore.acreate(msg.id, action=action, post=post, reason=reason, sender=full_user, end_time=aprv.end_time)
+    EXPIRY.add(aprv.id, datetime_to_unix(aprv.end_time))
+    state = get_state()
+    if state is not None:
+        await state.announce_poll(aprv.id, datetime_to_unix(aprv.end_time))
 
 
-def has_majority(obj_approvals: Union[MessageStore, Approval, dict, int], disapprovals=None, vote_type=None, info=True):
+def has_majority(obj_approvals: Union[MessageStore, Approval, dict, int], disapprovals=None, vote_type=None, info=True,
+                 guild_id: Optional[int] = None):
     """
     
         >>> has_majority(4, 2)
 
+    The majority is based on the moderators/admins of server ``guild_id`` - or the approval's server, if
+    ``obj_approvals`` is an :class:`.Approval`.
     """
-    log.debug(f"has_majority - {obj_approvals=} {disapprovals=} {vote_type=} {info=}")
-    if isinstance(obj_approvals, (MessageStore, Approval)):
+    if isinstance(obj_approvals, Approval):
+        approvals, disapprovals = obj_approvals.approvals, obj_approvals.disapprovals
+        guild_id = empty_if(guild_id, obj_approvals.guild_id)
+    elif isinstance(obj_approvals, MessageStore):
         approvals, disapprovals = obj_approvals.approvals, obj_approvals.disapprovals
     elif isinstance(obj_approvals, dict):
         approvals, disapprovals = obj_approvals['approvals'], obj_approvals['disapprovals']
     else:
         approvals = obj_approvals
     
-    maj = get_majority_number()
+    maj = get_majority_number(guild_id)
 
     if not empty(vote_type):
         if vote_type.lower() in ['approve', 'approval', 'approvals']:
@@ -269,7 +535,10 @@ def has_majority(obj_approvals: Union[MessageStore, Approval, dict, int], disapp
     data = DictObject(approvals=approvals, disapprovals=disapprovals, majority_number=maj)
     data.count_majority = 'approval' if approvals > 0 else 'none'
     if not empty(disapprovals):
-        data.count_majority = 'approval' if approvals > disapprovals else 'disapprovals'
+        if approvals == disapprovals:
+            data.count_majority = 'none'
+        else:
+            data.count_majority = 'approval' if approvals > disapprovals else 'disapproval'
     
     data.mod_majority = 'none'
     if approvals >= maj :
@@ -283,189 +552,492 @@ def has_majority(obj_approvals: Union[MessageStore, Approval, dict, int], disapp
 
     
 async def handle_majority(m: Approval, ctx: Union[CommandContext, ComponentContext]):
-    log.debug(f"Handling majority - {m.approvals=} {m.disapprovals} majority_number={get_majority_number()}")
+    maj = get_majority_number(m.guild_id)
     # if m.approvals > m.disapprovals and m.approvals >  (int(dec_round(Decimal(len(CONFIG.moderators)) / 2, rounding=ROUND_UP))):
-    if m.approvals > m.disapprovals and m.approvals >= get_majority_number():
-        await ctx.send(f":green_circle: :green_circle: :green_circle: The poll for post/user/action '<{m.url}>' has reached majority moderator **approval**! The action may now be taken :)")
+    if m.approvals > m.disapprovals and m.approvals >= maj:
+        await metrics.timed_call(metrics.DISCORD_SECONDS, 'send', ctx.send(f":green_circle: :green_circle: :green_circle: The poll for post/user/action '<{m.url}>' has reached majority moderator **approval**! The action may now be taken :)"))
         
     # if m.disapprovals > m.approvals and m.disapprovals > (int(dec_round(Decimal(len(CONFIG.moderators)) / 2, rounding=ROUND_UP))):
-    if m.disapprovals > m.approvals and m.disapprovals >= get_majority_number():
-        await ctx.send(f":red_circle: :red_circle: :red_circle: The poll for post/user/action '<{m.url}>' has reached majority moderator **DIS-approval**! The action should not be taken")
+    if m.disapprovals > m.approvals and m.disapprovals >= maj:
+        await metrics.timed_call(metrics.DISCORD_SECONDS, 'send', ctx.send(f":red_circle: :red_circle: :red_circle: The poll for post/user/action '<{m.url}>' has reached majority moderator **DIS-approval**! The action should not be taken"))
         
 
 
-@bot.component("approve")
-async def approve_handler(ctx: CommandContext):
-    full_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+class PendingVote(NamedTuple):
+    """A button click waiting to be processed by :data:`.VOTES`"""
+    ctx: ComponentContext
+    auth: AuthContext
+    choice: VoteChoice
+    trace: Optional[tracing.Trace] = None
+    """The click's trace - spans for the batch it's processed in are added to it"""
+    queued: float = 0.0
+    """When the click was submitted to :data:`.VOTES` (``time.perf_counter()``), for it's ``queue_wait`` span"""
 
-    if not await is_admin_mod(ctx):
-        log.info("Rejected user %s from pressing approve button as they're neither a moderator nor an admin", full_user)
-        return await ctx.send("ERROR: You must be a bot moderator or server admin to vote on polls!", ephemeral=True)
-    
-    if not await can_vote(ctx):
-        log.info("Rejected user %s from pressing approve button as they're not allowed to vote", full_user)
-        return await ctx.send("ERROR: You must be a moderator to vote!", ephemeral=True)
-    
-    log.debug("Approve button was clicked. Context message ID: %s | Context user: %s", ctx.message.id, full_user)
-    # log.debug("Loading MessageStore for MSG ID: %s", ctx.message.id)
-    log.debug("Loading Approval for MSG ID: %s", ctx.message.id)
-    # m = MessageStore(ctx.message.id)
-    aprv = await Approval.from_db(int(ctx.message.id))
 
-    log.debug("Approval object before approving: %s", aprv)
-
-    if aprv.end_time < datetime.utcnow().astimezone(tz=timezone.utc):
-        log.info("Rejected user %s from pressing approve button as the approval request has expired", full_user)
-        return await ctx.send("ERROR: This approval poll has ended", ephemeral=True)
-    # if aprv.timestamp
-    aprv.total_all_mods = get_total_mods_admins_elig()
-    log.debug("Calling Approval.approve() for username: %s", full_user)
-    await aprv.approve(full_user)
+def update_outcome(aprv: Approval) -> Approval:
+    """
+    Set :attr:`.Approval.outcome` based on the approval's current vote counts. The outcome is worked out from
+    scratch each time, so after votes are changed it never keeps a result which the counts no longer support -
+    if there's no majority either way, it's a ``TIE`` (or ``UNKNOWN`` if nobody has voted).
+    """
     majcheck = has_majority(aprv)
-    if majcheck['mod_majority'] == 'approval':
-        aprv.outcome = ApprovalOutcome.APPROVE
-    elif majcheck['count_majority'] == 'approval':
-        aprv.outcome = ApprovalOutcome.APPROVE_NOMAJ
     if majcheck['mod_majority'] == 'disapproval':
         aprv.outcome = ApprovalOutcome.DISAPPROVE
     elif majcheck['count_majority'] == 'disapproval':
         aprv.outcome = ApprovalOutcome.DISAPPROVE_NOMAJ
+    elif majcheck['mod_majority'] == 'approval':
+        aprv.outcome = ApprovalOutcome.APPROVE
+    elif majcheck['count_majority'] == 'approval':
+        aprv.outcome = ApprovalOutcome.APPROVE_NOMAJ
+    elif aprv.approvals > 0:
+        aprv.outcome = ApprovalOutcome.TIE
+    else:
+        aprv.outcome = ApprovalOutcome.UNKNOWN
+    return aprv
+
+
+async def _finalize_poll(approval_id: int):
+    """
+    Called by :data:`.EXPIRY` once an approval's voting has ended - records it's final outcome, and
+    replaces the poll message's buttons with disabled copies in a single edit.
+
+    With the shared state backend, every bot process schedules every poll, so only the process which claims
+    the poll finalizes it - the others check it again once the claim expires, in case that process died.
+    """
+    state = get_state()
+    if state is not None:
+        if not await state.claim_finalize(approval_id):
+            EXPIRY.add(approval_id, time.time() + FINALIZE_CLAIM_TTL + 1)
+            return
+        # Another process may have finalized it since this one loaded it
+        aprv = await Approval.from_db_id(approval_id, fail=False, cached=False)
+    else:
+        aprv = await Approval.from_db_id(approval_id, fail=False)
+    if aprv is None or aprv.finalized:
+        return
+    if state is not None:
+        # Include any votes made through other bot processes which this one's copy of the approval missed
+        await state.apply_votes(aprv, [])
+    update_outcome(aprv)
+    if aprv.outcome in [ApprovalOutcome.UNKNOWN, ApprovalOutcome.AUTO]:
+        aprv.outcome = ApprovalOutcome.TIE
+    aprv.finalized = True
     await aprv.save()
-    # log.debug("Successfully loaded - MessageStore contents: %r", m)
-    # log.debug("Calling MessageStore.approve() for username: %s", full_user)
-    # m.approve(full_user)
-    log.debug("Editing approval discord message with updated approvals/disapprovals")
-    await ctx.edit(embeds=template_approve(aprv.action, aprv.url, aprv.reason, aprv.username, 
-        aprv.approvals, aprv.disapprovals, aprv.end_time, db_id=aprv.id), components=[approve_button, disapprove_button])
-    # await ctx.edit(f"Button got clicked uwu Message ID is: {ctx.message.id} | passed value: {v}")
-    if CONFIG.get('show_votes', False):
-        await ctx.send(f":green_circle: {full_user} approved the poll for action on post/user <{aprv.url}>")
-    # m.reload()
-
-    await handle_majority(aprv, ctx)
+    RENDERER.forget(aprv.id)
+    if state is not None:
+        await state.forget(aprv.id)
+    log.info("Approval %s has ended - final outcome: %s", aprv.id, aprv.outcome.value)
 
-@bot.component("disapprove")
-async def disapprove_handler(ctx: CommandContext):
-    full_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    if aprv.channel_id is None or aprv.message_id is None:
+        log.debug("Approval %s has no stored channel/message ID - not disabling it's buttons", aprv.id)
+        return
+    embeds = template_approve(aprv.action, aprv.url, aprv.reason, aprv.username, aprv.approvals, aprv.disapprovals,
+                              aprv.end_time, db_id=aprv.id, outcome=aprv.outcome)
+    buttons = [dict(b._json, disabled=True) for b in (approve_button, disapprove_button)]
+    payload = dict(embeds=[e._json for e in embeds], components=[dict(type=1, components=buttons)])
+    # Scheduled through EDITS so it's ordered after (and coalesced with) any pending vote edit on this poll
+    EDITS.schedule(aprv.message_id, lambda: metrics.timed_call(
+        metrics.DISCORD_SECONDS, 'edit_message', bot._http.edit_message(aprv.channel_id, aprv.message_id, payload)
+    ))
 
-    if not await is_admin_mod(ctx):
-        log.info("Rejected user %s from pressing disapprove button as they're neither a moderator nor an admin", full_user)
-        return await ctx.send("ERROR: You must be a bot moderator or server admin to vote on polls!", ephemeral=True)
 
-    if not await can_vote(ctx):
-        log.info("Rejected user %s from pressing disapprove button as they're not allowed to vote", full_user)
-        return await ctx.send("ERROR: You must be a moderator to vote!", ephemeral=True)
+async def _process_votes(msg_id: int, batch: List[PendingVote]):
+    """
+    Handle a batch of vote button clicks for the poll ``msg_id`` - called by :data:`.VOTES`, which
+    guarantees only one batch per poll is processed at a time.
 
-    log.debug("Disapprove button was clicked. Context message ID: %s | Context user: %s", ctx.message.id, full_user)
-    # log.debug("Loading MessageStore for MSG ID: %s", ctx.message.id)
-    log.debug("Loading Approval for MSG ID: %s", ctx.message.id)
-    # m = MessageStore(ctx.message.id)
-    aprv = await Approval.from_db(int(ctx.message.id))
-    log.debug("Approval object before disapproving: %s", aprv)
+    All votes in the batch are saved in one transaction, and the poll message is edited once. Each step is
+    recorded as a span on the trace of every click in the batch.
+    """
+    traces = [v.trace for v in batch if v.trace is not None]
+    started = time.perf_counter()
+    for v in batch:
+        if v.trace is not None:
+            v.trace.add_span('queue_wait', v.queued, started)
+    with tracing.span('db_load', traces):
+        aprv = await Approval.from_db(msg_id)
 
     if aprv.end_time < datetime.utcnow().astimezone(tz=timezone.utc):
-        log.info("Rejected user %s from pressing disapprove button as the approval request has expired", full_user)
-        return await ctx.send("ERROR: This approval poll has ended", ephemeral=True)
-    # if aprv.timestamp
-    aprv.total_all_mods = get_total_mods_admins_elig()
-    log.debug("Calling Approval.disapprove() for username: %s", full_user)
+        for v in batch:
+            log.info("Rejected user %s from pressing %s button as the approval request has expired", v.auth.user, v.choice.value)
+            await v.ctx.send("ERROR: This approval poll has ended", ephemeral=True)
+        return aprv
+
+    aprv.total_all_mods = get_total_mods_admins_elig(aprv.guild_id)
+    for v in batch:
+        metrics.VOTES.inc(v.choice.value)
+
+    async def save(changed: List[Tuple[str, VoteChoice]]):
+        previous = aprv.outcome
+        update_outcome(aprv)
+        if aprv.outcome != previous and aprv.outcome in (ApprovalOutcome.APPROVE, ApprovalOutcome.DISAPPROVE):
+            metrics.MAJORITY_EVENTS.inc(aprv.outcome.value)
+        with tracing.span('save', traces):
+            await aprv.save_votes(changed)
+
+    state = get_state()
+    if state is not None:
+        # Other bot processes may be taking votes on this poll too - the votes are applied atomically in the
+        # shared state, which also brings this process's copy of the approval up to date. The poll stays
+        # locked until they're saved, so the DB gets every process's votes in the order Redis applied them
+        with tracing.span('shared_state', traces):
+            async with state.voting(aprv, [(v.auth.user, v.choice) for v in batch]) as changed:
+                await save(changed)
+    else:
+        changed = []
+        for v in batch:
+            if aprv.apply_vote(v.auth.user, v.choice):
+                changed.append((v.auth.user, v.choice))
+        await save(changed)
+
+    # Every click was already acknowledged by _vote_handler, so the edit can be coalesced with
+    # the edits from any other batches on this poll within the next EDIT_WINDOW seconds
+    last = batch[-1]
+
+    async def edit_poll():
+        # Coalesced edits run after the clicks' handlers have returned, so they get a trace of their own
+        with tracing.trace('poll_edit', msg_id, poll=aprv.id):
+            if state is not None:
+                # Other processes edit this poll too - only show the tally if it's newer than the one they've shown
+                with tracing.span('claim'):
+                    if not await state.claim_render(aprv):
+                        return
+            with tracing.span('render'):
+                payload = RENDERER.votes_payload(aprv)
+            # The click was acked with a deferred update, so this edits the poll message through the
+            # interaction's webhook - sending only the embeds, instead of re-sending the whole message
+            with tracing.span('edit'):
+                await metrics.timed_call(metrics.DISCORD_SECONDS, 'edit', bot._http.edit_interaction_response(
+                    payload, last.ctx.token, str(last.ctx.application_id)
+                ))
+
+    EDITS.schedule(msg_id, edit_poll)
+
+    if guild_config(aprv.guild_id).get('show_votes', False):
+        for v in batch:
+            if v.choice == VoteChoice.APPROVE:
+                await v.ctx.send(f":green_circle: {v.auth.user} approved the poll for action on post/user <{aprv.url}>")
+            else:
+                await v.ctx.send(f":red_circle: {v.auth.user} disapproved the poll for action on post/user <{aprv.url}>")
+
+    with tracing.span('majority', traces):
+        await handle_majority(aprv, last.ctx)
+    return aprv
+
+
+VOTES = VoteDispatcher(_process_votes)
+"""Serializes + batches vote button clicks per poll message - see :class:`.VoteDispatcher`"""
+
+EDITS = EditCoalescer(window=settings.EDIT_WINDOW)
+"""Limits poll message edits to one per ``EDIT_WINDOW`` seconds per poll - see :class:`.EditCoalescer`"""
+metrics.OUTBOUND_QUEUE.set_function(lambda: EDITS.pending)
+
+EXPIRY = ExpiryScheduler(_finalize_poll)
+"""Finalizes each approval poll once it's ``end_time`` passes - see :class:`.ExpiryScheduler`"""
+
+
+async def _vote_handler(ctx: ComponentContext, choice: VoteChoice):
+    """
+    Handle a vote button click - the click is acknowledged before anything else, so that slow permission lookups,
+    DB queries or a backlog of votes on the poll can't push it past Discord's :data:`.ACK_DEADLINE`. The rest of the
+    work happens after the ack: rejections are sent as ephemeral follow-ups, and accepted votes are tallied by
+    :data:`.VOTES`, which edits the poll message through :data:`.EDITS`.
+    """
+    await acknowledge(ctx, choice.value, 'defer', ctx.defer(edit_origin=True))
+    auth = await AuthContext.from_ctx(ctx)
+    button = choice.value
+    tracing.annotate(user=auth.user, message=ctx.message.id)
 
-    await aprv.disapprove(full_user)
-    majcheck = has_majority(aprv)
-    if majcheck['mod_majority'] == 'approval':
-        aprv.outcome = ApprovalOutcome.APPROVE
-    elif majcheck['count_majority'] == 'approval':
-        aprv.outcome = ApprovalOutcome.APPROVE_NOMAJ
-    if majcheck['mod_majority'] == 'disapproval':
-        aprv.outcome = ApprovalOutcome.DISAPPROVE
-    elif majcheck['count_majority'] == 'disapproval':
-        aprv.outcome = ApprovalOutcome.DISAPPROVE_NOMAJ
-    await aprv.save()
+    if not auth.is_admin_mod:
+        log.info("Rejected user %s from pressing %s button as they're neither a moderator nor an admin", auth.user, button)
+        return await ctx.send("ERROR: You must be a bot moderator or server admin to vote on polls!", ephemeral=True)
+    
+    if not auth.can_vote:
+        log.info("Rejected user %s from pressing %s button as they're not allowed to vote", auth.user, button)
+        return await ctx.send("ERROR: You must be a moderator to vote!", ephemeral=True)
 
-    # log.debug("Successfully loaded - MessageStore contents: %r", m)
-    # log.debug("Calling MessageStore.disapprove() for username: %s", full_user)
-    # m.disapprove(full_user)
-    log.debug("Editing approval discord message with updated approvals/disapprovals")
-    # await ctx.edit(embeds=template_approve(m.action, m.post, m.reason, m.sender, m.approvals, m.disapprovals), components=[approve_button, disapprove_button])
-    await ctx.edit(embeds=template_approve(aprv.action, aprv.url, aprv.reason, aprv.username, 
-        aprv.approvals, aprv.disapprovals, aprv.end_time, db_id=aprv.id), components=[approve_button, disapprove_button])
+    await VOTES.submit(int(ctx.message.id), PendingVote(ctx, auth, choice, tracing.current(), time.perf_counter()))
 
-    if CONFIG.get('show_votes', False):
-        await ctx.send(f":red_circle: {full_user} disapproved the poll for action on post/user <{aprv.url}>")
 
-    await handle_majority(aprv, ctx)
+@bot.component("approve")
+@metrics.timed(metrics.HANDLER_SECONDS, 'approve')
+@tracing.traced('approve')
+async def approve_handler(ctx: ComponentContext):
+    await _vote_handler(ctx, VoteChoice.APPROVE)
+
+@bot.component("disapprove")
+@metrics.timed(metrics.HANDLER_SECONDS, 'disapprove')
+@tracing.traced('disapprove')
+async def disapprove_handler(ctx: ComponentContext):
+    await _vote_handler(ctx, VoteChoice.DISAPPROVE)
+
+
+HISTORY_PAGES = TTLCache(maxsize=500, ttl=settings.HISTORY_PAGE_TTL)
+"""
+Paging state for ``/approval_history`` messages, keyed by message ID - a :class:`.DictObject` holding the
+``filters`` it was ran with, and ``cursors`` - the ``after_id`` of each page viewed so far (the last one is the current page).
+"""
+
+history_prev_button = interactions.Button(
+    style=interactions.ButtonStyle.SECONDARY,
+    label="Previous",
+    custom_id="history_prev"
+)
+
+history_next_button = interactions.Button(
+    style=interactions.ButtonStyle.SECONDARY,
+    label="Next",
+    custom_id="history_next"
+)
+
+
+def approval_fields(rows: List[dict]) -> List[interactions.EmbedField]:
+    """Summarise each approval row from the DB as an embed field, for ``/approval_history`` and ``/search_approvals``"""
+    fields = []
+    for r in rows:
+        aprv = Approval.from_dict(r).fix_fields()
+        fields.append(interactions.EmbedField(
+            name=f"#{aprv.id} - {aprv.action} ({aprv.outcome.value.replace('_', ' ')})",
+            value=f"<{aprv.url}>\nRequested by {aprv.username} <t:{datetime_to_unix(aprv.timestamp)}:f> - "
+                  f"{aprv.approvals} approvals, {aprv.disapprovals} disapprovals",
+        ))
+    if len(fields) == 0:
+        fields.append(interactions.EmbedField(name="No approvals found", value="-"))
+    return fields
+
+
+async def render_history(filters: dict, cursors: List[Optional[int]]) -> dict:
+    """
+    Query the page of approvals after ``cursors[-1]``, returning the ``embeds`` + ``components`` kwargs
+    for sending/editing an ``/approval_history`` message, plus ``next_id`` - the ``after_id`` of the next page
+    (``None`` if this is the last page).
+    """
+    size = min(settings.HISTORY_PAGE_SIZE, 25)
+    # Query one extra row, so we know whether there's a next page without a COUNT(*)
+    rows = [r async for r in ApprovalsDB().iter_approvals(filters, after_id=cursors[-1], limit=size + 1)]
+    page, has_next = rows[:size], len(rows) > size
+    filter_desc = ', '.join(f"{k}: {v}" for k, v in filters.items() if v is not None and k != 'guild_id')
+    embed = interactions.Embed(
+        title=f"Approval History (page {len(cursors)})",
+        description=f"Filtered by {filter_desc}" if filter_desc else None,
+        color=interactions.Color.blurple(),
+        fields=approval_fields(page),
+    )
+    prev_button = interactions.Button(**dict(history_prev_button._json, disabled=len(cursors) < 2))
+    next_button = interactions.Button(**dict(history_next_button._json, disabled=not has_next))
+    return dict(
+        embeds=[embed], components=[prev_button, next_button], next_id=page[-1].id if has_next else None
+    )
+
+
+@bot.command(scope=SERVER_IDS, description="List past approval requests, newest first, optionally filtered")
+@interactions.option("Only show approvals with this outcome", choices=[
+    interactions.Choice(name=o.value.replace('_', ' ').title(), value=o.value) for o in [
+        ApprovalOutcome.APPROVED, ApprovalOutcome.APPROVED_NO_MAJORITY, ApprovalOutcome.DISAPPROVED,
+        ApprovalOutcome.DISAPPROVED_NO_MAJORITY, ApprovalOutcome.TIE, ApprovalOutcome.UNKNOWN,
+    ]
+])
+@interactions.option("Only show approvals requested by this user (e.g. SomeUser#1234)")
+@interactions.option("Only show approvals for this action (e.g. delete)")
+async def approval_history(ctx: interactions.CommandContext, outcome: str = None, username: str = None, action: str = None):
+    auth = await AuthContext.from_ctx(ctx)
+    if not auth.is_admin_mod:
+        log.info("Rejected user %s from running command /approval_history as they're neither a moderator nor an admin", auth.user)
+        return await ctx.send("ERROR: You must be a bot moderator or server admin to use this command!", ephemeral=True)
+
+    filters = dict(guild_id=int(ctx.guild_id), outcome=outcome, username=username, action=action)
+    cursors = [None]
+    page = await render_history(filters, cursors)
+    msg = await ctx.send(embeds=page['embeds'], components=page['components'], ephemeral=True)
+    HISTORY_PAGES.set(int(msg.id), DictObject(filters=filters, cursors=cursors, next_id=page['next_id']))
+
+
+async def _history_page_handler(ctx: ComponentContext, forward: bool):
+    state = HISTORY_PAGES.get(int(ctx.message.id))
+    if state is None:
+        return await ctx.send("ERROR: This history message has expired - please run /approval_history again", ephemeral=True)
+    if forward and state.next_id is not None:
+        state.cursors.append(state.next_id)
+    elif not forward and len(state.cursors) > 1:
+        state.cursors.pop()
+    page = await render_history(state.filters, state.cursors)
+    state.next_id = page['next_id']
+    await ctx.edit(embeds=page['embeds'], components=page['components'])
+
+
+@bot.component("history_prev")
+async def history_prev_handler(ctx: ComponentContext):
+    await _history_page_handler(ctx, forward=False)
+
+@bot.component("history_next")
+async def history_next_handler(ctx: ComponentContext):
+    await _history_page_handler(ctx, forward=True)
+
+
+SEARCH_PAGES = TTLCache(maxsize=500, ttl=settings.HISTORY_PAGE_TTL)
+"""
+Paging state for ``/search_approvals`` messages, keyed by message ID - a :class:`.DictObject` holding
+the search ``query``, the ``guild_id`` it was ran in, and the current ``page`` number (starting from 0).
+"""
+
+search_prev_button = interactions.Button(**dict(history_prev_button._json, custom_id="search_prev"))
+search_next_button = interactions.Button(**dict(history_next_button._json, custom_id="search_next"))
+
+
+async def render_search(query: str, page: int, guild_id: Optional[int] = None) -> dict:
+    """
+    Run the full-text search ``query`` over server ``guild_id``'s approvals, returning the ``embeds`` + ``components``
+    kwargs for sending/editing page number ``page`` of a ``/search_approvals`` message.
+    """
+    size = min(settings.HISTORY_PAGE_SIZE, 25)
+    rows = await ApprovalsDB().search_approvals(query, offset=page * size, limit=size + 1, guild_id=guild_id)
+    embed = interactions.Embed(
+        title=f"Approval Search (page {page + 1})",
+        description=f"Best matches for: {query}",
+        color=interactions.Color.blurple(),
+        fields=approval_fields(rows[:size]),
+    )
+    prev_button = interactions.Button(**dict(search_prev_button._json, disabled=page < 1))
+    next_button = interactions.Button(**dict(search_next_button._json, disabled=len(rows) <= size))
+    return dict(embeds=[embed], components=[prev_button, next_button])
+
+
+@bot.command(scope=SERVER_IDS, description="Search past approval requests by their reason, action or post URL")
+@interactions.option("Words or a URL to search for, e.g. a username, 'spam', or a link to a post")
+async def search_approvals(ctx: interactions.CommandContext, query: str):
+    auth = await AuthContext.from_ctx(ctx)
+    if not auth.is_admin_mod:
+        log.info("Rejected user %s from running command /search_approvals as they're neither a moderator nor an admin", auth.user)
+        return await ctx.send("ERROR: You must be a bot moderator or server admin to use this command!", ephemeral=True)
+
+    page = await render_search(query, 0, int(ctx.guild_id))
+    msg = await ctx.send(embeds=page['embeds'], components=page['components'], ephemeral=True)
+    SEARCH_PAGES.set(int(msg.id), DictObject(query=query, guild_id=int(ctx.guild_id), page=0))
+
+
+async def _search_page_handler(ctx: ComponentContext, forward: bool):
+    state = SEARCH_PAGES.get(int(ctx.message.id))
+    if state is None:
+        return await ctx.send("ERROR: This search has expired - please run /search_approvals again", ephemeral=True)
+    state.page = state.page + 1 if forward else max(0, state.page - 1)
+    page = await render_search(state.query, state.page, state.guild_id)
+    await ctx.edit(embeds=page['embeds'], components=page['components'])
+
+
+@bot.component("search_prev")
+async def search_prev_handler(ctx: ComponentContext):
+    await _search_page_handler(ctx, forward=False)
+
+@bot.component("search_next")
+async def search_next_handler(ctx: ComponentContext):
+    await _search_page_handler(ctx, forward=True)
+
+
+@bot.command(scope=SERVER_IDS, description="Show approval outcome rates, the most common actions, and moderator participation")
+@interactions.option("Show how many approvals were requested over this many days (default: 30)")
+async def approval_stats(ctx: interactions.CommandContext, days: int = 30):
+    auth = await AuthContext.from_ctx(ctx)
+    if not auth.is_admin_mod:
+        log.info("Rejected user %s from running command /approval_stats as they're neither a moderator nor an admin", auth.user)
+        return await ctx.send("ERROR: You must be a bot moderator or server admin to use this command!", ephemeral=True)
+
+    days = max(1, days)
+    stats = await ApprovalsDB().get_stats(int(ctx.guild_id), days=days)
+    total = sum(stats.outcomes.values())
+    outcomes = "\n".join(
+        f"**{o.replace('_', ' ')}:** {n} ({n / total:.0%})" for o, n in stats.outcomes.items()
+    ) if total > 0 else "n/a"
+    actions = "\n".join(
+        f"**{a['action'] or 'n/a'}:** {a['total']} requested, {a['approved']} approved" for a in stats.actions
+    ) or "n/a"
+    voters = "\n".join(
+        f"**{v['voter_id']}:** {v['approvals'] + v['disapprovals']} votes "
+        f"({v['approvals']} approve / {v['disapprovals']} disapprove)" for v in stats.voters
+    ) or "n/a"
+    recent = sum(sum(d.values()) for d in stats.daily.values())
+    await ctx.send(embeds=[interactions.Embed(
+        title="Approval Statistics",
+        description=f"{total} approval requests in total, {recent} in the last {days} day(s)",
+        color=interactions.Color.blurple(),
+        fields=[
+            interactions.EmbedField(name="Outcomes", value=outcomes),
+            interactions.EmbedField(name="Most common actions", value=actions),
+            interactions.EmbedField(name="Most active voters", value=voters),
+        ],
+    )])
+
 
-    # await ctx.edit(f"Button got clicked uwu Message ID is: {ctx.message.id} | passed value: {v}")
-    # await ctx.send("You clicked the Button :O", ephemeral=True)
-    
 @bot.command(scope=SERVER_IDS, description="Add a moderator to the bot (ADMIN ONLY)")
 @interactions.option("The name of the moderator to add")
 async def add_moderator(ctx: interactions.CommandContext, name: interactions.OptionType.USER):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
     # perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.info("User %s is adding moderator user via command: %s (repr: %s)", call_user, name, repr(name))
+    log.info("User %s is adding moderator user via command: %s (repr: %s)", auth.user, name, repr(name))
     
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /add_moderator - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /add_moderator - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can add moderators to the bot!", ephemeral=True)
         return
     
-    if 'moderators' not in CONFIG or not isinstance(CONFIG.moderators, list):
-        CONFIG.moderators = []
+    if 'moderators' not in cfg or not isinstance(cfg.moderators, list):
+        cfg.moderators = []
     
     full_user = f"{name.username}#{name.discriminator}"
-    if full_user in CONFIG.moderators:
-        log.debug("User %s tried to add a moderator that's already on the list: %s", call_user, full_user)
+    if full_user in cfg.moderators:
+        log.debug("User %s tried to add a moderator that's already on the list: %s", auth.user, full_user)
         await ctx.send(f"ERROR: user '{full_user}' is already configured as a bot moderator", ephemeral=True)
         return
     
-    CONFIG.moderators.append(full_user)
-    save_config()
+    cfg.moderators.append(full_user)
+    await config_changed(ctx.guild_id)
     await ctx.send(f"Added moderator to bot: {full_user}")
 
 @bot.command(scope=SERVER_IDS, description="List moderators on the bot")
 async def list_moderators(ctx: interactions.CommandContext):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
     # perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.info("User %s is requesting the moderator list", call_user)
+    log.info("User %s is requesting the moderator list", auth.user)
     
-    if not await is_admin_mod(ctx):
-        log.debug("Non-administrator/mod %s called /list_moderators - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin_mod:
+        log.debug("Non-administrator/mod %s called /list_moderators - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only admins/mods can list the moderator list!", ephemeral=True)
         return
     
-    if 'moderators' not in CONFIG or not isinstance(CONFIG.moderators, list):
-        CONFIG.moderators = []
+    if 'moderators' not in cfg or not isinstance(cfg.moderators, list):
+        cfg.moderators = []
     
     modlist = ""
-    for m in CONFIG.moderators:
+    for m in cfg.moderators:
         modlist += f" - {m}\n"
     await ctx.send(f"Moderator list:\n{modlist}")
 
 async def _remove_moderator(ctx, full_user: str):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
     # perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.info("User %s is removing moderator user via command: %s (repr: %s)", call_user, full_user, repr(full_user))
+    log.info("User %s is removing moderator user via command: %s (repr: %s)", auth.user, full_user, repr(full_user))
     # log.debug("Guild perms are: %s", perms)
     # if not (perms.ADMINISTRATOR in perms):
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /remove_moderator - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /remove_moderator - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can remove moderators from the bot!", ephemeral=True)
         return
     
-    if 'moderators' not in CONFIG or not isinstance(CONFIG.moderators, list):
-        CONFIG.moderators = []
+    if 'moderators' not in cfg or not isinstance(cfg.moderators, list):
+        cfg.moderators = []
     
     # full_user = f"{name.username}#{name.discriminator}"
-    if full_user not in CONFIG.moderators:
-        log.debug("User %s tried to remove a moderator that's not on the list: %s", call_user, full_user)
+    if full_user not in cfg.moderators:
+        log.debug("User %s tried to remove a moderator that's not on the list: %s", auth.user, full_user)
         await ctx.send(f"ERROR: user '{full_user}' is already not a bot moderator", ephemeral=True)
         return
     
-    CONFIG.moderators.remove(full_user)
-    save_config()
+    cfg.moderators.remove(full_user)
+    await config_changed(ctx.guild_id)
 
     await ctx.send(f"Removed moderator from bot: {full_user}")
 
@@ -484,71 +1056,74 @@ async def remove_moderator_raw(ctx: interactions.CommandContext, name: str):
 @bot.command(scope=SERVER_IDS, description="Add an administrator to the bot (ADMIN ONLY)")
 @interactions.option("The name of the admin to add")
 async def add_admin(ctx: interactions.CommandContext, name: interactions.OptionType.USER):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
     # perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.info("User %s is adding admin user via command: %s (repr: %s)", call_user, name, repr(name))
+    log.info("User %s is adding admin user via command: %s (repr: %s)", auth.user, name, repr(name))
     
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /add_admin - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /add_admin - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can add admins to the bot!", ephemeral=True)
         return
     
-    if 'admins' not in CONFIG or not isinstance(CONFIG.admins, list):
-        CONFIG.admins = []
+    if 'admins' not in cfg or not isinstance(cfg.admins, list):
+        cfg.admins = []
     
     full_user = f"{name.username}#{name.discriminator}"
-    if full_user in CONFIG.admins:
-        log.debug("User %s tried to add a admin that's already on the list: %s", call_user, full_user)
+    if full_user in cfg.admins:
+        log.debug("User %s tried to add a admin that's already on the list: %s", auth.user, full_user)
         await ctx.send(f"ERROR: user '{full_user}' is already configured as a bot admin", ephemeral=True)
         return
     
-    CONFIG.admins.append(full_user)
-    save_config()
+    cfg.admins.append(full_user)
+    await config_changed(ctx.guild_id)
     await ctx.send(f"Added admin to bot: {full_user}")
 
 @bot.command(scope=SERVER_IDS, description="List administrators on the bot")
 async def list_admins(ctx: interactions.CommandContext):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
     # perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.info("User %s is requesting the admin list", call_user)
+    log.info("User %s is requesting the admin list", auth.user)
     
-    if not await is_admin_mod(ctx):
-        log.debug("Non-administrator/mod %s called /list_admins - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin_mod:
+        log.debug("Non-administrator/mod %s called /list_admins - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only admins/mods can list the admin list!", ephemeral=True)
         return
     
-    if 'admins' not in CONFIG or not isinstance(CONFIG.admins, list):
-        CONFIG.admins = []
+    if 'admins' not in cfg or not isinstance(cfg.admins, list):
+        cfg.admins = []
     
     adminlist = ""
-    for m in CONFIG.admins:
+    for m in cfg.admins:
         adminlist += f" - {m}\n"
     await ctx.send(f"Admin list:\n{adminlist}")
 
 async def _remove_admin(ctx, full_user):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
     # perms = (await ctx.author.get_guild_permissions(ctx.guild_id))
-    log.info("User %s is removing admin user via command: %s (repr: %s)", call_user, full_user, repr(full_user))
+    log.info("User %s is removing admin user via command: %s (repr: %s)", auth.user, full_user, repr(full_user))
     # log.debug("Guild perms are: %s", perms)
     # if not (perms.ADMINISTRATOR in perms):
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /remove_admin - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /remove_admin - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only administrators can remove admins from the bot!", ephemeral=True)
         return
     
-    if 'admins' not in CONFIG or not isinstance(CONFIG.admins, list):
-        CONFIG.admins = []
+    if 'admins' not in cfg or not isinstance(cfg.admins, list):
+        cfg.admins = []
     
     # full_user = 
-    if full_user not in CONFIG.admins:
-        log.debug("User %s tried to remove an admin that's not on the list: %s", call_user, full_user)
+    if full_user not in cfg.admins:
+        log.debug("User %s tried to remove an admin that's not on the list: %s", auth.user, full_user)
         await ctx.send(f"ERROR: user '{full_user}' is already not a bot admin", ephemeral=True)
         return
     
-    CONFIG.admins.remove(full_user)
-    save_config()
+    cfg.admins.remove(full_user)
+    await config_changed(ctx.guild_id)
 
     await ctx.send(f"Removed admin from bot: {full_user}")
 
@@ -567,73 +1142,112 @@ async def remove_admin_raw(ctx: interactions.CommandContext, name: str):
 @bot.command(scope=SERVER_IDS, description="Enable or disable displaying who voted and whether they voted approve/disapprove")
 @interactions.option("Do we display who voted on which option when people vote?")
 async def show_votes(ctx: interactions.CommandContext, enable: bool):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /show_votes - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /show_votes - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can set show_votes on the bot!", ephemeral=True)
         return
     
     if enable:
-        CONFIG.show_votes = True
+        cfg.show_votes = True
         await ctx.send(" :green_circle: Showing votes has been enabled")
     else:
-        CONFIG.show_votes = False
+        cfg.show_votes = False
         await ctx.send(" :red_circle: Showing votes has been disabled")
     
-    save_config()
+    await config_changed(ctx.guild_id)
 
 @bot.command(scope=SERVER_IDS, description="Enable or disable allowing admins who aren't moderators to vote")
 @interactions.option("Do we allow admins to vote if they're not also moderators?")
 async def admins_can_vote(ctx: interactions.CommandContext, enable: bool):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /admins_can_vote - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /admins_can_vote - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can remove moderators from the bot!", ephemeral=True)
         return
     
     if enable:
-        CONFIG.admins_can_vote = True
+        cfg.admins_can_vote = True
         await ctx.send(" :green_circle: Admin voting has been enabled")
     else:
-        CONFIG.admins_can_vote = False
+        cfg.admins_can_vote = False
         await ctx.send(" :red_circle: Admin voting has been disable")
     
-    save_config()
+    await config_changed(ctx.guild_id)
 
 @bot.command(scope=SERVER_IDS, description="Enable or disable including non-moderator admins in the majority count needed")
 @interactions.option("Do we include non-moderator admins in the majority count needed?")
 async def majority_include_admins(ctx: interactions.CommandContext, enable: bool):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /majority_include_admins - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /majority_include_admins - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can set majority_include_admins on the bot!", ephemeral=True)
         return
     
     if enable:
-        CONFIG.majority_include_admins = True
+        cfg.majority_include_admins = True
         await ctx.send(" :green_circle: Admin voting has been enabled")
     else:
-        CONFIG.majority_include_admins = False
+        cfg.majority_include_admins = False
         await ctx.send(" :red_circle: Admin voting has been disable")
     
-    save_config()
+    await config_changed(ctx.guild_id)
 
 @bot.command(scope=SERVER_IDS, description="Send a message displaying the current configuration settings")
 async def list_settings(ctx: interactions.CommandContext):
-    call_user = f"{ctx.user.username}#{ctx.user.discriminator}"
+    auth = await AuthContext.from_ctx(ctx)
+    cfg = guild_config(ctx.guild_id)
 
-    if not await is_admin(ctx):
-        log.debug("Non-administrator %s called /list_settings - letting them know this isn't allowed and aborting the command...", call_user)
+    if not auth.is_admin:
+        log.debug("Non-administrator %s called /list_settings - letting them know this isn't allowed and aborting the command...", auth.user)
         await ctx.send("ERROR: Only server administrators can list settings on the bot!", ephemeral=True)
         return
     
     msg = "**_Bot Settings_**\n"
-    for k, v in CONFIG.items():
+    for k, v in cfg.items():
         msg += f"**{k}:**\t\t{v}\n"
     await ctx.send(msg)
 
-if __name__ == '__main__':
+async def shutdown():
+    """
+    Flush any pending work (e.g. coalesced poll message edits) before the bot disconnects from Discord,
+    then close the persistent DB connection(s)
+    """
+    log.debug("Flushing pending poll message edits before shutting down")
+    await EDITS.close()
+    log.debug("Saving any pending config changes")
+    await CONFIG_WRITER.flush()
+    log.debug("Closing persistent Approvals DB connections")
+    await ApprovalsDB.close_connections()
+    await metrics.stop_server()
+    state = get_state()
+    if state is not None:
+        await state.close()
+
+
+def run():
+    """
+    Start the bot - runs the startup stages (see :func:`.core.init`), then the same as ``bot.start()``,
+    but runs :func:`.shutdown` before the bot logs out
+    """
+    init()
+    _logout = bot._logout
+
+    async def logout():
+        try:
+            await shutdown()
+        finally:
+            await _logout()
+    
+    bot._logout = logout
     bot.start()
+
+
+if __name__ == '__main__':
+    run()
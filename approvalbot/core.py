@@ -1,6 +1,15 @@
 """
 Core - Shared variables and functions
 
+Importing this module has no side effects - the bot's startup work (creating the data folder, setting the
+cache adapter, loading the config etc.) is split into stages, which are ran by :func:`.init`::
+
+    >>> from approvalbot.core import init
+    >>> init()                   # Run every stage, e.g. before starting the bot
+    >>> init('config')           # Only load the config - e.g. for a CLI tool which doesn't need Discord
+
+Each stage only runs once, and runs any stages it depends on first.
+
 Copyright::
 
     +===================================================+
@@ -19,23 +28,26 @@ Copyright::
     |                                                   |
     +===================================================+
 """
+import asyncio
 import copy
+import tempfile
 from pathlib import Path
-from dotenv import load_dotenv
 from os import getenv as env
 from privex.helpers import env_bool, env_csv, empty, empty_if, DictObject
-from privex.loghelper import LogHelper
+from privex.helpers import settings as pvx_settings
 from privex.helpers.cache import adapter_set, async_adapter_set
-from typing import Union, List, Optional
+from typing import Callable, Dict, Union, List, Optional, Set
 from approvalbot import settings
 import logging
+import stat
 import sys
 import yaml
 import os
 
 __all__ = [
-    'print_err', 'IndentDumper', 'load_config', 'save_config', 
-    'add_missing_config_defaults',
+    'print_err', 'IndentDumper', 'load_config', 'save_config', 'asave_config',
+    'add_missing_config_defaults', 'ConfigWriter', 'CONFIG_WRITER', 'guild_config',
+    'init', 'INIT_STAGES',
 ]
 
 
@@ -44,27 +56,6 @@ log = logging.getLogger(__name__)
 def print_err(*msg, **kwargs):
     print(*msg, file=sys.stderr, **kwargs)
 
-if not settings.DATA_DIR.exists():
-    log.debug("Data dir doesn't exist, creating DATA_DIR folder: %s", settings.DATA_DIR)
-    os.mkdir(settings.DATA_DIR)
-
-
-try:
-    log.debug("Setting cache adapter to: %s", settings.CACHE_ADAPTER)
-    adapter_set(settings.CACHE_ADAPTER)
-    log.debug("Setting async cache adapter to: %s", settings.CACHE_ADAPTER)
-    async_adapter_set(settings.CACHE_ADAPTER)
-except KeyError as e:
-    if 'not found in category' in str(e):
-        print_err(f" [ERROR] Invalid settings.CACHE_ADAPTER setting '{settings.CACHE_ADAPTER}', valid cache adapter options: memory, sqlite3, redis, memcached")
-    else:
-        print_err(f" [ERROR] A KeyError was raised while loading cache adapter '{settings.CACHE_ADAPTER}' - reason: {e!s}")
-    sys.exit(4)
-except (AttributeError, IndexError, ImportError) as e:
-    print_err(f" [ERROR] !!! Failed to set cache adapter to '{settings.CACHE_ADAPTER}', exception message: {type(e)} - {e!s}")
-    print_err(f" [ERROR] Packages required for that cache adapter may be missing, please run 'pipenv install', or 'pip3 install -U \"privex-helpers[cache]\"'")
-    sys.exit(3)
-
 
 class IndentDumper(yaml.Dumper):
     def increase_indent(self, flow=False, indentless=False):
@@ -86,6 +77,50 @@ def add_missing_config_defaults(cfg: Optional[Union[dict, DictObject]] = None, a
         save_config(cfg)
     return DictObject(cfg)
 
+def guild_config(guild_id: Optional[Union[int, str]], cfg: Optional[Union[dict, DictObject]] = None) -> DictObject:
+    """
+    Get the config namespace for the Discord server ``guild_id`` - holding it's own copy of the
+    :data:`.settings.GUILD_CONFIG_KEYS` (moderators, admins, show_votes etc.).
+
+    The namespace is created from :data:`.settings.CONFIG_DEFAULTS` the first time it's used - except for the
+    server which the config's top-level (pre multi-server) values belong to (see :func:`._owns_legacy_config`), which
+    takes them over, leaving the defaults in their place. So a newly joined server never inherits another
+    server's moderators. Changes to the returned :class:`.DictObject` are saved along with the rest of ``cfg``.
+
+        >>> cfg = guild_config(789032594456576001)
+        >>> cfg.moderators.append('SomeUser#1234')
+
+    :param guild_id: The Discord server ID - if this is ``None``, the top-level ``cfg`` is returned
+    :param cfg: The config to use (default: :data:`.settings.CONFIG`)
+    """
+    cfg = settings.CONFIG if cfg is None else cfg
+    if guild_id is None:
+        return cfg
+    guild_id = int(guild_id)
+    if not isinstance(cfg.get('guilds'), dict):
+        cfg['guilds'] = {}
+    gcfg = cfg['guilds'].get(guild_id)
+    if not isinstance(gcfg, DictObject):
+        base = {k: copy.deepcopy(settings.CONFIG_DEFAULTS[k]) for k in settings.GUILD_CONFIG_KEYS}
+        if _owns_legacy_config(guild_id, cfg):
+            log.info("Moving the top-level moderator/admin config into server %s's config", guild_id)
+            for k in settings.GUILD_CONFIG_KEYS:
+                if k in cfg:
+                    base[k] = cfg[k]
+                    cfg[k] = copy.deepcopy(settings.CONFIG_DEFAULTS[k])
+        gcfg = cfg['guilds'][guild_id] = DictObject({**base, **(gcfg or {})})
+    return gcfg
+
+def _owns_legacy_config(guild_id: int, cfg: Union[dict, DictObject]) -> bool:
+    """
+    Whether the top-level :data:`.settings.GUILD_CONFIG_KEYS` values (from before the config was split per server)
+    belong to the server ``guild_id`` - the first of ``SERVER_IDS``, or if that isn't set, the first server to be
+    configured.
+    """
+    if len(settings.SERVER_IDS) > 0:
+        return guild_id == int(settings.SERVER_IDS[0])
+    return len(cfg['guilds']) == 0
+
 def load_config(cfg_file: Union[str, Path] = settings.CONFIG_FILE, update_global=True, add_missing=True) -> Union[DictObject, dict]:
     log.info("Loading config from file: %s", cfg_file)
     with open(str(cfg_file), 'r') as fh:
@@ -109,22 +144,206 @@ def save_config(data: Union[DictObject, dict] = None, cfg_file: Union[str, Path]
         settings.CONFIG.update(data)
     
     log.debug("Config data: %s", data)
-    log.info("Saving config to file: %s", cfg_file)
-    
-    with open(str(cfg_file), 'w') as fh:
-        yaml.dump(dict(data), fh, indent=4, Dumper=IndentDumper)
-        fh.flush()
-    
+    _write_config(dict(data), cfg_file)
+    return data
+
+def _plain(data):
+    """Recursively convert dict subclasses (e.g. :class:`.DictObject`) into plain dicts, so they're dumped as normal YAML"""
+    if isinstance(data, dict):
+        return {k: _plain(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_plain(v) for v in data]
     return data
 
-if not settings.CONFIG_FILE.exists():
-    save_config()
+def _file_mode(path: Path) -> int:
+    """The permission bits of ``path``, or ``0644`` minus the process's umask if it doesn't exist"""
+    try:
+        return stat.S_IMODE(os.stat(str(path)).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o644 & ~umask
+
+def _write_config(data: dict, cfg_file: Union[str, Path] = settings.CONFIG_FILE):
+    """
+    Atomically write ``data`` to ``cfg_file`` as YAML - it's written to a temporary file in the same folder,
+    which then replaces ``cfg_file``, so the config file is never left half-written.
+
+    The temporary file is given ``cfg_file``'s permissions (or the usual ``0644``, minus the umask, for a new
+    config file), as ``mkstemp`` creates it readable by the owner only.
+    """
+    log.info("Saving config to file: %s", cfg_file)
+    data = _plain(data)
+    cfg_file = Path(cfg_file)
+    fd, tmp_file = tempfile.mkstemp(prefix=f".{cfg_file.name}.", suffix='.tmp', dir=str(cfg_file.parent))
+    try:
+        os.fchmod(fd, _file_mode(cfg_file))
+        with os.fdopen(fd, 'w') as fh:
+            yaml.dump(data, fh, indent=4, Dumper=IndentDumper)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_file, str(cfg_file))
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
+
+
+class ConfigWriter:
+    """
+    Saves the config in the background - changes made within ``delay`` seconds of each other are coalesced
+    into a single write, and the YAML serialization + file write run in a thread executor rather than
+    blocking the event loop.
+
+    Usage::
+
+        >>> settings.CONFIG.moderators.append('SomeUser#1234')
+        >>> CONFIG_WRITER.schedule()      # Returns straight away - the config is saved ``delay`` seconds later
+        >>> await CONFIG_WRITER.flush()   # Save any scheduled changes now (e.g. before shutting down)
+
+    """
+    def __init__(self, delay: float = settings.CONFIG_SAVE_DELAY, cfg_file: Union[str, Path] = settings.CONFIG_FILE):
+        self.delay = delay
+        self.cfg_file = cfg_file
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def pending(self) -> bool:
+        """``True`` if there are changes which haven't been written yet"""
+        return self._dirty
+
+    def schedule(self):
+        """Save :data:`.settings.CONFIG` in ``delay`` seconds, along with any other changes made until then"""
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(self.delay)
+        # Changes made while the previous write was running need another write
+        while self._dirty:
+            await self._save()
+
+    async def _save(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Writes are serialized, so an older snapshot can never replace a newer one
+        async with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # Snapshot the config on the event loop, so it can't be changed while it's being serialized
+            data = copy.deepcopy(dict(settings.CONFIG))
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, _write_config, data, self.cfg_file)
+            except Exception:
+                self._dirty = True
+                raise
+
+    async def flush(self):
+        """Write any scheduled changes immediately, instead of waiting for the delay to pass"""
+        await self._save()
+        # The scheduled save is either still sleeping, or waiting for the lock - either way there's nothing left for it to write
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+
+CONFIG_WRITER = ConfigWriter()
+"""Saves :data:`.settings.CONFIG` in the background for :func:`.asave_config`"""
+
+
+async def asave_config(data: Union[DictObject, dict] = None, wait=False) -> Union[DictObject, dict]:
+    """
+    Async version of :func:`.save_config` - schedules a background save with :data:`.CONFIG_WRITER`,
+    and returns without waiting for it, unless ``wait`` is ``True``.
+    """
+    if data not in [None, '']:
+        settings.CONFIG.update(data)
+    CONFIG_WRITER.schedule()
+    if wait:
+        await CONFIG_WRITER.flush()
+    return settings.CONFIG
+
+
+def _init_logging():
+    from privex.loghelper import LogHelper
+    _lh = LogHelper('approvalbot', level=settings.LOG_LEVEL, handler_level=settings.LOG_LEVEL)
+    _lh.add_console_handler()
+
+
+def _init_data_dir():
+    for folder in (settings.DATA_DIR, Path(pvx_settings.SQLITE_APP_DB_FOLDER)):
+        if not folder.exists():
+            log.debug("Data folder doesn't exist, creating it: %s", folder)
+            os.makedirs(folder, exist_ok=True)
+
+
+def _init_cache():
+    try:
+        log.debug("Setting cache adapter to: %s", settings.CACHE_ADAPTER)
+        adapter_set(settings.CACHE_ADAPTER)
+        log.debug("Setting async cache adapter to: %s", settings.CACHE_ADAPTER)
+        async_adapter_set(settings.CACHE_ADAPTER)
+    except KeyError as e:
+        if 'not found in category' in str(e):
+            print_err(f" [ERROR] Invalid settings.CACHE_ADAPTER setting '{settings.CACHE_ADAPTER}', valid cache adapter options: memory, sqlite3, redis, memcached")
+        else:
+            print_err(f" [ERROR] A KeyError was raised while loading cache adapter '{settings.CACHE_ADAPTER}' - reason: {e!s}")
+        sys.exit(4)
+    except (AttributeError, IndexError, ImportError) as e:
+        print_err(f" [ERROR] !!! Failed to set cache adapter to '{settings.CACHE_ADAPTER}', exception message: {type(e)} - {e!s}")
+        print_err(f" [ERROR] Packages required for that cache adapter may be missing, please run 'pipenv install', or 'pip3 install -U \"privex-helpers[cache]\"'")
+        sys.exit(3)
+
+
+def _init_config():
+    if not settings.CONFIG_FILE.exists():
+        save_config()
+    load_config()
+
+
+def _init_token():
+    if empty(settings.TOKEN) or settings.TOKEN == 'MyBotToken':
+        print_err("ERROR! You must set TOKEN in your .env file to a valid Discord Bot token")
+        print_err("You can create and manage a Discord bot on the Discord developer portal here: https://discord.com/developers/applications")
+        sys.exit(2)
+
+
+INIT_STAGES: Dict[str, Callable[[], None]] = {
+    'logging': _init_logging,
+    'data_dir': _init_data_dir,
+    'cache': _init_cache,
+    'config': _init_config,
+    'token': _init_token,
+}
+"""The startup stages ran by :func:`.init`, in the order they're ran when starting the bot"""
+
+INIT_REQUIRES: Dict[str, List[str]] = {
+    'cache': ['data_dir'],
+}
+"""Stages which have to run before another stage - e.g. the ``sqlite3`` cache adapter stores it's DB in the data folder"""
+
+_init_done: Set[str] = set()
+
 
-load_config()
+def init(*stages: str) -> Set[str]:
+    """
+    Run the startup ``stages`` (default: all of :data:`.INIT_STAGES`) which haven't already been ran,
+    along with any stages they require. Returns the names of every stage which has ran so far.
 
+        >>> init('data_dir', 'cache')
+        {'data_dir', 'cache'}
 
-if empty(settings.TOKEN) or settings.TOKEN == 'MyBotToken':
-    print_err("ERROR! You must set TOKEN in your .env file to a valid Discord Bot token")
-    print_err("You can create and manage a Discord bot on the Discord developer portal here: https://discord.com/developers/applications")
-    sys.exit(2)
+    """
+    for name in stages or INIT_STAGES.keys():
+        if name in _init_done:
+            continue
+        for required in INIT_REQUIRES.get(name, []):
+            init(required)
+        log.debug("Running startup stage: %s", name)
+        INIT_STAGES[name]()
+        _init_done.add(name)
+    return set(_init_done)
 
@@ -0,0 +1,279 @@
+"""
+Metrics - latency histograms and counters, served over HTTP in the Prometheus text format
+
+Recording a metric is only a few additions, so the collectors are always active - they're only exposed
+over HTTP when ``METRICS_PORT`` is set, by :func:`.start_server`::
+
+    $ curl http://127.0.0.1:9500/metrics
+    # HELP approvalbot_votes_total Votes made on approval polls
+    # TYPE approvalbot_votes_total counter
+    approvalbot_votes_total{choice="approve"} 12
+    ...
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from bisect import bisect_left
+from functools import wraps
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from approvalbot import settings
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+__all__ = [
+    'Counter', 'Gauge', 'Histogram', 'REGISTRY', 'render', 'timed', 'timed_call', 'start_server', 'stop_server',
+    'HANDLER_SECONDS', 'STEP_SECONDS', 'QUERY_SECONDS', 'DISCORD_SECONDS', 'OUTBOUND_QUEUE',
+    'VOTES', 'POLLS_CREATED', 'MAJORITY_EVENTS', 'ACK_MARGIN_SECONDS', 'ACK_MISSED',
+]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Histogram buckets (in seconds) for handlers and Discord API calls"""
+QUERY_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+"""Histogram buckets (in seconds) for SQLite queries, which are usually well under a millisecond"""
+ACK_BUCKETS: Tuple[float, ...] = (-1.0, 0.0, 0.5, 1.0, 1.5, 2.0, 2.25, 2.5, 2.75, 2.9)
+"""Histogram buckets (in seconds) for the time left of Discord's 3 second deadline when an interaction is acknowledged"""
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    type_name: str = ''
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        REGISTRY.append(self)
+
+    def _render(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.type_name}", *self._render()])
+
+
+class Counter(_Metric):
+    """
+    A total which only goes up, optionally split by label values::
+
+        >>> VOTES.inc('approve')
+
+    """
+    type_name = 'counter'
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _render(self) -> List[str]:
+        if not self.labels and not self._values:
+            return [f"{self.name} 0"]
+        return [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """A value which can go up and down - either :meth:`.set` directly, or read from a function when it's scraped"""
+    type_name = 'gauge'
+
+    def __init__(self, name: str, doc: str):
+        super().__init__(name, doc)
+        self.value: float = 0
+        self._func: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, func: Callable[[], float]):
+        """Read the gauge's value from ``func`` each time the metrics are scraped"""
+        self._func = func
+
+    def _render(self) -> List[str]:
+        return [f"{self.name} {self._func() if self._func is not None else self.value}"]
+
+
+class Histogram(_Metric):
+    """
+    Counts observations (e.g. latencies in seconds) into buckets, optionally split by label values::
+
+        >>> start = time.perf_counter()
+        >>> ...
+        >>> QUERY_SECONDS.observe(time.perf_counter() - start, 'SELECT')
+
+    Each observation is a binary search over the buckets plus two additions - only the bucket an observation
+    falls into is incremented, the cumulative ``le`` counts Prometheus expects are only summed when rendered.
+    """
+    type_name = 'histogram'
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+ one for +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        v = self._values.get(label_values)
+        if v is None:
+            v = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        v[0][bisect_left(self.buckets, value)] += 1
+        v[1] += value
+
+    def _render(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+"""Every metric created, in the order they're rendered by :func:`.render`"""
+
+
+def render() -> str:
+    """Render every metric in :data:`.REGISTRY` in the Prometheus text exposition format"""
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+HANDLER_SECONDS = Histogram(
+    'approvalbot_handler_seconds', "Time taken to handle a slash command / button click", ['handler']
+)
+STEP_SECONDS = Histogram(
+    'approvalbot_step_seconds', "Time taken by steps within a handler, e.g. permission checks", ['step']
+)
+QUERY_SECONDS = Histogram(
+    'approvalbot_sqlite_query_seconds', "Time taken by Approvals DB queries, by statement type", ['statement'],
+    buckets=QUERY_BUCKETS
+)
+DISCORD_SECONDS = Histogram('approvalbot_discord_api_seconds', "Time taken by Discord API calls", ['call'])
+OUTBOUND_QUEUE = Gauge('approvalbot_outbound_queue_depth', "Poll message edits waiting to be sent to Discord")
+VOTES = Counter('approvalbot_votes_total', "Votes made on approval polls", ['choice'])
+POLLS_CREATED = Counter('approvalbot_polls_created_total', "Approval polls created")
+MAJORITY_EVENTS = Counter('approvalbot_majority_events_total', "Polls which reached a majority", ['outcome'])
+ACK_MARGIN_SECONDS = Histogram(
+    'approvalbot_ack_deadline_margin_seconds',
+    "Time left of Discord's 3 second deadline when an interaction was acknowledged (negative if it was missed)",
+    ['handler'], buckets=ACK_BUCKETS
+)
+ACK_MISSED = Counter(
+    'approvalbot_ack_deadline_missed_total', "Interactions acknowledged after Discord's 3 second deadline", ['handler']
+)
+
+
+def timed(histogram: Histogram, *label_values: str):
+    """
+    Decorator which records how long each call of a function (sync or async) takes in ``histogram``. Put it
+    below ``@bot.command`` / ``@interactions.option``, as it keeps the function's signature::
+
+        >>> @bot.component("approve")
+        ... @timed(HANDLER_SECONDS, 'approve')
+        ... async def approve_handler(ctx): ...
+
+    """
+    def decorator(func):
+        if not asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, *label_values)
+            return sync_wrapper
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *label_values)
+        return wrapper
+    return decorator
+
+
+async def timed_call(histogram: Histogram, label: str, aw: Awaitable[T]) -> T:
+    """Await ``aw`` (e.g. a Discord API call), recording how long it took in ``histogram`` under ``label``"""
+    start = time.perf_counter()
+    try:
+        return await aw
+    finally:
+        histogram.observe(time.perf_counter() - start, label)
+
+
+_server: Optional[asyncio.AbstractServer] = None
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Read (and ignore) the headers
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', render().encode()
+        else:
+            status, body = '404 Not Found', b'Not Found - metrics are served at /metrics\n'
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = None, port: int = None) -> Optional[asyncio.AbstractServer]:
+    """
+    Serve the metrics at ``http://host:port/metrics`` (default: ``METRICS_HOST`` / ``METRICS_PORT``).
+    Does nothing if the port is ``0`` (the default), or the server is already running.
+    """
+    global _server
+    host = settings.METRICS_HOST if host is None else host
+    port = settings.METRICS_PORT if port is None else port
+    if _server is not None or not port:
+        return _server
+    _server = await asyncio.start_server(_handle, host, port)
+    log.info("Serving metrics at http://%s:%s/metrics", host, port)
+    return _server
+
+
+async def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
@@ -19,37 +19,148 @@ Copyright::
     |                                                   |
     +===================================================+
 """
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
+import ast
+import asyncio
+import heapq
 import json
 import logging
 import math
+import pickle
+import re
 import time
-from typing import List, Tuple, Union, Dict, Any, Optional
+from typing import AsyncIterator, Awaitable, Callable, FrozenSet, Hashable, Iterable, List, Tuple, Union, Dict, Any, Optional
 # import approvalbot.core as core
 from os.path import join
+from urllib.parse import urlsplit, urlunsplit
 from approvalbot import settings
-from privex.helpers.cache import adapter_get
+from approvalbot.core import init
+from approvalbot.metrics import QUERY_SECONDS
+from privex.helpers.cache import adapter_get, async_adapter_get, AsyncCacheAdapter
 from privex.helpers import empty, empty_if, convert_unixtime_datetime, dec_round, DictDataClass, DictObject, convert_datetime
 from privex.helpers.exceptions import NotFound
 from privex.db import SqliteAsyncWrapper
+from privex.db.base import cursor_to_dict
 from privex.db.types import DICT_CORO
-from dataclasses import dataclass, field
+import aiosqlite
+from dataclasses import dataclass, field, fields as dataclass_fields
 
 log = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A small in-process LRU cache, where each entry also expires ``ttl`` seconds after it was set.
+
+    Once the cache holds more than ``maxsize`` entries, the least recently used entries are evicted.
+
+    Usage::
+
+        >>> c = TTLCache(maxsize=100, ttl=60)
+        >>> c.set((1234, 5678), True)
+        >>> c.get((1234, 5678))
+        True
+        >>> # Remove every entry for guild 1234
+        >>> c.remove_where(lambda k: k[0] == 1234)
+        1
+
+    """
+    def __init__(self, maxsize: int = 1000, ttl: Union[int, float] = 300):
+        self.maxsize, self.ttl = int(maxsize), float(ttl)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            return default
+        if expires <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Union[int, float] = None):
+        """Set ``key`` to ``value`` - expiring after ``ttl`` seconds (defaults to :attr:`.ttl`)"""
+        ttl = self.ttl if ttl is None else float(ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def remove(self, key: Hashable) -> bool:
+        """Remove ``key`` from the cache, returns ``True`` if it was present"""
+        return self._data.pop(key, None) is not None
+
+    def remove_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key which ``predicate(key)`` returns ``True`` for, returns the amount of keys removed"""
+        keys = [k for k in self._data.keys() if predicate(k)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
 class MessageStore:
+    """
+    A poll's votes and request details, stored in the cache under ``aprv:message:<msgid>``.
+
+    Setting a field only marks it as dirty - the data is written back to the cache once, by :meth:`.flush`.
+    Outside of a ``with`` block, each change is flushed straight away, while within one, every change made
+    in the block is flushed together when it exits::
+
+        >>> with MessageStore(12345) as m:
+        ...     m.approve('SomeUser#1234')    # removes a disapproval, adds an approval - one cache write
+        ...     m.reason = "Spam links"
+
+    Entries expire ``MESSAGE_STORE_GRACE`` seconds after the poll's ``end_time`` (if it was passed to
+    :meth:`.create`), so the cache only holds the polls which are still open - plus a little while after.
+
+    From async code (e.g. command handlers), use the async API instead, which uses the async cache adapter
+    so the event loop isn't blocked while waiting on Redis / Memcached / SQLite::
+
+        >>> m = await MessageStore.acreate(12345, action="delete", post="https://example.com", end_time=aprv.end_time)
+        >>> m = await MessageStore(12345, load=False).aload()
+        >>> async with m:
+        ...     m.approve('SomeUser#1234')
+        >>> stores = await MessageStore.aload_many([12345, 12346])   # one round trip with Redis
+
+    The ``memory`` adapter keeps separate stores for the sync and async APIs, so stick to one of them.
+    """
     data: dict
     # cache_key: str
 
-    def __init__(self, msgid: int):
+    def __init__(self, msgid: int, data: Optional[dict] = None, load: bool = True):
+        """
+        Loads the data for ``msgid`` from the (sync) cache, unless ``data`` is passed, or ``load`` is ``False`` -
+        leaving it empty until :meth:`.aload` is awaited.
+        """
         self.msgid = self.id = msgid
+        # Make sure settings.CACHE_ADAPTER has been set, in case the bot's startup stages haven't been ran
+        init('cache')
         self.cache = cache = adapter_get()
+        self.acache: AsyncCacheAdapter = async_adapter_get()
         # self.cache_key = f"aprv:message:{msgid}"
-        log.debug("MessageStore initialised - getting data for key: %s", self.cache_key)
-        self.data = self._load()
-        log.debug("MessageStore key '%s' contains: %s", self.cache_key, self.data)
+        self.dirty: set = set()
+        """The names of the fields changed since the last :meth:`.flush`"""
+        self._depth = 0
+        if data is None:
+            data = self._load() if load else {}
+        self.data = data
 
     @property
     def cache_key(self) -> str:
@@ -59,22 +170,120 @@ class MessageStore:
         return self.cache.get(self.cache_key, {})
     
     def reload(self):
+        """Re-load the data from the cache - discarding any changes which haven't been flushed"""
         self.data = self._load()
+        self.dirty.clear()
 
-    """
-    Create a new message object in the cache using passed data
+    @staticmethod
+    def ttl_for(data: dict) -> int:
+        """
+        How many seconds the cache entry holding ``data`` should be kept for - until ``MESSAGE_STORE_GRACE`` seconds
+        after the poll's ``end_time``, or after the default approval length if it doesn't have one
+        """
+        end_time = data.get('end_time')
+        if end_time is None:
+            return settings.DEFAULT_APPROVAL_END + settings.MESSAGE_STORE_GRACE
+        return max(int(end_time - time.time()), 0) + settings.MESSAGE_STORE_GRACE
 
-    Usage:
+    @property
+    def ttl(self) -> int:
+        return self.ttl_for(self.data)
+
+    def flush(self) -> bool:
+        """Write the data back to the cache if any fields have changed - returns ``True`` if it was written"""
+        if not self.dirty:
+            return False
+        self.cache.set(self.cache_key, self.data, timeout=self.ttl)
+        self.dirty.clear()
+        return True
+
+    def _changed(self, name: str):
+        self.dirty.add(name)
+        if self._depth == 0:
+            self.flush()
+
+    def __enter__(self) -> "MessageStore":
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self.flush()
+
+    async def aload(self) -> "MessageStore":
+        """(Re-)load the data from the async cache - discarding any changes which haven't been flushed"""
+        self.data = empty_if(await self.acache.get(self.cache_key), {})
+        self.dirty.clear()
+        return self
+
+    async def aflush(self) -> bool:
+        """Async version of :meth:`.flush` - write the data back to the async cache if any fields have changed"""
+        if not self.dirty:
+            return False
+        await self.acache.set(self.cache_key, self.data, timeout=self.ttl)
+        self.dirty.clear()
+        return True
+
+    async def __aenter__(self) -> "MessageStore":
+        self._depth += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if self._depth == 0:
+            await self.aflush()
+
+    @classmethod
+    async def acreate(cls, msgid: int, end_time: Optional[Union[datetime, int, float]] = None, **data) -> "MessageStore":
+        """Async version of :meth:`.create` - stores the new message's data using the async cache adapter"""
+        if end_time is not None:
+            data['end_time'] = end_time.timestamp() if isinstance(end_time, datetime) else end_time
+        m = cls(msgid, data=dict(data))
+        m.dirty.update(data.keys())
+        await m.aflush()
+        return m
+
+    @classmethod
+    async def aload_many(cls, msgids: Iterable[int]) -> List["MessageStore"]:
+        """Load the stores for each of ``msgids`` from the async cache at once - see :func:`.cache_get_many`"""
+        stores = [cls(msgid, load=False) for msgid in msgids]
+        if len(stores) > 0:
+            values = await cache_get_many(stores[0].acache, [m.cache_key for m in stores])
+            for m, data in zip(stores, values):
+                m.data = empty_if(data, {})
+        return stores
+
+    @staticmethod
+    async def aflush_many(stores: Iterable["MessageStore"]) -> int:
+        """
+        Flush every store in ``stores`` which has changes at once - see :func:`.cache_set_many`.
+        Returns the number of stores which were written.
+        """
+        dirty = [m for m in stores if m.dirty]
+        if len(dirty) > 0:
+            await cache_set_many(dirty[0].acache, [(m.cache_key, m.data, m.ttl) for m in dirty])
+            for m in dirty:
+                m.dirty.clear()
+        return len(dirty)
 
-        >>> MessageStore.create(12345, action="delete", reason="spam", post="https://example.com" approval_type="approval")
-    
-    """
     @classmethod
-    def create(cls: "MessageStore", msgid: int, **data):
-        log.debug("CLASSMETHOD Creating MessageStore object with message ID '%s' and data: %s", msgid, data)
-        cache = adapter_get()
-        cache.set(f"aprv:message:{msgid}", dict(data))
-        return cls(msgid)
+    def create(cls: "MessageStore", msgid: int, end_time: Optional[Union[datetime, int, float]] = None, **data):
+        """
+        Create a new message object in the cache using passed data
+
+        Usage:
+
+            >>> MessageStore.create(12345, action="delete", reason="spam", post="https://example.com" approval_type="approval",
+            ...                     end_time=aprv.end_time)
+
+        """
+        if end_time is not None:
+            data['end_time'] = end_time.timestamp() if isinstance(end_time, datetime) else end_time
+        m = cls(msgid, data=dict(data))
+        m.dirty.update(data.keys())
+        m.flush()
+        return m
     
     @property
     def message(self):
@@ -83,7 +292,7 @@ class MessageStore:
     @message.setter
     def message(self, value):
         self.data['message'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('message')
     
     @property
     def reason(self):
@@ -92,8 +301,8 @@ class MessageStore:
     @reason.setter
     def reason(self, value):
         self.data['reason'] = value
-        self.cache.set(self.cache_key, self.data)
-
+        self._changed('reason')
+    
     @property
     def action(self):
         return self.data.get('action', None)
@@ -101,7 +310,7 @@ class MessageStore:
     @action.setter
     def action(self, value):
         self.data['action'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('action')
     
     @property
     def post(self):
@@ -110,7 +319,7 @@ class MessageStore:
     @post.setter
     def post(self, value):
         self.data['post'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('post')
     
     @property
     def sender(self):
@@ -119,8 +328,8 @@ class MessageStore:
     @sender.setter
     def sender(self, value):
         self.data['sender'] = value
-        self.cache.set(self.cache_key, self.data)
-
+        self._changed('sender')
+    
     @property
     def approval_type(self):
         return self.data.get('approval_type', None)
@@ -128,7 +337,17 @@ class MessageStore:
     @approval_type.setter
     def approval_type(self, value):
         self.data['approval_type'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('approval_type')
+
+    @property
+    def end_time(self) -> Optional[float]:
+        """When voting on the poll ends, as a unix timestamp - used to set the cache entry's expiry"""
+        return self.data.get('end_time', None)
+
+    @end_time.setter
+    def end_time(self, value: Union[datetime, int, float]):
+        self.data['end_time'] = value.timestamp() if isinstance(value, datetime) else value
+        self._changed('end_time')
 
     @property
     def approvals(self):
@@ -137,7 +356,7 @@ class MessageStore:
     @approvals.setter
     def approvals(self, value):
         self.data['approvals'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('approvals')
     
     @property
     def approvals_list(self) -> list:
@@ -148,7 +367,7 @@ class MessageStore:
     @approvals_list.setter
     def approvals_list(self, value: list):
         self.data['approvals_list'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('approvals_list')
 
     @property
     def disapprovals_list(self) -> list:
@@ -159,7 +378,7 @@ class MessageStore:
     @disapprovals_list.setter
     def disapprovals_list(self, value: list):
         self.data['disapprovals_list'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('disapprovals_list')
 
     @property
     def disapprovals(self):
@@ -168,29 +387,36 @@ class MessageStore:
     @disapprovals.setter
     def disapprovals(self, value):
         self.data['disapprovals'] = value
-        self.cache.set(self.cache_key, self.data)
+        self._changed('disapprovals')
 
     def approve(self, user: str) -> int:
-        if user not in self.approvals_list:
-            if user in self.disapprovals_list:
-                log.info("User %s previously disapproved the poll and now wants to approve it - removing their disapproval vote for: %r", user, self)
-                self.disapprovals_list.remove(user)
-                self.disapprovals -= 1
-            log.info("User %s approved: %s", user, self)
-            self.approvals += 1
-            self.approvals_list.append(user)
-            log.info("Poll for post/user %s now has %s approvals, approved by: %s", self.post, self.approvals, self.approvals_list)
+        """Add an approval vote from ``user`` (removing their disapproval, if they made one) - flushed in one write"""
+        with self:
+            if user not in self.approvals_list:
+                if user in self.disapprovals_list:
+                    log.info("User %s previously disapproved the poll and now wants to approve it - removing their disapproval vote for: %r", user, self)
+                    self.disapprovals_list.remove(user)
+                    self._changed('disapprovals_list')
+                    self.disapprovals -= 1
+                self.approvals += 1
+                self.approvals_list.append(user)
+                self._changed('approvals_list')
+                log.info("Poll for post/user %s now has %s approvals, approved by: %s", self.post, self.approvals, self.approvals_list)
         return self.approvals
 
     def disapprove(self, user: str) -> int:
-        if user not in self.disapprovals_list:
-            if user in self.approvals_list:
-                log.info("User %s previously approved the poll and now wants to disapprove it - removing their approval vote for: %r", user, self)
-                self.approvals_list.remove(user)
-                self.approvals -= 1
-            self.disapprovals += 1
-            self.disapprovals_list.append(user)
-            log.info("Poll for post/user %s now has %s disapprovals, disapproved by: %s", self.post, self.disapprovals, self.disapprovals_list)
+        """Add a disapproval vote from ``user`` (removing their approval, if they made one) - flushed in one write"""
+        with self:
+            if user not in self.disapprovals_list:
+                if user in self.approvals_list:
+                    log.info("User %s previously approved the poll and now wants to disapprove it - removing their approval vote for: %r", user, self)
+                    self.approvals_list.remove(user)
+                    self._changed('approvals_list')
+                    self.approvals -= 1
+                self.disapprovals += 1
+                self.disapprovals_list.append(user)
+                self._changed('disapprovals_list')
+                log.info("Poll for post/user %s now has %s disapprovals, disapproved by: %s", self.post, self.disapprovals, self.disapprovals_list)
         return self.disapprovals
     
     def __str__(self) -> str:
@@ -199,6 +425,39 @@ class MessageStore:
     def __repr__(self) -> str:
         return f"<MessageStore {self.id=} {self.action=} {self.reason=} {self.post=} {self.data=} />"
 
+def _uses_redis(cache: AsyncCacheAdapter) -> bool:
+    """``True`` if ``cache`` is an ``AsyncRedisCache`` which pickles values (checked by name, to avoid importing redis)"""
+    return type(cache).__name__ == 'AsyncRedisCache' and getattr(cache, 'use_pickle', False)
+
+
+async def cache_get_many(cache: AsyncCacheAdapter, keys: List[str]) -> List[Any]:
+    """
+    Get each of ``keys`` from the async cache adapter ``cache`` - returning ``None`` for keys which aren't set.
+
+    With Redis, they're fetched with a single ``MGET``, otherwise the gets are ran concurrently.
+    """
+    if _uses_redis(cache):
+        r = await cache.redis
+        return [None if empty(v) else pickle.loads(v) for v in await r.mget(keys)]
+    return list(await asyncio.gather(*[cache.get(k) for k in keys]))
+
+
+async def cache_set_many(cache: AsyncCacheAdapter, items: Iterable[Tuple[str, Any, int]]):
+    """
+    Set each ``(key, value, timeout)`` in ``items`` in the async cache adapter ``cache``.
+
+    With Redis, they're sent as one pipeline (a single round trip), otherwise the sets are ran concurrently.
+    """
+    if _uses_redis(cache):
+        r = await cache.redis
+        async with r.pipeline(transaction=False) as pipe:
+            for k, v, timeout in items:
+                pipe.setex(k, timeout, pickle.dumps(v))
+            await pipe.execute()
+        return
+    await asyncio.gather(*[cache.set(k, v, timeout=timeout) for k, v, timeout in items])
+
+
 def now_plus_seconds(seconds: int) -> datetime:
     """Return the current time plus ``seconds`` seconds as a :class:`.datetime`"""
     return convert_unixtime_datetime(time.time() + int(seconds))
@@ -216,6 +475,50 @@ def now_plus_days(days: Union[int, float, Decimal]) -> datetime:
     return now_plus_seconds(dec_round(days, 3) * Decimal(60 * 60 * 24))
 
 
+def _load_list(data: Optional[str]) -> list:
+    """
+    Decode a JSON list column, falling back to :func:`ast.literal_eval` for lists which were
+    stored as a Python ``str(list)`` by older versions of :meth:`.ApprovalsDB.create`
+    """
+    if empty(data):
+        return []
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return list(ast.literal_eval(data))
+
+
+_MASTODON_STATUS = re.compile(r'^/users/([^/]+)/statuses/(\d+)$')
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalise a post/user URL, so that the different forms of the same URL can be matched against each other.
+
+    The scheme and host are lowercased (with ``http`` treated as ``https``, and ``www.`` / default ports removed),
+    the query string, fragment and trailing slashes are dropped, and Mastodon's ``/users/<user>/statuses/<id>``
+    form is converted to the ``/@<user>/<id>`` form.
+
+        >>> canonical_url('HTTP://www.Mastodon.social/users/john/statuses/1234/?utm_source=x#replies')
+        'https://mastodon.social/@john/1234'
+        >>> canonical_url('https://mastodon.social/@john/1234')
+        'https://mastodon.social/@john/1234'
+
+    """
+    url = url.strip()
+    parts = urlsplit(url if '://' in url else f'https://{url}')
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port is not None and parts.port not in [80, 443]:
+        host = f"{host}:{parts.port}"
+    path = re.sub(r'/{2,}', '/', parts.path).rstrip('/')
+    status = _MASTODON_STATUS.match(path)
+    if status is not None:
+        path = f"/@{status.group(1)}/{status.group(2)}"
+    return urlunsplit(('https', host, path, '', ''))
+
+
 def default_endtime() -> datetime:
     """Return the default approval end time as a :class:`.datetime` object"""
     return now_plus_seconds(settings.DEFAULT_APPROVAL_END)
@@ -223,6 +526,13 @@ def default_endtime() -> datetime:
 def datetime_to_unix(d: datetime):
     return int(d.timestamp())
 
+DISCORD_EPOCH = 1420070400000
+"""The first millisecond of 2015 - Discord snowflake IDs count milliseconds from this unix time"""
+
+def snowflake_to_unix(snowflake: Union[int, str]) -> float:
+    """Return the unix time (in seconds, with milliseconds) that the Discord ID ``snowflake`` was created at"""
+    return ((int(snowflake) >> 22) + DISCORD_EPOCH) / 1000
+
 def get_relative_seconds(from_dt: datetime, to_dt: datetime = None):
     to_dt = datetime_to_unix(datetime.utcnow()) if to_dt is None else datetime_to_unix(to_dt)
     from_dt = datetime_to_unix(from_dt)
@@ -260,6 +570,48 @@ def auto_relative(from_dt: datetime, to_dt: datetime = None):
 # "end_time DATETIME DEFAULT (datetime('now', '+1 hours')), "
 # "timestamp DATETIME DEFAULT CURRENT_TIMESTAMP"
 
+class RoleIndex:
+    """
+    A snapshot of the bot's moderator/admin lists and voting settings from a config dict, with the
+    eligible voter count and majority threshold pre-computed - so that role checks are ``O(1)`` set
+    lookups, instead of scanning the config's lists on every vote.
+
+    It must be rebuilt whenever the config changes.
+
+        >>> roles = RoleIndex(dict(moderators=['JohnDoe#1234', 'JaneDoe#4200'], admins=['SomeUser#1234']))
+        >>> roles.is_moderator('JohnDoe#1234')
+        True
+        >>> roles.eligible, roles.majority
+        (2, 2)
+
+    """
+    __slots__ = (
+        'moderators', 'admins', 'mods_admins', 'admins_can_vote', 'majority_include_admins', 'eligible', 'majority'
+    )
+
+    def __init__(self, config: Union[dict, DictObject]):
+        self.moderators: FrozenSet[str] = frozenset(config.get('moderators') or [])
+        self.admins: FrozenSet[str] = frozenset(config.get('admins') or [])
+        self.mods_admins: FrozenSet[str] = self.moderators | self.admins
+        self.admins_can_vote = bool(config.get('admins_can_vote', False))
+        self.majority_include_admins = bool(config.get('majority_include_admins', False))
+        # Admins only count towards the majority if they're allowed to vote
+        elig = self.mods_admins if self.majority_include_admins and self.admins_can_vote else self.moderators
+        self.eligible: int = len(elig)
+        """The number of moderators/admins who count towards the majority"""
+        self.majority: int = self.eligible // 2 + 1
+        """The number of votes needed for a majority"""
+
+    def is_moderator(self, user: str) -> bool:
+        return user in self.moderators
+
+    def is_admin(self, user: str) -> bool:
+        return user in self.admins
+
+    def __repr__(self) -> str:
+        return f"<RoleIndex moderators={len(self.moderators)} admins={len(self.admins)} {self.eligible=} {self.majority=} />"
+
+
 class ApprovalOutcome(Enum):
     APPROVED = 'APPROVED'
     APPROVED_NO_MAJORITY = 'APPROVED_NO_MAJORITY'
@@ -279,6 +631,54 @@ class ApprovalOutcome(Enum):
     DISAPPROVED_NOMAJ = DISAPPROVED_NO_MAJORITY
 
 
+class VoteChoice(Enum):
+    APPROVE = 'approve'
+    DISAPPROVE = 'disapprove'
+
+
+class ApprovalCache:
+    """
+    Bounded LRU cache of live :class:`.Approval` objects, indexed by both their Discord message ID
+    and their database ID.
+
+    Entries expire once the approval's ``end_time`` has passed, so only open polls are kept in memory.
+    The cache is kept up to date by :meth:`.Approval.save` (write-through), and warmed by
+    :meth:`.Approval.from_db` / :meth:`.Approval.from_db_id` whenever they have to query the DB.
+    """
+    def __init__(self, maxsize: int = 500):
+        self.by_msgid = TTLCache(maxsize=maxsize)
+        self.by_id = TTLCache(maxsize=maxsize)
+
+    def get_msgid(self, msg_id: int) -> Optional["Approval"]:
+        return self.by_msgid.get(int(msg_id))
+
+    def get_id(self, id: int) -> Optional["Approval"]:
+        return self.by_id.get(int(id))
+
+    def put(self, aprv: "Approval"):
+        ttl = datetime_to_unix(aprv.end_time) - time.time()
+        if ttl <= 0:
+            return self.remove(aprv)
+        if not empty(aprv.id):
+            self.by_id.set(aprv.id, aprv, ttl=ttl)
+        if not empty(aprv.message_id):
+            self.by_msgid.set(aprv.message_id, aprv, ttl=ttl)
+
+    def remove(self, aprv: "Approval"):
+        if not empty(aprv.id):
+            self.by_id.remove(aprv.id)
+        if not empty(aprv.message_id):
+            self.by_msgid.remove(aprv.message_id)
+
+    def clear(self):
+        self.by_msgid.clear()
+        self.by_id.clear()
+
+
+APPROVAL_CACHE = ApprovalCache(maxsize=settings.APPROVAL_CACHE_SIZE)
+"""Process-wide cache of open :class:`.Approval` objects - see :class:`.ApprovalCache`"""
+
+
 @dataclass
 class Approval(DictDataClass):
     message_id: Optional[int]
@@ -295,21 +695,36 @@ class Approval(DictDataClass):
     total_all_mods: int = 0
     end_time: datetime = field(default_factory=default_endtime)
     timestamp: datetime = field(default_factory=datetime.utcnow)
+    channel_id: Optional[int] = None
+    finalized: bool = False
+    url_canonical: Optional[str] = None
+    guild_id: Optional[int] = None
     raw_data: Union[dict, DictObject] = field(default_factory=DictObject)
     
+    # approvals/disapprovals + approved_by/disapproved_by are derived from the ``votes`` table, which is
+    # written to atomically by approve() / disapprove() - so they're never written back by update()
     _UPDATE_FIELDS: Tuple[str, ...] = (
-        'message_id', 'approvals', 'disapprovals', 'approved_by', 'disapproved_by', 'outcome', 'total_all_mods'
+        'message_id', 'outcome', 'total_all_mods', 'channel_id', 'finalized'
     )
 
     def fix_fields(self):
         if isinstance(self.approved_by, str):
-            self.approved_by = json.loads(self.approved_by)
+            self.approved_by = _load_list(self.approved_by)
         if isinstance(self.disapproved_by, str):
-            self.disapproved_by = json.loads(self.disapproved_by)
+            self.disapproved_by = _load_list(self.disapproved_by)
         if self.id is not None and not isinstance(self.id, int):
             self.id = int(self.id)
         if self.message_id is not None and not isinstance(self.message_id, int):
             self.message_id = int(self.message_id)
+        if self.channel_id is not None and not isinstance(self.channel_id, int):
+            self.channel_id = int(self.channel_id)
+        if self.guild_id is not None and not isinstance(self.guild_id, int):
+            self.guild_id = int(self.guild_id)
+        if isinstance(self.outcome, str):
+            self.outcome = ApprovalOutcome(self.outcome)
+        self.finalized = bool(int(self.finalized))
+        if self.url_canonical is None and not empty(self.url):
+            self.url_canonical = canonical_url(self.url)
         if isinstance(self.timestamp, str):
             self.timestamp = convert_datetime(self.timestamp)
         if isinstance(self.end_time, str):
@@ -320,48 +735,75 @@ class Approval(DictDataClass):
 
     @classmethod
     async def from_db(cls, msg_id: int, fail=True) -> Optional["Approval"]:
+        """
+        Load an Approval by it's Discord message ID - returned from :data:`.APPROVAL_CACHE` if it's
+        an open poll which was already loaded, otherwise it's loaded from the DB and cached.
+        """
+        aprv = APPROVAL_CACHE.get_msgid(msg_id)
+        if aprv is not None:
+            return aprv
         adb = ApprovalsDB()
         o = await adb.find_approval_msgid(msg_id)
         if o is None:
             if fail:
                 raise NotFound(f"Could not find an Approval with MSG ID: {msg_id}")
             return None
-        return cls.from_dict(o).fix_fields()
+        aprv = cls.from_dict(o).fix_fields()
+        APPROVAL_CACHE.put(aprv)
+        return aprv
 
     @classmethod
-    async def from_db_id(cls, id: int, fail=True) -> Optional["Approval"]:
+    async def from_db_id(cls, id: int, fail=True, cached=True) -> Optional["Approval"]:
+        """
+        Load an Approval by it's database ID - uses :data:`.APPROVAL_CACHE` the same way as :meth:`.from_db`,
+        unless ``cached`` is ``False`` (e.g. when another process may have changed it), in which case it's always
+        loaded from the DB, and replaces any cached copy.
+        """
+        aprv = APPROVAL_CACHE.get_id(id) if cached else None
+        if aprv is not None:
+            return aprv
         adb = ApprovalsDB()
         o = await adb.find_approval(id)
         if o is None:
             if fail:
                 raise NotFound(f"Could not find an Approval with DB ID: {id}")
             return None
-        return cls.from_dict(o).fix_fields()
+        aprv = cls.from_dict(o).fix_fields()
+        APPROVAL_CACHE.put(aprv)
+        return aprv
     
     async def save(self) -> int:
         """
         Save the Approval dataclass to the SQLite DB, and return the database ID for this approval
-        """
-        adb = ApprovalsDB()
 
-        o = await adb.find_approval_msgid(self.message_id)
+        If :attr:`.id` is set, the existing row is updated, otherwise a new row is inserted - and this object is
+        refreshed from the inserted row, so it has the values the DB normalized (e.g. an ``AUTO`` outcome becomes
+        ``TIE``). The saved object is also written through to :data:`.APPROVAL_CACHE`.
+        """
         self.fix_fields()
-        if empty(o):
-            if not empty(self.id):
-                await self.update()
-            else:
-                create_data = await adb.create(
-                    self.message_id, self.action, self.url, self.reason, self.username, self.approvals,
-                    self.disapprovals, self.approved_by, self.disapproved_by, total_all_mods=self.total_all_mods,
-                    outcome=self.outcome, end_time=self.end_time
-                )
-                self.id = create_data['row_id']
-                # o = await adb.find_approval_msgid(self.message_id)
-                # self.id = o['id']
-        else:
+        if not empty(self.id):
             await self.update()
+        else:
+            adb = ApprovalsDB()
+            create_data = await adb.create(
+                self.message_id, self.action, self.url, self.reason, self.username, self.approvals,
+                self.disapprovals, self.approved_by, self.disapproved_by, total_all_mods=self.total_all_mods,
+                outcome=self.outcome, end_time=self.end_time, channel_id=self.channel_id, guild_id=self.guild_id
+            )
+            self.id = create_data['row_id']
+            row = await adb.find_approval(self.id)
+            if row is not None:
+                self.load_row(row)
+        APPROVAL_CACHE.put(self)
         return self.id
 
+    def load_row(self, row: Dict[str, Any]) -> "Approval":
+        """Replace this object's fields with the values from the DB row ``row`` (as returned by :meth:`.ApprovalsDB.find_approval`)"""
+        fresh = type(self).from_dict(row).fix_fields()
+        for f in dataclass_fields(self):
+            setattr(self, f.name, getattr(fresh, f.name))
+        return self
+
     async def update(self, fields: Tuple[str, ...] = _UPDATE_FIELDS):
         if empty(self.id):
             raise ValueError("ERROR: No ID set. You can't call update() unless Approval.id is set.")
@@ -369,34 +811,243 @@ class Approval(DictDataClass):
         data = {k: v for k, v in dict(self).items() if k in fields}
         return await adb.update(self.id, **data)
     
-    async def approve(self, user: str):
-        if user in self.disapproved_by:
-            log.debug("User previously disapproved approval, removing disapprove for user %s", user)
-            self.disapprovals -= 1
-            self.disapproved_by.remove(user)
-        if user not in self.approved_by:
-            log.debug("Adding approval for user %s", user)
-            self.approvals += 1
-            self.approved_by.append(user)
-        log.debug("Saving approval object after approved by user %s", user)
-        await self.save()
+    def apply_vote(self, user: str, choice: VoteChoice) -> bool:
+        """
+        Apply ``user``'s vote to the in-memory counters/voter lists only (it's not saved to the DB).
+
+        Returns ``True`` if the vote changed anything, or ``False`` if ``user`` had already voted ``choice``.
+        """
+        choice = VoteChoice(choice)
+        if choice == VoteChoice.APPROVE:
+            voted, other, counter, other_counter = self.approved_by, self.disapproved_by, 'approvals', 'disapprovals'
+        else:
+            voted, other, counter, other_counter = self.disapproved_by, self.approved_by, 'disapprovals', 'approvals'
+        if user in voted:
+            return False
+        if user in other:
+            log.debug("User previously voted the opposite way, removing their %s vote for user %s", other_counter, user)
+            setattr(self, other_counter, getattr(self, other_counter) - 1)
+            other.remove(user)
+        log.debug("Adding %s vote for user %s", choice.value, user)
+        setattr(self, counter, getattr(self, counter) + 1)
+        voted.append(user)
+        return True
+
+    async def save_votes(self, votes: List[Tuple[str, VoteChoice]], fields: Tuple[str, ...] = _UPDATE_FIELDS) -> int:
+        """
+        Save a batch of ``(user, choice)`` votes which were applied with :meth:`.apply_vote`, along with the
+        approval's ``fields`` (e.g. ``outcome``), in a single DB transaction.
+
+        If saving fails, the transaction is rolled back - so this approval (which may be the copy shared through
+        :data:`.APPROVAL_CACHE`) is removed from the cache, and the next load gets the votes the DB actually has.
+        """
+        if empty(self.id):
+            raise ValueError("ERROR: No ID set. You can't vote on an Approval until it has been saved.")
+        data = {k: v for k, v in dict(self).items() if k in fields}
+        try:
+            res = await ApprovalsDB().vote_many(self.id, votes, **data)
+        except BaseException:
+            APPROVAL_CACHE.remove(self)
+            raise
+        APPROVAL_CACHE.put(self)
+        return res
+
+    async def approve(self, user: str, save=True):
+        if self.apply_vote(user, VoteChoice.APPROVE):
+            await self.save_votes([(user, VoteChoice.APPROVE)], fields=())
+        if save:
+            log.debug("Saving approval object after approved by user %s", user)
+            await self.save()
         return self.approvals
 
-    async def disapprove(self, user: str):
+    async def disapprove(self, user: str, save=True):
         log.debug("Approval.disapprove being ran")
-        if user in self.approved_by:
-            log.debug("User previously approved approval, removing approve for user %s", user)
-            self.approvals -= 1
-            self.approved_by.remove(user)
-        if user not in self.disapproved_by:
-            log.debug("Adding disapproval for user %s", user)
-            self.disapprovals += 1
-            self.disapproved_by.append(user)
-        log.debug("Saving approval object after disapproved by user %s", user)
-        await self.save()
+        if self.apply_vote(user, VoteChoice.DISAPPROVE):
+            await self.save_votes([(user, VoteChoice.DISAPPROVE)], fields=())
+        if save:
+            log.debug("Saving approval object after disapproved by user %s", user)
+            await self.save()
         return self.disapprovals
 
 
+class VoteDispatcher:
+    """
+    Serializes votes per poll (Discord message ID), so that concurrent button clicks on the same poll
+    can't interleave their load / save / message edit steps.
+
+    Each poll with pending votes gets a single consumer task. Every click which queued up while the
+    consumer was busy is passed to ``handler`` as one batch, so it can be saved with one commit and shown
+    with one message edit. Once a poll's queue is empty, it's consumer task exits and the poll's entries
+    are removed, so idle polls don't use any memory.
+
+    Usage::
+
+        >>> async def process_votes(msg_id: int, batch: List[Any]):
+        ...     # load the poll, apply every vote in batch, save once, edit once
+        ...     ...
+        >>> dispatcher = VoteDispatcher(process_votes)
+        >>> # Returns once the batch containing this vote has been handled (re-raises any exception from handler)
+        >>> await dispatcher.submit(ctx.message.id, vote)
+
+    """
+    def __init__(self, handler: Callable[[int, List[Any]], Any]):
+        self.handler = handler
+        self._queues: Dict[int, List[Tuple[Any, asyncio.Future]]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def submit(self, msg_id: int, vote: Any) -> Any:
+        msg_id = int(msg_id)
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(msg_id, []).append((vote, fut))
+        if msg_id not in self._tasks:
+            self._tasks[msg_id] = asyncio.create_task(self._consume(msg_id))
+        return await fut
+
+    async def _consume(self, msg_id: int):
+        try:
+            while len(self._queues.get(msg_id, [])) > 0:
+                pending = self._queues.pop(msg_id)
+                log.debug("Processing batch of %s vote(s) for message ID %s", len(pending), msg_id)
+                try:
+                    res = await self.handler(msg_id, [v for v, _ in pending])
+                    for _, fut in pending:
+                        if not fut.done(): fut.set_result(res)
+                except Exception as e:
+                    for _, fut in pending:
+                        if not fut.done(): fut.set_exception(e)
+        finally:
+            self._tasks.pop(msg_id, None)
+            for _, fut in self._queues.pop(msg_id, []):
+                fut.cancel()
+
+    @property
+    def active(self) -> int:
+        """Number of polls which currently have votes being processed"""
+        return len(self._tasks)
+
+
+class EditCoalescer:
+    """
+    Coalesces bursts of message edits, so each message is edited at most once per ``window`` seconds.
+
+    The first edit for a message runs straight away. Any edits scheduled for that message during the
+    following ``window`` seconds replace each other, and only the latest one is ran once the window is
+    over - so the final state is always flushed, no matter how many edits were scheduled.
+
+    Usage::
+
+        >>> edits = EditCoalescer(window=1.0)
+        >>> # ``edit`` should be a function which returns a coroutine, e.g. a lambda or an async function
+        >>> edits.schedule(msg_id, lambda: ctx.edit(embeds=embeds))
+        >>> # Run all pending edits immediately (e.g. before shutting down)
+        >>> await edits.close()
+
+    """
+    def __init__(self, window: Union[int, float] = 1.0):
+        self.window = float(window)
+        self._pending: Dict[int, Callable[[], Awaitable]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def schedule(self, msg_id: int, edit: Callable[[], Awaitable]):
+        msg_id = int(msg_id)
+        self._pending[msg_id] = edit
+        if msg_id not in self._tasks:
+            self._tasks[msg_id] = asyncio.create_task(self._flusher(msg_id))
+
+    async def _run(self, msg_id: int, edit: Callable[[], Awaitable]):
+        try:
+            await edit()
+        except Exception:
+            log.exception("Error while editing message ID %s", msg_id)
+
+    async def _flusher(self, msg_id: int):
+        try:
+            while msg_id in self._pending:
+                await self._run(msg_id, self._pending.pop(msg_id))
+                # Hold the slot for this message until the window is over, so any edits scheduled
+                # in the meantime are merged into one
+                await asyncio.sleep(self.window)
+        finally:
+            self._tasks.pop(msg_id, None)
+
+    @property
+    def pending(self) -> int:
+        """Number of messages which have an edit waiting to be flushed"""
+        return len(self._pending)
+
+    async def close(self):
+        """Cancel the flush timers, and run every pending edit immediately"""
+        for t in list(self._tasks.values()):
+            t.cancel()
+        self._tasks.clear()
+        pending, self._pending = self._pending, {}
+        for msg_id, edit in pending.items():
+            await self._run(msg_id, edit)
+
+
+class ExpiryScheduler:
+    """
+    Calls ``handler(key)`` once each key's deadline (a UNIX timestamp) has passed.
+
+    Deadlines are kept in a min-heap, and a single task sleeps until the earliest one - rather than
+    polling - waking up early if an earlier deadline is added.
+
+    Usage::
+
+        >>> async def finalize(approval_id: int):
+        ...     ...
+        >>> expiry = ExpiryScheduler(finalize)
+        >>> expiry.add(5, datetime_to_unix(aprv.end_time))
+
+    """
+    def __init__(self, handler: Callable[[Any], Awaitable]):
+        self.handler = handler
+        self._heap: List[Tuple[float, Any]] = []
+        self._deadlines: Dict[Any, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, key: Any, deadline: Union[int, float]):
+        """Schedule (or re-schedule) ``key`` to be handled at the UNIX timestamp ``deadline``"""
+        deadline = float(deadline)
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        elif self._heap[0][1] == key:
+            self._wakeup.set()
+
+    def remove(self, key: Any):
+        """Un-schedule ``key`` - it's heap entry is skipped once it reaches the top of the heap"""
+        self._deadlines.pop(key, None)
+
+    async def _run(self):
+        while len(self._heap) > 0:
+            deadline, key = self._heap[0]
+            if self._deadlines.get(key) != deadline:
+                heapq.heappop(self._heap)
+                continue
+            delay = deadline - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            try:
+                await self.handler(key)
+            except Exception:
+                log.exception("Error while handling expiry of %s", key)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+
 class ApprovalsDB(SqliteAsyncWrapper):
     """
     Approvals Database SQLite Wrapper
@@ -414,6 +1065,14 @@ class ApprovalsDB(SqliteAsyncWrapper):
         >>> aprv = await adb.find_approval(1)
         >>> # To find an approval by it's Discord Message ID:
         >>> aprv = await adb.find_approval_msgid(12341234)
+        >>> # To record (or change) a vote on an approval:
+        >>> await adb.vote(1, 'SomeUser#1234', VoteChoice.APPROVE)
+
+    Votes are stored one row per voter in the ``votes`` table. The ``approvals`` / ``disapprovals`` counters on
+    the ``approvals`` table are maintained by the triggers in :attr:`.TRIGGERS`, while ``approved_by`` /
+    ``disapproved_by`` are built from the ``votes`` table when an approval is queried. The original
+    ``approved_by`` / ``disapproved_by`` columns are only kept for older databases, and are migrated into
+    the ``votes`` table by :meth:`.migrate_votes` when the ``votes`` table is first created.
 
     """
     DEFAULT_DB_FOLDER: str = settings.APPROVAL_DB.parent
@@ -438,6 +1097,51 @@ class ApprovalsDB(SqliteAsyncWrapper):
                   "timestamp DATETIME DEFAULT CURRENT_TIMESTAMP"
                   "); "
             ),
+        ('votes', "CREATE TABLE votes ("
+                  "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                  "approval_id INTEGER NOT NULL REFERENCES approvals (id) ON DELETE CASCADE, "
+                  "voter_id TEXT NOT NULL, "
+                  "choice TEXT NOT NULL, "
+                  "ts DATETIME DEFAULT CURRENT_TIMESTAMP, "
+                  "UNIQUE (approval_id, voter_id)"
+                  "); "
+            ),
+        ('approvals_fts', "CREATE VIRTUAL TABLE approvals_fts USING fts5("
+                  "reason, action, url, content='approvals', content_rowid='id'"
+                  "); "
+            ),
+        ('stats_daily', "CREATE TABLE stats_daily ("
+                  "guild_id INTEGER NOT NULL, "
+                  "day TEXT NOT NULL, "
+                  "outcome TEXT NOT NULL, "
+                  "total INTEGER DEFAULT 0, "
+                  "PRIMARY KEY (guild_id, day, outcome)"
+                  "); "
+            ),
+        ('stats_outcomes', "CREATE TABLE stats_outcomes ("
+                  "guild_id INTEGER NOT NULL, "
+                  "outcome TEXT NOT NULL, "
+                  "total INTEGER DEFAULT 0, "
+                  "PRIMARY KEY (guild_id, outcome)"
+                  "); "
+            ),
+        ('stats_actions', "CREATE TABLE stats_actions ("
+                  "guild_id INTEGER NOT NULL, "
+                  "action TEXT NOT NULL, "
+                  "outcome TEXT NOT NULL, "
+                  "total INTEGER DEFAULT 0, "
+                  "PRIMARY KEY (guild_id, action, outcome)"
+                  "); "
+            ),
+        ('stats_voters', "CREATE TABLE stats_voters ("
+                  "guild_id INTEGER NOT NULL, "
+                  "voter_id TEXT NOT NULL, "
+                  "approvals INTEGER DEFAULT 0, "
+                  "disapprovals INTEGER DEFAULT 0, "
+                  "last_vote DATETIME NULL, "
+                  "PRIMARY KEY (guild_id, voter_id)"
+                  "); "
+            ),
         # ('items', "CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT);"),
     ]
 
@@ -448,11 +1152,396 @@ class ApprovalsDB(SqliteAsyncWrapper):
         "idx_username": "CREATE INDEX idx_username ON approvals (username); ",
         "idx_url": "CREATE INDEX idx_url ON approvals (url); ",
         "idx_action": "CREATE INDEX idx_action ON approvals (action); ",
+        "idx_votes_voter": "CREATE INDEX idx_votes_voter ON votes (voter_id); ",
+        "idx_end_time": "CREATE INDEX idx_end_time ON approvals (end_time); ",
+        "idx_url_canonical": "CREATE INDEX idx_url_canonical ON approvals (url_canonical); ",
+        # Per-server versions of the above, so that a server's queries only scan that server's rows
+        # (guild_id, id) lets a server's history be paged newest-first without sorting all of it's rows
+        "idx_guild_id": "CREATE INDEX idx_guild_id ON approvals (guild_id, id); ",
+        "idx_guild_outcome": "CREATE INDEX idx_guild_outcome ON approvals (guild_id, outcome); ",
+        "idx_guild_username": "CREATE INDEX idx_guild_username ON approvals (guild_id, username); ",
+        "idx_guild_action": "CREATE INDEX idx_guild_action ON approvals (guild_id, action); ",
+        "idx_guild_timestamp": "CREATE INDEX idx_guild_timestamp ON approvals (guild_id, timestamp); ",
+        "idx_guild_url_canonical": "CREATE INDEX idx_guild_url_canonical ON approvals (guild_id, url_canonical); ",
+    }
+
+    COLUMNS: Dict[str, Tuple[str, str]] = {
+        "channel_id": ("approvals", "ALTER TABLE approvals ADD COLUMN channel_id INTEGER NULL; "),
+        "finalized": ("approvals", "ALTER TABLE approvals ADD COLUMN finalized INTEGER DEFAULT 0; "),
+        "url_canonical": ("approvals", "ALTER TABLE approvals ADD COLUMN url_canonical TEXT NULL; "),
+        "guild_id": ("approvals", "ALTER TABLE approvals ADD COLUMN guild_id INTEGER NULL; "),
+    }
+    """
+    Columns added after a table's original ``CREATE TABLE`` in :attr:`.SCHEMAS`, mapping each column name to
+    it's table, and the statement which adds it. Missing columns are added by :meth:`.create_columns`.
+    """
+
+    TRIGGERS: Dict[str, str] = {
+        "trg_votes_insert": "CREATE TRIGGER trg_votes_insert AFTER INSERT ON votes BEGIN "
+                            "UPDATE approvals SET approvals = approvals + (NEW.choice = 'approve'), "
+                            "disapprovals = disapprovals + (NEW.choice = 'disapprove') "
+                            "WHERE id = NEW.approval_id; END; ",
+        "trg_votes_update": "CREATE TRIGGER trg_votes_update AFTER UPDATE OF choice ON votes "
+                            "WHEN OLD.choice != NEW.choice BEGIN "
+                            "UPDATE approvals SET "
+                            "approvals = approvals + (NEW.choice = 'approve') - (OLD.choice = 'approve'), "
+                            "disapprovals = disapprovals + (NEW.choice = 'disapprove') - (OLD.choice = 'disapprove') "
+                            "WHERE id = NEW.approval_id; END; ",
+        "trg_votes_delete": "CREATE TRIGGER trg_votes_delete AFTER DELETE ON votes BEGIN "
+                            "UPDATE approvals SET approvals = approvals - (OLD.choice = 'approve'), "
+                            "disapprovals = disapprovals - (OLD.choice = 'disapprove') "
+                            "WHERE id = OLD.approval_id; END; ",
     }
+    """Triggers which keep the ``approvals`` / ``disapprovals`` counters in sync with the ``votes`` table"""
+
+    FTS_TRIGGERS: Dict[str, str] = {
+        "trg_fts_insert": "CREATE TRIGGER trg_fts_insert AFTER INSERT ON approvals BEGIN "
+                          "INSERT INTO approvals_fts (rowid, reason, action, url) "
+                          "VALUES (NEW.id, NEW.reason, NEW.action, NEW.url); END; ",
+        "trg_fts_update": "CREATE TRIGGER trg_fts_update AFTER UPDATE OF reason, action, url ON approvals BEGIN "
+                          "INSERT INTO approvals_fts (approvals_fts, rowid, reason, action, url) "
+                          "VALUES ('delete', OLD.id, OLD.reason, OLD.action, OLD.url); "
+                          "INSERT INTO approvals_fts (rowid, reason, action, url) "
+                          "VALUES (NEW.id, NEW.reason, NEW.action, NEW.url); END; ",
+        "trg_fts_delete": "CREATE TRIGGER trg_fts_delete AFTER DELETE ON approvals BEGIN "
+                          "INSERT INTO approvals_fts (approvals_fts, rowid, reason, action, url) "
+                          "VALUES ('delete', OLD.id, OLD.reason, OLD.action, OLD.url); END; ",
+    }
+    """
+    Triggers which keep the ``approvals_fts`` full-text index in sync with the ``reason`` / ``action`` / ``url``
+    columns of ``approvals``. The index is built from any existing approvals when it's first created.
+    """
+
+    STATS_TRIGGERS: Dict[str, str] = {
+        "trg_stats_approvals_insert": "CREATE TRIGGER trg_stats_approvals_insert AFTER INSERT ON approvals BEGIN "
+                            "INSERT INTO stats_daily (guild_id, day, outcome, total) "
+                            "VALUES (IFNULL(NEW.guild_id, 0), date(NEW.timestamp), NEW.outcome, 1) "
+                            "ON CONFLICT (guild_id, day, outcome) DO UPDATE SET total = total + 1; "
+                            "INSERT INTO stats_outcomes (guild_id, outcome, total) VALUES (IFNULL(NEW.guild_id, 0), NEW.outcome, 1) "
+                            "ON CONFLICT (guild_id, outcome) DO UPDATE SET total = total + 1; "
+                            "INSERT INTO stats_actions (guild_id, action, outcome, total) "
+                            "VALUES (IFNULL(NEW.guild_id, 0), IFNULL(NEW.action, ''), NEW.outcome, 1) "
+                            "ON CONFLICT (guild_id, action, outcome) DO UPDATE SET total = total + 1; "
+                            "END; ",
+        "trg_stats_approvals_update": "CREATE TRIGGER trg_stats_approvals_update AFTER UPDATE OF outcome ON approvals "
+                            "WHEN OLD.outcome IS NOT NEW.outcome BEGIN "
+                            "UPDATE stats_daily SET total = total - 1 WHERE guild_id = IFNULL(OLD.guild_id, 0) "
+                            "AND day = date(OLD.timestamp) AND outcome = OLD.outcome; "
+                            "INSERT INTO stats_daily (guild_id, day, outcome, total) "
+                            "VALUES (IFNULL(NEW.guild_id, 0), date(NEW.timestamp), NEW.outcome, 1) "
+                            "ON CONFLICT (guild_id, day, outcome) DO UPDATE SET total = total + 1; "
+                            "UPDATE stats_outcomes SET total = total - 1 WHERE guild_id = IFNULL(OLD.guild_id, 0) "
+                            "AND outcome = OLD.outcome; "
+                            "INSERT INTO stats_outcomes (guild_id, outcome, total) VALUES (IFNULL(NEW.guild_id, 0), NEW.outcome, 1) "
+                            "ON CONFLICT (guild_id, outcome) DO UPDATE SET total = total + 1; "
+                            "UPDATE stats_actions SET total = total - 1 WHERE guild_id = IFNULL(OLD.guild_id, 0) "
+                            "AND action = IFNULL(OLD.action, '') AND outcome = OLD.outcome; "
+                            "INSERT INTO stats_actions (guild_id, action, outcome, total) "
+                            "VALUES (IFNULL(NEW.guild_id, 0), IFNULL(NEW.action, ''), NEW.outcome, 1) "
+                            "ON CONFLICT (guild_id, action, outcome) DO UPDATE SET total = total + 1; "
+                            "END; ",
+        "trg_stats_approvals_delete": "CREATE TRIGGER trg_stats_approvals_delete AFTER DELETE ON approvals BEGIN "
+                            "UPDATE stats_daily SET total = total - 1 WHERE guild_id = IFNULL(OLD.guild_id, 0) "
+                            "AND day = date(OLD.timestamp) AND outcome = OLD.outcome; "
+                            "UPDATE stats_outcomes SET total = total - 1 WHERE guild_id = IFNULL(OLD.guild_id, 0) "
+                            "AND outcome = OLD.outcome; "
+                            "UPDATE stats_actions SET total = total - 1 WHERE guild_id = IFNULL(OLD.guild_id, 0) "
+                            "AND action = IFNULL(OLD.action, '') AND outcome = OLD.outcome; "
+                            "END; ",
+        "trg_stats_votes_insert": "CREATE TRIGGER trg_stats_votes_insert AFTER INSERT ON votes BEGIN "
+                            "INSERT INTO stats_voters (guild_id, voter_id, approvals, disapprovals, last_vote) "
+                            "VALUES ((SELECT IFNULL(guild_id, 0) FROM approvals WHERE id = NEW.approval_id), "
+                            "NEW.voter_id, NEW.choice = 'approve', NEW.choice = 'disapprove', NEW.ts) "
+                            "ON CONFLICT (guild_id, voter_id) DO UPDATE SET approvals = approvals + excluded.approvals, "
+                            "disapprovals = disapprovals + excluded.disapprovals, last_vote = excluded.last_vote; "
+                            "END; ",
+        "trg_stats_votes_update": "CREATE TRIGGER trg_stats_votes_update AFTER UPDATE OF choice ON votes "
+                            "WHEN OLD.choice != NEW.choice BEGIN "
+                            "UPDATE stats_voters SET "
+                            "approvals = approvals + (NEW.choice = 'approve') - (OLD.choice = 'approve'), "
+                            "disapprovals = disapprovals + (NEW.choice = 'disapprove') - (OLD.choice = 'disapprove'), "
+                            "last_vote = NEW.ts WHERE voter_id = NEW.voter_id "
+                            "AND guild_id = (SELECT IFNULL(guild_id, 0) FROM approvals WHERE id = NEW.approval_id); END; ",
+        "trg_stats_votes_delete": "CREATE TRIGGER trg_stats_votes_delete AFTER DELETE ON votes BEGIN "
+                            "UPDATE stats_voters SET approvals = approvals - (OLD.choice = 'approve'), "
+                            "disapprovals = disapprovals - (OLD.choice = 'disapprove') WHERE voter_id = OLD.voter_id "
+                            "AND guild_id = (SELECT IFNULL(guild_id, 0) FROM approvals WHERE id = OLD.approval_id); END; ",
+    }
+    """
+    Triggers which keep the ``stats_*`` summary tables (per Discord server - approvals without a ``guild_id`` are
+    counted under ``0``) up to date, within the same transaction as the :meth:`.create` / :meth:`.update` /
+    :meth:`.vote` which changed the underlying rows. Existing databases
+    are summarised once by :meth:`.backfill_stats` when the ``stats_*`` tables are first created.
+    """
+
+    SELECT_APPROVALS: str = (
+        "SELECT a.*, "
+        "(SELECT json_group_array(voter_id) FROM (SELECT voter_id FROM votes "
+        "WHERE approval_id = a.id AND choice = 'approve' ORDER BY id)) AS approved_by, "
+        "(SELECT json_group_array(voter_id) FROM (SELECT voter_id FROM votes "
+        "WHERE approval_id = a.id AND choice = 'disapprove' ORDER BY id)) AS disapproved_by "
+        "FROM approvals a"
+    )
+    """Base query for loading approvals, with ``approved_by`` / ``disapproved_by`` built from the ``votes`` table"""
+
+    _shared: Dict[str, Tuple[asyncio.AbstractEventLoop, aiosqlite.Connection, asyncio.Lock]] = {}
+    """
+    Process-wide connections used when ``APPROVAL_DB_PERSISTENT`` is enabled - maps each DB path to it's
+    event loop, connection, and the lock which serializes queries/transactions on that connection
+    """
+
+    PRAGMAS: Tuple[str, ...] = (
+        "PRAGMA journal_mode = WAL;",
+        f"PRAGMA synchronous = {settings.APPROVAL_DB_SYNC};",
+        f"PRAGMA mmap_size = {int(settings.APPROVAL_DB_MMAP)};",
+        "PRAGMA foreign_keys = ON;",
+    )
+    """Ran on each new persistent connection"""
+
+    async def _shared_connection(self) -> Tuple[aiosqlite.Connection, asyncio.Lock]:
+        """
+        Get (or open) the persistent connection for this DB, along with the lock that must be held while using it.
+
+        A new connection is opened if the existing one belongs to a different event loop.
+        """
+        loop = asyncio.get_running_loop()
+        shared = ApprovalsDB._shared.get(self.db)
+        if shared is not None and shared[0] is loop:
+            return shared[1], shared[2]
+        log.debug("Opening persistent SQLite connection to %s", self.db)
+        conn = aiosqlite.connect(
+            self.db, cached_statements=settings.APPROVAL_DB_STMT_CACHE, **self.connector_kwargs
+        )
+        # Don't let the connection's worker thread keep the process alive if close_connections() is never called
+        # (older aiosqlite versions subclass Thread directly, newer ones wrap it in ._thread)
+        getattr(conn, '_thread', conn).daemon = True
+        await conn
+        for p in self.PRAGMAS:
+            await conn.execute(p)
+        # Another coroutine may have opened a connection while we were awaiting ours
+        shared = ApprovalsDB._shared.get(self.db)
+        if shared is not None and shared[0] is loop:
+            await conn.close()
+            return shared[1], shared[2]
+        ApprovalsDB._shared[self.db] = (loop, conn, asyncio.Lock())
+        return conn, ApprovalsDB._shared[self.db][2]
+
+    @classmethod
+    async def close_connections(cls):
+        """
+        Flush any pending write-behind updates, then run ``PRAGMA optimize`` on, and close, every
+        persistent connection opened by this process
+        """
+        await cls.flush_all_updates()
+        shared, cls._shared = cls._shared, {}
+        for db, (_, conn, lock) in shared.items():
+            log.debug("Closing persistent SQLite connection to %s", db)
+            async with lock:
+                try:
+                    await conn.execute("PRAGMA optimize;")
+                finally:
+                    await conn.close()
+
+    async def execute(self, query: str, *params: Iterable, fetch='all', **kwargs) -> Tuple[Iterable, DictObject]:
+        start = time.perf_counter()
+        try:
+            if not settings.APPROVAL_DB_PERSISTENT:
+                return await super().execute(query, *params, fetch=fetch, **kwargs)
+            conn, lock = await self._shared_connection()
+            res = None
+            async with lock:
+                async with conn.execute(query, *params) as cur:
+                    if fetch == 'all': res = await cur.fetchall()
+                    if fetch == 'one': res = await cur.fetchone()
+                    cur_dict = cursor_to_dict(cur)
+                if conn.in_transaction:
+                    await conn.commit()
+            return res, cur_dict
+        finally:
+            QUERY_SECONDS.observe(time.perf_counter() - start, query.split(None, 1)[0].rstrip(';').upper())
+
+    # privex-db wraps these in @awaitable, which inspects the call stack on every call so that they can also be
+    # used synchronously - costing several milliseconds per query. ApprovalsDB is only used from async code,
+    # so these call the underlying coroutines directly.
+    async def query(self, sql: str, *params, fetch='all', **kwparams):
+        return await self._query(sql, *params, fetch=fetch, **kwparams)
+
+    async def fetch(self, sql: str, *params, fetch='all', **kwparams):
+        res, _, _ = await self._query(sql, *params, fetch=fetch, **kwparams)
+        return res
+
+    async def fetchone(self, sql: str, *params, **kwparams) -> Optional[Dict[str, Any]]:
+        return await self.fetch(sql, *params, fetch='one', **kwparams)
+
+    async def fetchall(self, sql: str, *params, **kwparams) -> List[Dict[str, Any]]:
+        return await self.fetch(sql, *params, fetch='all', **kwparams)
+
+    async def action(self, sql: str, *params, **kwparams) -> int:
+        return await self._action(sql, *params, **kwparams)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Run several queries in a single transaction, committed once the ``async with`` block exits
+        (or rolled back if it raises an exception)
+
+            >>> async with adb.transaction() as conn:
+            ...     await conn.execute("UPDATE approvals SET outcome = ? WHERE id = ?;", ['TIE', 5])
+            ...     await conn.execute("UPDATE approvals SET outcome = ? WHERE id = ?;", ['TIE', 6])
+
+        """
+        start = time.perf_counter()
+        try:
+            if settings.APPROVAL_DB_PERSISTENT:
+                conn, lock = await self._shared_connection()
+                async with lock:
+                    async with self._transaction(conn) as c:
+                        yield c
+                return
+            async with await self._get_connection(new=True, await_conn=False) as conn:
+                async with self._transaction(conn) as c:
+                    yield c
+        finally:
+            QUERY_SECONDS.observe(time.perf_counter() - start, 'TRANSACTION')
+
+    @staticmethod
+    @asynccontextmanager
+    async def _transaction(conn: aiosqlite.Connection) -> AsyncIterator[aiosqlite.Connection]:
+        await conn.execute("BEGIN;")
+        try:
+            yield conn
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+
+    async def _existing(self, obj_type: str) -> List[str]:
+        existing = await self.fetchall("SELECT name FROM sqlite_master WHERE type = ?;", [obj_type])
+        return [d['name'] for d in existing]
+
+    async def create_columns(self) -> List[str]:
+        """Add any missing :attr:`.COLUMNS` to their tables, returning the names of the columns which were added"""
+        added = []
+        for name, (table, stmt) in self.COLUMNS.items():
+            existing = [c['name'] for c in await self.fetchall(f"PRAGMA table_info('{table}')")]
+            if name in existing:
+                continue
+            log.debug("Adding missing column '%s' to table '%s'", name, table)
+            await self.action(stmt)
+            added.append(name)
+        return added
+
+    async def create_triggers(self) -> int:
+        exlist = await self._existing('trigger')
+        count = 0
+        for name, trg in {**self.TRIGGERS, **self.FTS_TRIGGERS, **self.STATS_TRIGGERS}.items():
+            if name in exlist:
+                log.debug("Trigger '%s' already exists - skipping", name)
+                continue
+            log.debug("Creating SQLite trigger '%s'", name)
+            await self.action(trg)
+            count += 1
+        log.debug("Created %s SQLite triggers!", count)
+        return count
+
+    async def migrate_votes(self) -> int:
+        """
+        Copy the votes stored in the legacy ``approved_by`` / ``disapproved_by`` JSON columns into the ``votes`` table.
+
+        This must be ran BEFORE :meth:`.create_triggers`, as the existing ``approvals`` / ``disapprovals``
+        counters already include these votes. The votes are inserted in one transaction, so an interrupted
+        migration leaves the ``votes`` table empty rather than half-filled. Returns the number of votes inserted.
+        """
+        rows = await self.fetchall("SELECT id, approved_by, disapproved_by FROM approvals;")
+        params = []
+        for r in rows:
+            for col, choice in (('approved_by', VoteChoice.APPROVE), ('disapproved_by', VoteChoice.DISAPPROVE)):
+                params += [(r['id'], voter, choice.value) for voter in _load_list(r[col])]
+        async with self.transaction() as conn:
+            cur = await conn.executemany(
+                "INSERT OR IGNORE INTO votes (approval_id, voter_id, choice) VALUES (?, ?, ?);", params
+            )
+            count = max(cur.rowcount, 0)
+        log.debug("Migrated %s votes into the votes table", count)
+        return count
+
+    STATS_BACKFILL: Tuple[str, ...] = (
+        "DELETE FROM stats_daily;",
+        "DELETE FROM stats_outcomes;",
+        "DELETE FROM stats_actions;",
+        "DELETE FROM stats_voters;",
+        "INSERT INTO stats_daily (guild_id, day, outcome, total) "
+        "SELECT IFNULL(guild_id, 0), date(timestamp), outcome, COUNT(*) FROM approvals "
+        "GROUP BY IFNULL(guild_id, 0), date(timestamp), outcome;",
+        "INSERT INTO stats_outcomes (guild_id, outcome, total) "
+        "SELECT IFNULL(guild_id, 0), outcome, COUNT(*) FROM approvals GROUP BY IFNULL(guild_id, 0), outcome;",
+        "INSERT INTO stats_actions (guild_id, action, outcome, total) "
+        "SELECT IFNULL(guild_id, 0), IFNULL(action, ''), outcome, COUNT(*) FROM approvals "
+        "GROUP BY IFNULL(guild_id, 0), IFNULL(action, ''), outcome;",
+        "INSERT INTO stats_voters (guild_id, voter_id, approvals, disapprovals, last_vote) "
+        "SELECT IFNULL(a.guild_id, 0), v.voter_id, SUM(v.choice = 'approve'), SUM(v.choice = 'disapprove'), MAX(v.ts) "
+        "FROM votes v JOIN approvals a ON a.id = v.approval_id GROUP BY IFNULL(a.guild_id, 0), v.voter_id;",
+    )
+
+    async def backfill_stats(self):
+        """
+        (Re-)build the ``stats_*`` summary tables from the ``approvals`` and ``votes`` tables, in one transaction.
+
+        Ran automatically when the stats tables are first created - after that, they're kept up to date by the
+        :attr:`.STATS_TRIGGERS`. Can also be ran manually to repair the summaries, e.g. after editing the DB by hand.
+        """
+        log.debug("Backfilling approval stats summary tables")
+        async with self.transaction() as conn:
+            for q in self.STATS_BACKFILL:
+                await conn.execute(q)
+
+    async def get_stats(self, guild_id: int = None, days: int = 30, top: int = 10) -> DictObject:
+        """
+        Get approval statistics from the ``stats_*`` summary tables - a fixed number of small queries,
+        no matter how many approvals/votes are in the DB.
+
+            >>> stats = await ApprovalsDB().get_stats(789032594456576001, days=7)
+            >>> stats.outcomes
+            {'APPROVED': 12, 'DISAPPROVED': 3, 'TIE': 1}
+            >>> stats.actions[0]
+            {'action': 'delete', 'total': 9, 'approved': 7}
+            >>> stats.voters[0]
+            {'voter_id': 'SomeUser#1234', 'approvals': 10, 'disapprovals': 2, 'last_vote': '2022-06-10 12:30:00'}
+            >>> stats.daily
+            {'2022-06-10': {'APPROVED': 2}, '2022-06-11': {'APPROVED': 1, 'TIE': 1}}
+
+        :param int guild_id: The Discord server to get stats for (``None`` - approvals which don't have a server ID)
+        :param int days: Include per-day outcome counts for this many days (including today)
+        :param int top: Return the ``top`` most common actions, and most active voters
+        """
+        await self._flush_before_read()
+        guild_id = 0 if guild_id is None else int(guild_id)
+        outcomes = await self.fetchall(
+            "SELECT outcome, total FROM stats_outcomes WHERE guild_id = ? AND total > 0 ORDER BY total DESC;", [guild_id]
+        )
+        actions = await self.fetchall(
+            "SELECT action, SUM(total) AS total, SUM(CASE WHEN outcome IN (?, ?) THEN total ELSE 0 END) AS approved "
+            "FROM stats_actions WHERE guild_id = ? GROUP BY action HAVING SUM(total) > 0 ORDER BY total DESC LIMIT ?;",
+            [ApprovalOutcome.APPROVED.value, ApprovalOutcome.APPROVED_NO_MAJORITY.value, guild_id, top]
+        )
+        voters = await self.fetchall(
+            "SELECT voter_id, approvals, disapprovals, last_vote FROM stats_voters WHERE guild_id = ? "
+            "AND approvals + disapprovals > 0 ORDER BY approvals + disapprovals DESC LIMIT ?;", [guild_id, top]
+        )
+        daily = await self.fetchall(
+            "SELECT day, outcome, total FROM stats_daily WHERE guild_id = ? AND day >= date('now', ?) "
+            "AND total > 0 ORDER BY day;",
+            [guild_id, f"-{int(days) - 1} days"]
+        )
+        stats = DictObject(
+            outcomes={r['outcome']: r['total'] for r in outcomes}, actions=actions, voters=voters, daily={}
+        )
+        for r in daily:
+            stats.daily.setdefault(r['day'], {})[r['outcome']] = r['total']
+        return stats
 
     async def create_indexes(self) -> int:
-        existing = await self.fetchall("PRAGMA index_list('approvals')")
-        exlist = [d['name'] for d in existing]
+        exlist = await self._existing('index')
         count = 0
         for name, idx in self.INDEXES.items():
             if name in exlist:
@@ -466,24 +1555,215 @@ class ApprovalsDB(SqliteAsyncWrapper):
 
     async def create_schemas(self, *tables) -> DICT_CORO:
         t = await super().create_schemas(*tables)
+        created = t.get('tables_created', [])
+        added = await self.create_columns()
+        if 'votes' in created:
+            await self.migrate_votes()
+        if 'approvals_fts' in created:
+            log.debug("Building full-text search index for existing approvals")
+            await self.action("INSERT INTO approvals_fts (approvals_fts) VALUES ('rebuild');")
+        if 'url_canonical' in added:
+            await self.backfill_url_canonical()
+        # Approvals from before guild_id was added can only belong to the bot's one server, if it only has one
+        if 'guild_id' in added and len(settings.SERVER_IDS) == 1:
+            log.debug("Assigning existing approvals to the only configured server: %s", settings.SERVER_IDS[0])
+            await self.action("UPDATE approvals SET guild_id = ? WHERE guild_id IS NULL;", [settings.SERVER_IDS[0]])
+        if 'stats_outcomes' in created:
+            await self.backfill_stats()
         await self.create_indexes()
+        await self.create_triggers()
         return t
 
+    async def backfill_url_canonical(self) -> int:
+        """Fill in ``url_canonical`` for any approvals which were created before the column was added"""
+        rows = await self.fetchall("SELECT id, url FROM approvals WHERE url_canonical IS NULL AND url IS NOT NULL;")
+        async with self.transaction() as conn:
+            await conn.executemany(
+                "UPDATE approvals SET url_canonical = ? WHERE id = ?;", [(canonical_url(r['url']), r['id']) for r in rows]
+            )
+        log.debug("Set url_canonical for %s existing approvals", len(rows))
+        return len(rows)
+
+    async def find_open_approval(self, url: str, guild_id: int = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the newest approval for ``url`` (matched by it's :func:`.canonical_url` - using the ``idx_url_canonical``
+        or ``idx_guild_url_canonical`` index) which is still open for voting. Returns ``None`` if there isn't one.
+
+        If ``guild_id`` is passed, only approvals from that Discord server are checked.
+        """
+        await self._flush_before_read()
+        where, params = "url_canonical = ?", [canonical_url(url)]
+        if guild_id is not None:
+            where, params = "guild_id = ? AND " + where, [int(guild_id)] + params
+        return await self.fetchone(
+            f"SELECT id, message_id, channel_id, end_time FROM approvals "
+            f"WHERE {where} AND finalized = 0 AND end_time > ? ORDER BY id DESC LIMIT 1;",
+            params + [now_plus_seconds(0)]
+        )
+
     async def get_approvals(self) -> List[Dict[str, Any]]:
-        return await self.fetchall("SELECT * FROM approvals;")
-    
+        await self._flush_before_read()
+        return await self.fetchall(f"{self.SELECT_APPROVALS};")
+
+    HISTORY_FILTERS: Dict[str, str] = {
+        'guild_id': "a.guild_id = ?",
+        'outcome': "a.outcome = ?",
+        'username': "a.username = ?",
+        'action': "a.action = ?",
+        'since': "a.timestamp >= ?",
+        'until': "a.timestamp < ?",
+    }
+    """Filters accepted by :meth:`.iter_approvals`, mapped to their ``WHERE`` clause"""
+
+    async def iter_approvals(
+            self, filters: Dict[str, Any] = None, after_id: int = None, limit: int = None, page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over approvals, newest first, optionally filtered by any of :attr:`.HISTORY_FILTERS`.
+
+        Uses keyset pagination (``WHERE a.id < last_id ORDER BY a.id DESC LIMIT page_size``) rather than
+        ``OFFSET``, so each page is a range scan of the filter's index (``idx_guild_id``, ``idx_guild_outcome``,
+        ``idx_guild_username``, ``idx_outcome`` etc.) which costs the same no matter how deep into the table it is - and only
+        ``page_size`` rows are ever held in memory.
+
+            >>> adb = ApprovalsDB()
+            >>> async for row in adb.iter_approvals({'outcome': 'APPROVED'}, limit=10):
+            ...     print(row['id'], row['url'])
+            >>> # Continue where a previous page ended
+            >>> page = [row async for row in adb.iter_approvals({'outcome': 'APPROVED'}, after_id=41, limit=10)]
+
+        :param dict filters: Filter columns (keys from :attr:`.HISTORY_FILTERS`) mapped to the value to filter by
+        :param int after_id: Only return approvals older than (with a lower ID than) this approval ID
+        :param int limit: Stop after yielding this many approvals (default: ``None`` - no limit)
+        :param int page_size: How many rows to query at a time
+        """
+        filters = {} if filters is None else filters
+        where, values = [], []
+        for k, v in filters.items():
+            if k not in self.HISTORY_FILTERS:
+                raise ValueError(f"Unknown approval filter '{k}' - valid filters: {', '.join(self.HISTORY_FILTERS)}")
+            if v is None:
+                continue
+            where.append(self.HISTORY_FILTERS[k])
+            values.append(v.value if isinstance(v, ApprovalOutcome) else v)
+
+        await self._flush_before_read()
+        yielded = 0
+        while limit is None or yielded < limit:
+            size = page_size if limit is None else min(page_size, limit - yielded)
+            clauses = where if after_id is None else where + ["a.id < ?"]
+            params = values if after_id is None else values + [after_id]
+            query = self.SELECT_APPROVALS
+            if len(clauses) > 0:
+                query += " WHERE " + " AND ".join(clauses)
+            rows = await self.fetchall(f"{query} ORDER BY a.id DESC LIMIT {int(size)};", params)
+            for row in rows:
+                yield row
+            yielded += len(rows)
+            if len(rows) < size:
+                break
+            after_id = rows[-1]['id']
+
     async def find_approval(self, id: int) -> Optional[Dict[str, Any]]:
-        return await self.fetchone("SELECT * FROM approvals WHERE id = ?;", [id])
+        await self._flush_before_read()
+        return await self.fetchone(f"{self.SELECT_APPROVALS} WHERE a.id = ?;", [id])
 
     async def find_approval_msgid(self, msg_id: int) -> Optional[Dict[str, Any]]:
-        return await self.fetchone("SELECT * FROM approvals WHERE message_id = ?;", [msg_id])
+        await self._flush_before_read()
+        return await self.fetchone(f"{self.SELECT_APPROVALS} WHERE a.message_id = ?;", [msg_id])
+
+    @staticmethod
+    def fts_query(text: str) -> str:
+        """
+        Convert user input into an FTS5 query which matches rows containing every word in ``text`` - each word
+        is quoted, so that punctuation (e.g. in URLs) and FTS5 operators are treated as plain text.
+
+            >>> ApprovalsDB.fts_query('spam https://example.com/@john')
+            '"spam" "https://example.com/@john"'
+
+        """
+        return ' '.join('"' + w.replace('"', '""') + '"' for w in text.split())
+
+    async def search_approvals(self, text: str, offset: int = 0, limit: int = 10, guild_id: int = None) -> List[Dict[str, Any]]:
+        """
+        Full-text search over the ``reason``, ``action`` and ``url`` of every approval, using the ``approvals_fts``
+        FTS5 index. Results are ranked best match first (BM25). If ``guild_id`` is passed, only approvals from
+        that Discord server are returned.
+
+            >>> await ApprovalsDB().search_approvals('spam example.com', limit=5)
+            [{'id': 12, 'action': 'delete', 'url': 'https://example.com/@john/1234', 'reason': 'spam', ...}, ...]
+
+        """
+        query = self.fts_query(text)
+        if query == '':
+            return []
+        await self._flush_before_read()
+        where, params = "approvals_fts MATCH ?", [query]
+        if guild_id is not None:
+            where, params = where + " AND a.guild_id = ?", params + [int(guild_id)]
+        return await self.fetchall(
+            f"{self.SELECT_APPROVALS} JOIN approvals_fts ON approvals_fts.rowid = a.id "
+            f"WHERE {where} ORDER BY approvals_fts.rank LIMIT ? OFFSET ?;",
+            params + [limit, offset]
+        )
+
+    async def get_unfinalized(self, ended_after: datetime) -> List[Dict[str, Any]]:
+        """
+        Get the ``id`` and ``end_time`` of every approval which hasn't been finalized yet, and either hasn't
+        ended, or ended after ``ended_after`` - ordered by ``end_time``. Uses the ``idx_end_time`` index.
+        """
+        await self._flush_before_read()
+        return await self.fetchall(
+            "SELECT id, end_time FROM approvals WHERE end_time >= ? AND finalized = 0 ORDER BY end_time;",
+            [ended_after]
+        )
+
+    VOTE_QUERY: str = (
+        "INSERT INTO votes (approval_id, voter_id, choice) VALUES (?, ?, ?) "
+        "ON CONFLICT (approval_id, voter_id) DO UPDATE SET choice = excluded.choice, ts = CURRENT_TIMESTAMP "
+        "WHERE choice != excluded.choice;"
+    )
+
+    async def vote(self, approval_id: int, voter_id: str, choice: Union[VoteChoice, str]) -> int:
+        """
+        Record ``voter_id``'s vote on an approval, replacing any previous vote they made on it.
+
+        This is a single atomic upsert - the ``approvals`` / ``disapprovals`` counters are adjusted
+        by :attr:`.TRIGGERS`, so concurrent votes can't overwrite each other.
+
+            >>> await adb.vote(5, 'SomeUser#1234', VoteChoice.DISAPPROVE)
+            1
+
+        """
+        return await self.action(self.VOTE_QUERY, [approval_id, voter_id, VoteChoice(choice).value])
+
+    async def vote_many(self, approval_id: int, votes: List[Tuple[str, Union[VoteChoice, str]]], **fields) -> int:
+        """
+        Record several ``(voter_id, choice)`` votes on an approval, and optionally update the approval's
+        columns ``fields`` (same as :meth:`.update`) - all within one transaction / commit.
+
+            >>> await adb.vote_many(5, [('SomeUser#1234', VoteChoice.APPROVE), ('JaneDoe#4200', 'disapprove')],
+            ...                     outcome=ApprovalOutcome.APPROVED_NO_MAJORITY)
+            3
+
+        """
+        params = [(approval_id, voter, VoteChoice(choice).value) for voter, choice in votes]
+        count = 0
+        async with self.transaction() as c:
+            if len(params) > 0:
+                cur = await c.executemany(self.VOTE_QUERY, params)
+                count += cur.rowcount
+            if len(fields) > 0:
+                cur = await c.execute(*self._update_query(approval_id, **fields))
+                count += cur.rowcount
+        return count
 
     async def create(
             self, message_id: int, action: str, url: str, reason: str, username: str, 
             approvals: int = 0, disapprovals: int = 0, approved_by: Union[str, list] = '[]',
             disapproved_by: Union[str, list] = '[]', total_all_mods: int = 0,
             outcome: ApprovalOutcome = ApprovalOutcome.AUTO,
-            end_time: datetime = None
+            end_time: datetime = None, channel_id: int = None, guild_id: int = None
         ) -> dict:
         """
         
@@ -497,8 +1777,8 @@ class ApprovalsDB(SqliteAsyncWrapper):
         """
         # b = self.builder('approvals')
         if empty(end_time, zero=True): end_time = default_endtime()
-        if isinstance(disapproved_by, list): disapproved_by = str(disapproved_by)
-        if isinstance(approved_by, list): approved_by = str(approved_by)
+        if isinstance(disapproved_by, list): disapproved_by = json.dumps(disapproved_by)
+        if isinstance(approved_by, list): approved_by = json.dumps(approved_by)
         disapprovals, approvals = int(disapprovals), int(approvals)
         if outcome == ApprovalOutcome.AUTO:
             if approvals > disapprovals:
@@ -513,11 +1793,12 @@ class ApprovalsDB(SqliteAsyncWrapper):
 
         res, cur = await self.execute(
             "INSERT INTO approvals (message_id, action, url, reason, username, approvals, disapprovals, "
-            "approved_by, disapproved_by, outcome, total_all_mods, end_time) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+            "approved_by, disapproved_by, outcome, total_all_mods, end_time, channel_id, url_canonical, guild_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
             [
                 message_id, action, url, reason, username, approvals, disapprovals, approved_by, 
-                disapproved_by, outcome, total_all_mods, end_time
+                disapproved_by, outcome, total_all_mods, end_time, channel_id,
+                None if empty(url) else canonical_url(url), guild_id
 
             ]
         )
@@ -534,7 +1815,78 @@ class ApprovalsDB(SqliteAsyncWrapper):
             >>> adb = ApprovalsDB()
             >>> await adb.update(5, approvals=5, disapprovals=2, outcome=ApprovalOutcome.APPROVED)
         
+        When ``APPROVAL_DB_WRITE_BEHIND`` is enabled, the update is merged with any other pending updates
+        for the same row and ``0`` is returned - the pending updates are saved together in one transaction
+        after ``APPROVAL_DB_WRITE_BEHIND_MS`` milliseconds, or once ``APPROVAL_DB_WRITE_BEHIND_ROWS`` rows
+        have pending updates (see :meth:`.flush_updates`).
+        """
+        if not settings.APPROVAL_DB_WRITE_BEHIND:
+            return await self.action(*self._update_query(id, **kwargs))
+        pending = ApprovalsDB._pending_updates.setdefault(self.db, {})
+        pending.setdefault(int(id), {}).update(kwargs)
+        if len(pending) >= settings.APPROVAL_DB_WRITE_BEHIND_ROWS:
+            await self.flush_updates()
+        elif self.db not in ApprovalsDB._flush_tasks:
+            ApprovalsDB._flush_tasks[self.db] = asyncio.create_task(self._flush_later())
+        return 0
+
+    _pending_updates: Dict[str, Dict[int, dict]] = {}
+    """Write-behind mode - maps each DB path to the merged pending ``{column: value}`` updates for each row ID"""
+    _flush_tasks: Dict[str, asyncio.Task] = {}
+    """Write-behind mode - the timer task which will flush each DB path's pending updates"""
+
+    async def _flush_later(self):
+        await asyncio.sleep(settings.APPROVAL_DB_WRITE_BEHIND_MS / 1000)
+        ApprovalsDB._flush_tasks.pop(self.db, None)
+        try:
+            await self.flush_updates()
+        except Exception:
+            log.exception("Error while flushing pending approval updates to %s", self.db)
+
+    async def _flush_before_read(self):
+        """Flush any pending write-behind updates so that reads don't return stale rows"""
+        if len(ApprovalsDB._pending_updates.get(self.db, {})) > 0:
+            await self.flush_updates()
+
+    async def flush_updates(self) -> int:
+        """
+        Save every pending write-behind update for this DB in a single transaction, returns the number of rows updated.
+
+        If saving fails, the updates are put back into the queue (any newer updates to the same columns
+        take priority), another flush is scheduled in ``APPROVAL_DB_WRITE_BEHIND_MS`` milliseconds, and the
+        exception is re-raised.
         """
+        pending = ApprovalsDB._pending_updates.pop(self.db, {})
+        if len(pending) == 0:
+            return 0
+        log.debug("Flushing pending updates for %s approvals to %s", len(pending), self.db)
+        try:
+            async with self.transaction() as c:
+                for id, fields in pending.items():
+                    await c.execute(*self._update_query(id, **fields))
+        except Exception:
+            requeue = ApprovalsDB._pending_updates.setdefault(self.db, {})
+            for id, fields in pending.items():
+                requeue[id] = {**fields, **requeue.get(id, {})}
+            if self.db not in ApprovalsDB._flush_tasks:
+                ApprovalsDB._flush_tasks[self.db] = asyncio.create_task(self._flush_later())
+            raise
+        return len(pending)
+
+    @classmethod
+    async def flush_all_updates(cls) -> int:
+        """Immediately flush the pending write-behind updates for every DB (e.g. before shutting down)"""
+        for t in cls._flush_tasks.values():
+            t.cancel()
+        cls._flush_tasks.clear()
+        count = 0
+        for db in list(cls._pending_updates.keys()):
+            count += await cls(db).flush_updates()
+        return count
+
+    @staticmethod
+    def _update_query(id: int, **kwargs) -> Tuple[str, list]:
+        """Build the ``UPDATE approvals`` query + params used by :meth:`.update` and :meth:`.vote_many`"""
         kwargs = dict(kwargs)
         if 'approved_by' in kwargs and isinstance(kwargs['approved_by'], list):
             kwargs['approved_by'] = json.dumps(kwargs['approved_by'])
@@ -544,6 +1896,8 @@ class ApprovalsDB(SqliteAsyncWrapper):
             kwargs['timestamp'] = str(kwargs['timestamp'].isoformat())
         if 'outcome' in kwargs and isinstance(kwargs['outcome'], ApprovalOutcome):
             kwargs['outcome'] = kwargs['outcome'].value
+        if 'finalized' in kwargs:
+            kwargs['finalized'] = int(bool(kwargs['finalized']))
         fields = [i for i, x in kwargs.items()]
         values = [kwargs[f] for f in fields]
         query = "UPDATE approvals SET "
@@ -551,7 +1905,7 @@ class ApprovalsDB(SqliteAsyncWrapper):
             query += f"{field} = ?, "
         query = query.rstrip(', ')
         query += ' WHERE id = ?;'
-        return await self.action(query, values + [id])
+        return query, values + [id]
     
 # x = ApprovalsDB()
 
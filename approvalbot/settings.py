@@ -3,7 +3,6 @@ from pathlib import Path
 from typing import List, Union, Optional
 from privex.helpers import env_bool, env_csv, env_int, DictObject
 from privex.helpers import settings as pvx_settings
-from privex.loghelper import LogHelper
 from os import getenv as env
 from os.path import dirname, abspath
 import os
@@ -11,7 +10,10 @@ import logging
 
 BASE_DIR: Path = Path(dirname(dirname(abspath(__file__)))).resolve()
 
-load_dotenv()
+# Unlike the rest of the startup work (see core.init), the .env file has to be loaded at import time, as every
+# setting below is read from the environment when this module is imported. It only reads the project's own
+# .env file (variables which are already set take priority) - nothing is created or written.
+load_dotenv(BASE_DIR / '.env')
 
 VERSION: str = '1.0.0'
 """Version number for ApprovalBot"""
@@ -26,16 +28,54 @@ CONFIG_FILE: Path = Path(env('CONFIG_FILE', BASE_DIR / 'config.yml')).resolve()
 
 LOG_LEVEL = logging.getLevelName(env('LOG_LEVEL', 'DEBUG' if DEBUG else 'WARN').upper())
 
-_lh = LogHelper('approvalbot', level=LOG_LEVEL, handler_level=LOG_LEVEL)
-_lh.add_console_handler()
-log = logging.getLogger(__name__)
-
 DEFAULT_APPROVAL_END = env_int('DEFAULT_APPROVAL_END', 60 * 60)
 """(Default: 1 hour) How long before you can't vote on an approval request any more - in seconds."""
+MESSAGE_STORE_GRACE: int = env_int('MESSAGE_STORE_GRACE', 60 * 60)
+"""(Default: 1 hour) How long a poll's cached data (``MessageStore``) is kept after it's voting ends - in seconds."""
+
+EXPIRY_LOOKBACK: int = env_int('EXPIRY_LOOKBACK', 60 * 60 * 24 * 7)
+"""
+(Default: 7 days) When the bot starts, approval requests which ended up to this many seconds ago, but weren't
+finalized (e.g. because the bot was offline when they ended), are finalized and have their voting buttons disabled.
+"""
 
 SERVER_IDS: List[int] = [int(i) for i in env_csv('SERVER_IDS', [])]
 """The Discord server IDs the bot should run in"""
 
+PERM_CACHE_TTL: int = env_int('PERM_CACHE_TTL', 300)
+"""(Default: 5 mins) How long a user's Discord server admin status is cached for before it's looked up again - in seconds."""
+PERM_CACHE_SIZE: int = env_int('PERM_CACHE_SIZE', 1000)
+"""Maximum number of guild/user server admin statuses to cache, least recently used entries are evicted first."""
+APPROVAL_CACHE_SIZE: int = env_int('APPROVAL_CACHE_SIZE', 500)
+"""Maximum number of open approval polls to keep in memory, avoiding re-loading them from the DB for every vote."""
+EDIT_WINDOW: float = float(env('EDIT_WINDOW', 1.0))
+"""
+(Default: 1 second) Minimum time between edits of a poll message. Votes made during this window are shown
+together in one edit, to avoid hitting Discord's rate limits during a burst of votes.
+"""
+ACK_WARN_MARGIN: float = float(env('ACK_WARN_MARGIN', 1.0))
+"""
+(Default: 1 second) Log a warning when an interaction is acknowledged with less than this many seconds left of
+Discord's 3 second response deadline - the margin of every interaction is exported by :mod:`approvalbot.metrics`.
+"""
+CONFIG_SAVE_DELAY: float = float(env('CONFIG_SAVE_DELAY', 2.0))
+"""
+(Default: 2 seconds) How long to wait after a config change (e.g. ``/add_moderator``) before saving the config
+file - any other changes made in the meantime are saved in the same write.
+"""
+HISTORY_PAGE_SIZE: int = env_int('HISTORY_PAGE_SIZE', 10)
+"""How many approvals are shown per page by ``/approval_history`` (max 25 - the most fields a Discord embed can have)"""
+HISTORY_PAGE_TTL: int = env_int('HISTORY_PAGE_TTL', 15 * 60)
+"""(Default: 15 mins) How long the Previous/Next buttons on an ``/approval_history`` message keep working - in seconds."""
+
+METRICS_PORT: int = env_int('METRICS_PORT', 0)
+"""
+(Default: 0 - disabled) Serve latency histograms and vote/poll counters in the Prometheus text format on this
+port, at ``/metrics`` - see :mod:`approvalbot.metrics`
+"""
+METRICS_HOST: str = env('METRICS_HOST', '127.0.0.1')
+"""(Default: 127.0.0.1 - local connections only) The address the metrics HTTP server listens on"""
+
 CACHE_ADAPTER: str = env('CACHE_ADAPTER', 'memory' if DEBUG else 'sqlite3')
 """
 The default Cache Adapter for the application.
@@ -63,15 +103,75 @@ APPROVAL_DB: Path = Path(env('APPROVAL_DB', DATA_DIR / 'approvals.sqlite3'))
 
 APPROVAL_DB = APPROVAL_DB.resolve()
 
+APPROVAL_DB_PERSISTENT: bool = env_bool('APPROVAL_DB_PERSISTENT', True)
+"""
+(Default: True) Keep one SQLite connection to the Approvals DB open for the whole process, instead of opening
+a new connection for every query. The persistent connection is tuned using the ``APPROVAL_DB_*`` settings below.
+"""
+APPROVAL_DB_SYNC: str = env('APPROVAL_DB_SYNC', 'NORMAL').upper()
+"""
+(Default: NORMAL) SQLite ``synchronous`` mode for the persistent connection. ``NORMAL`` is safe with WAL mode,
+but the last transactions before a power loss / OS crash may be rolled back - use ``FULL`` to avoid that.
+"""
+APPROVAL_DB_MMAP: int = env_int('APPROVAL_DB_MMAP', 64 * 1024 * 1024)
+"""(Default: 64MB) Maximum bytes of the Approvals DB which SQLite may memory-map (``PRAGMA mmap_size``)"""
+APPROVAL_DB_STMT_CACHE: int = env_int('APPROVAL_DB_STMT_CACHE', 256)
+"""(Default: 256) How many prepared SQL statements to cache on the persistent connection"""
+
+APPROVAL_DB_WRITE_BEHIND: bool = env_bool('APPROVAL_DB_WRITE_BEHIND', False)
+"""
+(Default: False) Queue approval updates (e.g. outcome changes) in memory and save them in batches, instead
+of saving each one immediately. Reduces disk syncs under heavy load, but if the bot crashes, updates from
+the last ``APPROVAL_DB_WRITE_BEHIND_MS`` milliseconds may be lost (votes themselves are always saved immediately).
+"""
+APPROVAL_DB_WRITE_BEHIND_MS: int = env_int('APPROVAL_DB_WRITE_BEHIND_MS', 250)
+"""(Default: 250ms) Write-behind mode - the longest an update can wait in the queue before it's saved"""
+APPROVAL_DB_WRITE_BEHIND_ROWS: int = env_int('APPROVAL_DB_WRITE_BEHIND_ROWS', 100)
+"""(Default: 100) Write-behind mode - save the queue immediately once this many approvals have pending updates"""
+
+SLOW_LOG_MS: float = float(env('SLOW_LOG_MS', 1000))
+"""
+(Default: 1000ms) Interactions (slash commands / button clicks) which take at least this many milliseconds to
+handle are written to ``SLOW_LOG_FILE``, with a breakdown of how long each step took. Set to ``0`` to disable.
+"""
+SLOW_LOG_FILE: Path = Path(env('SLOW_LOG_FILE', DATA_DIR / 'slow_interactions.jsonl'))
+"""Where to write the slow interaction log (one JSON object per line) - defaults to: DATA_DIR/slow_interactions.jsonl"""
+
+STATE_BACKEND: str = env('STATE_BACKEND', 'local').lower()
+"""
+(Default: local) Where poll votes / tallies and server configs are shared from. ``local`` keeps them in the bot
+process. ``redis`` keeps them in the Redis server at ``STATE_REDIS_URL``, so several bot processes (e.g. one per
+gateway shard) can serve the same servers and polls - see :mod:`approvalbot.shared`.
+"""
+STATE_REDIS_URL: str = env('STATE_REDIS_URL', 'redis://localhost:6379/0')
+"""(Default: redis://localhost:6379/0) The Redis server used when ``STATE_BACKEND`` is ``redis``"""
+STATE_PREFIX: str = env('STATE_PREFIX', 'approvalbot')
+"""(Default: approvalbot) Prefix for the shared state's Redis keys - change it to run several deployments on one Redis"""
+SHARD_ID: int = env_int('SHARD_ID', 0)
+"""Which gateway shard this process connects as (``0`` to ``SHARD_COUNT - 1``)"""
+SHARD_COUNT: int = env_int('SHARD_COUNT', 0)
+"""
+(Default: 0 - sharding disabled) The total number of gateway shards, when running one bot process per shard.
+Each process needs a different ``SHARD_ID``, and ``STATE_BACKEND=redis`` so polls can be voted on from any shard.
+"""
+
 pvx_settings.SQLITE_APP_DB_FOLDER = env('SQLITE_APP_DB_FOLDER', str(DATA_DIR))
 pvx_settings.SQLITE_APP_DB_NAME = env('SQLITE_APP_DB_NAME', 'cache_approvalbot')
 
 CONFIG_DEFAULTS = DictObject(
     moderators=[], admins=[], show_votes=False,
-    admins_can_vote=True, majority_include_admins=True
+    admins_can_vote=True, majority_include_admins=True, guilds={}
 )
 CONFIG = DictObject(**CONFIG_DEFAULTS)
 
+GUILD_CONFIG_KEYS: List[str] = ['moderators', 'admins', 'show_votes', 'admins_can_vote', 'majority_include_admins']
+"""
+Config keys which are set separately for each Discord server, under ``CONFIG.guilds[guild_id]``.
+
+New servers start with the defaults from :data:`.CONFIG_DEFAULTS`. The top-level values of these keys (from
+single-server configs) are moved into the first server in ``SERVER_IDS`` the first time it's used.
+"""
+
 if not CONFIG_FILE.is_absolute():
     CONFIG_FILE = BASE_DIR / CONFIG_FILE
 
@@ -80,7 +180,3 @@ if not APPROVAL_DB.is_absolute():
         APPROVAL_DB = APPROVAL_DB.name
     APPROVAL_DB =  DATA_DIR / APPROVAL_DB
 
-if not Path(pvx_settings.SQLITE_APP_DB_FOLDER).exists():
-    log.debug("Sqlite DB dir doesn't exist, creating SQLITE_APP_DB_FOLDER folder: %s", pvx_settings.SQLITE_APP_DB_FOLDER)
-    os.mkdir(pvx_settings.SQLITE_APP_DB_FOLDER)
-
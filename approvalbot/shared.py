@@ -0,0 +1,360 @@
+"""
+Shared state - votes, tallies and per-server config kept in Redis, so several bot processes / gateway shards
+can serve one deployment
+
+With ``STATE_BACKEND=redis``, each poll's votes live in two Redis hashes, which are only changed by
+:data:`.VOTE_SCRIPT` - so votes made through different processes at the same time are applied atomically,
+and every process sees the same tallies::
+
+    approvalbot:votes:<approval_id>   voter -> 'approve' / 'disapprove'
+    approvalbot:tally:<approval_id>   'approve' / 'disapprove' -> count, 'version' -> changes made,
+                                      'rendered' -> the version last shown on the poll message
+
+Any process may edit a poll's message after a vote, so edits are made through :meth:`.SharedState.claim_render`,
+which hands out each tally version once - a process whose tally has already been shown by another one (or
+replaced by a newer one) skips it's edit, rather than overwriting a newer tally with an older one.
+
+Each server's config is stored as JSON under ``approvalbot:config:<guild_id>``. When a process changes it, it
+publishes the server ID on ``approvalbot:config``, and the other processes re-load that server's config.
+New polls are announced on ``approvalbot:polls``, so every process schedules every poll's expiry - and the
+process which wins :meth:`.SharedState.claim_finalize` finalizes it. If that process dies part way through,
+the others try again once it's claim expires, so a poll is never left open because one process went down.
+
+The approvals themselves are still saved in the Approvals DB, which the processes must share (e.g. they run
+on the same host) - votes are recorded there with an atomic upsert while holding the poll's lock (see
+:meth:`.SharedState.voting`), so the DB's counters and votes match Redis.
+
+Usage::
+
+    >>> state = get_state()
+    >>> if state is not None:
+    ...     async with state.voting(aprv, [('SomeUser#1234', VoteChoice.APPROVE)]) as changed:
+    ...         await aprv.save_votes(changed)
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Union
+from privex.helpers import empty
+from approvalbot import settings
+from approvalbot.core import guild_config, _plain
+from approvalbot.objects import Approval, VoteChoice, datetime_to_unix
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+log = logging.getLogger(__name__)
+
+__all__ = ['VOTE_SCRIPT', 'RENDER_SCRIPT', 'FINALIZE_CLAIM_TTL', 'VOTE_LOCK_TTL', 'SharedState', 'get_state', 'set_state']
+
+VOTE_SCRIPT = """
+-- KEYS[1] = votes hash (voter -> choice), KEYS[2] = tally hash (choice -> count)
+-- ARGV[1] = TTL in seconds, ARGV[2] = number of seed votes, then the seed (voter, choice) pairs,
+-- followed by the (voter, choice) pairs to apply
+local ttl, nseed = tonumber(ARGV[1]), tonumber(ARGV[2])
+local first = 3 + nseed * 2
+-- Seed the poll from the votes saved in the DB, unless another process already has
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('HSET', KEYS[2], 'approve', 0, 'disapprove', 0, 'version', 0)
+    for i = 3, first - 1, 2 do
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+        redis.call('HINCRBY', KEYS[2], ARGV[i + 1], 1)
+    end
+end
+local changed = {}
+for i = first, #ARGV, 2 do
+    local voter, choice = ARGV[i], ARGV[i + 1]
+    local prev = redis.call('HGET', KEYS[1], voter)
+    if prev ~= choice then
+        redis.call('HSET', KEYS[1], voter, choice)
+        if prev then
+            redis.call('HINCRBY', KEYS[2], prev, -1)
+        end
+        redis.call('HINCRBY', KEYS[2], choice, 1)
+        changed[#changed + 1] = voter
+    end
+end
+if #changed > 0 then
+    redis.call('HINCRBY', KEYS[2], 'version', 1)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('EXPIRE', KEYS[2], ttl)
+return {changed, redis.call('HMGET', KEYS[2], 'approve', 'disapprove', 'version'), redis.call('HGETALL', KEYS[1])}
+"""
+"""
+Atomically seeds a poll's votes (if they aren't in Redis yet), applies a batch of votes to it - bumping the
+tally's ``version`` if anything changed - and returns
+``[changed voters, [approvals, disapprovals, version], [voter, choice, voter, choice, ...]]``
+"""
+
+RENDER_SCRIPT = """
+-- KEYS[1] = tally hash. Claims the poll's current tally version for a message edit, unless it's already been claimed
+local t = redis.call('HMGET', KEYS[1], 'approve', 'disapprove', 'version', 'rendered')
+if not t[3] or tonumber(t[4] or '-1') >= tonumber(t[3]) then
+    return false
+end
+redis.call('HSET', KEYS[1], 'rendered', t[3])
+return {t[1], t[2], t[3]}
+"""
+"""
+Returns the poll's current ``[approvals, disapprovals, version]`` and marks that version as rendered - or ``nil``
+if it's already been rendered, or the poll isn't in Redis (e.g. it's been finalized)
+"""
+
+VOTE_LOCK_TTL: int = 10
+"""
+How long (in seconds) :meth:`.SharedState.voting` holds a poll's lock for at most - so a process which dies
+while holding it doesn't stop votes on that poll for longer than this
+"""
+
+FINALIZE_CLAIM_TTL: int = 60
+"""
+How long (in seconds) a process has to finalize a poll after claiming it - the other processes check the poll
+again once the claim expires, in case the process which claimed it died
+"""
+
+
+def _str(v: Union[bytes, str]) -> str:
+    return v.decode() if isinstance(v, bytes) else str(v)
+
+
+async def _aclose(obj):
+    # redis-py 5.0.1 renamed close() to aclose(), and deprecated close()
+    close = getattr(obj, 'aclose', None) or obj.close
+    await close()
+
+
+class SharedState:
+    """
+    Votes, tallies and per-server config shared between bot processes through Redis - see the module docs.
+
+    ``client`` is a ``redis.asyncio.Redis`` client (or a compatible fake, e.g. ``fakeredis.FakeAsyncRedis``),
+    by default one is created from ``STATE_REDIS_URL``.
+    """
+    def __init__(self, client=None, prefix: str = None):
+        if client is None:
+            try:
+                from redis import asyncio as aioredis
+            except ImportError as e:
+                raise ImportError(
+                    "STATE_BACKEND=redis requires redis-py 4.2 or newer - please run 'pipenv install', "
+                    "or 'pip3 install -U \"redis>=4.2\"'"
+                ) from e
+            client = aioredis.from_url(settings.STATE_REDIS_URL)
+        self.client = client
+        self.prefix = settings.STATE_PREFIX if prefix is None else prefix
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        """Identifies this process in config change messages, so it ignores the ones it published"""
+        self._vote_script = client.register_script(VOTE_SCRIPT)
+        self._render_script = client.register_script(RENDER_SCRIPT)
+        self._listener: Optional[asyncio.Task] = None
+
+    def key(self, *parts: Any) -> str:
+        return ':'.join([self.prefix, *[str(p) for p in parts]])
+
+    @property
+    def config_channel(self) -> str:
+        return self.key('config')
+
+    @property
+    def polls_channel(self) -> str:
+        return self.key('polls')
+
+    # --- Votes / tallies ---
+
+    @staticmethod
+    def ttl_for(aprv: Approval) -> int:
+        """Keep a poll's votes until ``MESSAGE_STORE_GRACE`` seconds after it's voting ends"""
+        return max(int(datetime_to_unix(aprv.end_time) - time.time()), 0) + settings.MESSAGE_STORE_GRACE
+
+    async def apply_votes(self, aprv: Approval, votes: List[Tuple[str, VoteChoice]]) -> List[Tuple[str, VoteChoice]]:
+        """
+        Atomically apply ``votes`` to the poll ``aprv`` in Redis, then update ``aprv``'s tallies and voter lists
+        with the result - which includes votes made through other processes.
+
+        The poll is seeded from ``aprv``'s voter lists if it isn't in Redis yet. Pass no ``votes`` to only
+        refresh ``aprv`` (e.g. before finalizing it). Returns the ``(voter, choice)`` votes which changed
+        anything, to be saved to the DB with :meth:`.Approval.save_votes`.
+        """
+        seed = [(u, VoteChoice.APPROVE.value) for u in aprv.approved_by] + \
+               [(u, VoteChoice.DISAPPROVE.value) for u in aprv.disapproved_by]
+        args = [self.ttl_for(aprv), len(seed)]
+        for voter, choice in seed + [(v, VoteChoice(c).value) for v, c in votes]:
+            args += [voter, choice]
+        changed, tally, voters = await self._vote_script(
+            keys=[self.key('votes', aprv.id), self.key('tally', aprv.id)], args=args
+        )
+        changed = set(_str(v) for v in changed)
+        aprv.approvals, aprv.disapprovals = int(tally[0] or 0), int(tally[1] or 0)
+        current = {_str(voters[i]): _str(voters[i + 1]) for i in range(0, len(voters), 2)}
+        # Keep the existing voters in the order they voted, followed by any new ones
+        for attr, choice in (('approved_by', VoteChoice.APPROVE.value), ('disapproved_by', VoteChoice.DISAPPROVE.value)):
+            old = [u for u in getattr(aprv, attr) if current.get(u) == choice]
+            known = set(old)
+            setattr(aprv, attr, old + sorted(u for u, c in current.items() if c == choice and u not in known))
+        # A voter who voted more than once in the batch only needs their final vote saving
+        final = {v: VoteChoice(c) for v, c in votes if v in changed}
+        return list(final.items())
+
+    @asynccontextmanager
+    async def voting(self, aprv: Approval, votes: List[Tuple[str, VoteChoice]]) -> AsyncIterator[List[Tuple[str, VoteChoice]]]:
+        """
+        Lock the poll ``aprv`` across processes, then :meth:`.apply_votes` - yielding the changed votes, which
+        should be saved to the DB before leaving the block. Holding the lock until then means every process
+        saves each voter's votes in the same order they were applied in Redis, so the DB ends up matching it::
+
+            >>> async with state.voting(aprv, votes) as changed:
+            ...     await aprv.save_votes(changed)
+
+        """
+        async with self.client.lock(self.key('lock', aprv.id), timeout=VOTE_LOCK_TTL, blocking_timeout=VOTE_LOCK_TTL):
+            yield await self.apply_votes(aprv, votes)
+
+    async def claim_render(self, aprv: Approval) -> bool:
+        """
+        Claim the poll ``aprv``'s current tally for a message edit - updating ``aprv``'s counts to it. Returns
+        ``False`` if that tally has already been claimed by another edit (or the poll was finalized), in which
+        case the edit should be skipped, as it would show the same or an older tally.
+        """
+        tally = await self._render_script(keys=[self.key('tally', aprv.id)])
+        if tally is None:
+            return False
+        aprv.approvals, aprv.disapprovals = int(tally[0] or 0), int(tally[1] or 0)
+        return True
+
+    async def forget(self, approval_id: int):
+        """Remove a poll's votes from Redis (e.g. once it's been finalized) - they're kept in the DB"""
+        await self.client.delete(self.key('votes', approval_id), self.key('tally', approval_id))
+
+    # --- Poll expiry ---
+
+    async def announce_poll(self, approval_id: int, end_time: Union[int, float]):
+        """Tell the other processes about a new poll, so they schedule it's expiry too"""
+        await self.client.publish(
+            self.polls_channel, json.dumps(dict(id=int(approval_id), end_time=float(end_time), origin=self.origin))
+        )
+
+    async def claim_finalize(self, approval_id: int) -> bool:
+        """
+        Claim poll ``approval_id`` for finalizing - only one process gets ``True`` until the claim expires after
+        :data:`.FINALIZE_CLAIM_TTL` seconds
+        """
+        claimed = await self.client.set(
+            self.key('finalizing', approval_id), self.origin, nx=True, ex=FINALIZE_CLAIM_TTL
+        )
+        return bool(claimed)
+
+    # --- Config ---
+
+    async def publish_config(self, guild_id: Union[int, str]):
+        """Store server ``guild_id``'s config in Redis, and tell the other processes to re-load it"""
+        guild_id = int(guild_id)
+        data = json.dumps(_plain(dict(guild_config(guild_id))))
+        await self.client.set(self.key('config', guild_id), data)
+        await self.client.publish(self.config_channel, json.dumps(dict(guild=guild_id, origin=self.origin)))
+
+    async def load_config(self, guild_id: Union[int, str]) -> bool:
+        """Re-load server ``guild_id``'s config from Redis - returns ``False`` if it isn't stored there"""
+        guild_id = int(guild_id)
+        data = await self.client.get(self.key('config', guild_id))
+        if empty(data):
+            return False
+        gcfg = guild_config(guild_id)
+        gcfg.clear()
+        gcfg.update(json.loads(_str(data)))
+        return True
+
+    async def load_configs(self) -> List[int]:
+        """Load every server config stored in Redis - returns the server IDs which were loaded"""
+        loaded = []
+        async for key in self.client.scan_iter(match=self.key('config', '*')):
+            guild_id = _str(key).rsplit(':', 1)[-1]
+            if guild_id.isdigit() and await self.load_config(guild_id):
+                loaded.append(int(guild_id))
+        return loaded
+
+    async def listen(self, on_config_change: Callable[[int], Awaitable[Any]],
+                     on_new_poll: Optional[Callable[[int, float], Any]] = None):
+        """
+        Start a background task which handles the messages published by other processes:
+
+          * a server's config changed - the config is re-loaded, then ``on_config_change(guild_id)`` is awaited
+          * a poll was created - ``on_new_poll(approval_id, end_time)`` is called (e.g. to schedule it's expiry)
+
+        """
+        if self._listener is not None and not self._listener.done():
+            return
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.config_channel, self.polls_channel)
+        self._listener = asyncio.create_task(self._listen(pubsub, on_config_change, on_new_poll))
+
+    async def _listen(self, pubsub, on_config_change: Callable[[int], Awaitable[Any]],
+                      on_new_poll: Optional[Callable[[int, float], Any]]):
+        try:
+            async for msg in pubsub.listen():
+                if msg.get('type') != 'message':
+                    continue
+                try:
+                    data = json.loads(_str(msg['data']))
+                    if data.get('origin') == self.origin:
+                        continue
+                    if _str(msg['channel']) == self.polls_channel:
+                        if on_new_poll is not None:
+                            on_new_poll(int(data['id']), float(data['end_time']))
+                        continue
+                    await self.load_config(data['guild'])
+                    await on_config_change(int(data['guild']))
+                except Exception:
+                    log.exception("Failed to handle shared state message: %s", msg)
+        finally:
+            await pubsub.unsubscribe()
+            await _aclose(pubsub)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await _aclose(self.client)
+
+
+_STATE: Optional[SharedState] = None
+
+
+def get_state() -> Optional[SharedState]:
+    """
+    The :class:`.SharedState` for this process if ``STATE_BACKEND`` is ``redis`` (created on first use),
+    or ``None`` if state is kept in-process (``local``, the default)
+    """
+    global _STATE
+    if _STATE is None and settings.STATE_BACKEND == 'redis':
+        _STATE = SharedState()
+    return _STATE
+
+
+def set_state(state: Optional[SharedState]):
+    """Replace the process's :class:`.SharedState` - e.g. with one using a fake Redis client for testing"""
+    global _STATE
+    _STATE = state
@@ -0,0 +1,175 @@
+"""
+Tracing - per-interaction latency breakdowns, with a JSON-lines log of slow interactions
+
+Each interaction (slash command / button click) gets a :class:`.Trace`, keyed by it's interaction ID,
+and each step of handling it is timed as a child span::
+
+    >>> @bot.component("approve")
+    ... @tracing.traced('approve')
+    ... async def approve_handler(ctx):
+    ...     with tracing.span('auth'):
+    ...         auth = await AuthContext.from_ctx(ctx)
+    ...     ...
+
+Traces which take at least ``SLOW_LOG_MS`` milliseconds are written to ``SLOW_LOG_FILE`` as one JSON
+object per line::
+
+    {"ts": "2022-06-10T12:30:00.123+00:00", "trace": "approve", "id": "98765", "total_ms": 812.4,
+     "attrs": {"user": "SomeUser#1234", "poll": 12345}, "spans": [{"name": "auth", "start_ms": 0.0, "ms": 1.2}, ...]}
+
+When there's no active trace, :func:`.span` does nothing, so code shared with non-interaction paths
+(e.g. the expiry scheduler) can be traced without any cost outside of interactions. Recording a span is only
+a couple of ``perf_counter()`` calls - nothing is formatted unless the trace is slow enough to be logged.
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from approvalbot import settings
+import json
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+__all__ = ['Trace', 'current', 'trace', 'span', 'annotate', 'traced', 'slow_log']
+
+_current: ContextVar[Optional["Trace"]] = ContextVar('approvalbot_trace', default=None)
+
+
+class Trace:
+    """The timed spans of a single interaction - see :func:`.trace`"""
+    __slots__ = ('name', 'id', 'attrs', 'start', 'end', 'spans')
+
+    def __init__(self, name: str, trace_id: Any = None, **attrs):
+        self.name, self.id, self.attrs = name, trace_id, attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Tuple[str, float, float]] = []
+        """``(name, start, end)`` of each span, as ``time.perf_counter()`` values"""
+
+    def add_span(self, name: str, start: float, end: float):
+        self.spans.append((name, start, end))
+
+    @property
+    def total_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            ts=datetime.now(timezone.utc).isoformat(timespec='milliseconds'), trace=self.name,
+            id=None if self.id is None else str(self.id), total_ms=round(self.total_ms, 3), attrs=self.attrs,
+            spans=[
+                dict(name=n, start_ms=round((s - self.start) * 1000, 3), ms=round((e - s) * 1000, 3))
+                for n, s, e in self.spans
+            ],
+        )
+
+    def __repr__(self) -> str:
+        return f"<Trace {self.name} id={self.id} total_ms={self.total_ms:.3f} spans={len(self.spans)} />"
+
+
+def current() -> Optional[Trace]:
+    """The trace for the interaction currently being handled (in this task), or ``None``"""
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str, trace_id: Any = None, **attrs) -> Iterator[Trace]:
+    """
+    Trace the code within the ``with`` block as the interaction ``trace_id``. Spans within it (including in
+    functions it calls / awaits) are added to this trace, and it's written to the slow log if it's too slow.
+    """
+    t = Trace(name, trace_id, **attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+        t.end = time.perf_counter()
+        if settings.SLOW_LOG_MS > 0 and t.total_ms >= settings.SLOW_LOG_MS:
+            slow_log(t)
+
+
+@contextmanager
+def span(name: str, traces: Optional[Iterable[Trace]] = None) -> Iterator[None]:
+    """
+    Time the code within the ``with`` block as the span ``name`` of the current trace - or of each trace in
+    ``traces``, e.g. for a batch of votes from several interactions which are processed together.
+    """
+    if traces is None:
+        t = _current.get()
+        traces = () if t is None else (t,)
+    if not traces:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        for t in traces:
+            t.add_span(name, start, end)
+
+
+def annotate(**attrs):
+    """Add ``attrs`` (e.g. the calling user, once it's known) to the current trace, if there is one"""
+    t = _current.get()
+    if t is not None:
+        t.attrs.update(attrs)
+
+
+def traced(name: str):
+    """
+    Decorator which runs a command / component handler within a :func:`.trace` named ``name``, keyed by
+    the interaction ID of it's context argument. Like :func:`.metrics.timed`, it keeps the function's
+    signature, so it can go below ``@bot.command`` / ``@interactions.option``::
+
+        >>> @bot.component("approve")
+        ... @traced('approve')
+        ... async def approve_handler(ctx): ...
+
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(ctx, *args, **kwargs):
+            with trace(name, getattr(ctx, 'id', None), guild=getattr(ctx, 'guild_id', None)):
+                return await func(ctx, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_slow_logger: Optional[logging.Logger] = None
+
+
+def slow_log(t: Trace):
+    """Write the trace ``t`` to ``SLOW_LOG_FILE`` as a JSON line (the file is opened on the first write)"""
+    global _slow_logger
+    if _slow_logger is None:
+        _slow_logger = logging.getLogger('approvalbot.slowlog')
+        _slow_logger.propagate = False
+        _slow_logger.setLevel(logging.INFO)
+        handler = logging.FileHandler(str(settings.SLOW_LOG_FILE), delay=True)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _slow_logger.addHandler(handler)
+    _slow_logger.info(json.dumps(t.to_dict(), default=str))
+    log.info("Slow interaction: %s took %.1fms", t.name, t.total_ms)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark - import time of the ApprovalBot modules, and a check that importing them has no side effects
+
+Imports each module in a fresh interpreter, without a ``DISCORD_TOKEN``, and with ``DATA_DIR`` / ``CONFIG_FILE``
+pointed at a folder which doesn't exist, then checks that:
+
+  * the import didn't exit, create the data folder / config file, or import discord-py-interactions
+  * ApprovalBot's own import time is within the budget - it's third-party dependencies are imported
+    before the timer starts, as they're outside of ApprovalBot's control
+
+Exits with status 1 if any check fails, so it can be used in CI.
+
+Usage::
+
+    python3 benchmarks/import_time.py            # 50ms budget
+    python3 benchmarks/import_time.py 20         # 20ms budget
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from os.path import dirname, abspath, exists, join
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = dirname(dirname(abspath(__file__)))
+
+DEPENDENCIES = ['dotenv', 'yaml', 'aiosqlite', 'privex.helpers', 'privex.helpers.cache', 'privex.db']
+"""Third-party packages imported by the modules below - their import time doesn't count towards the budget"""
+
+MODULES = ['approvalbot.settings', 'approvalbot.core', 'approvalbot.objects', 'approvalbot']
+"""Modules which must import quickly, and without side effects"""
+
+RUNS = 5
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+for m in sys.argv[2].split(','):
+    __import__(m)
+deps = time.perf_counter()
+__import__(sys.argv[1])
+end = time.perf_counter()
+print(json.dumps(dict(deps=(deps - start) * 1000, ms=(end - deps) * 1000, interactions='interactions' in sys.modules)))
+"""
+
+
+def time_import(module: str, env: dict) -> dict:
+    """Import ``module`` in a fresh interpreter ``RUNS`` times, returning the median import times"""
+    results = []
+    for _ in range(RUNS):
+        proc = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT, module, ','.join(DEPENDENCIES)],
+            env=env, cwd=BASE_DIR, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} exited with status {proc.returncode}: {proc.stderr.strip()}")
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return dict(
+        deps=statistics.median(r['deps'] for r in results), ms=statistics.median(r['ms'] for r in results),
+        interactions=any(r['interactions'] for r in results)
+    )
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 50.0
+    tmp_dir = tempfile.mkdtemp(prefix='approvalbot-import-')
+    data_dir = join(tmp_dir, 'data')
+    env = {k: v for k, v in os.environ.items() if k != 'DISCORD_TOKEN'}
+    env.update(PYTHONPATH=BASE_DIR, DATA_DIR=data_dir, CONFIG_FILE=join(data_dir, 'config.yml'))
+
+    failures = []
+    try:
+        for m in MODULES:
+            res = time_import(m, env)
+            print(f"{m:<24} {res['ms']:8.1f}ms   (+ {res['deps']:.1f}ms for dependencies)")
+            if res['ms'] > budget:
+                failures.append(f"{m} took {res['ms']:.1f}ms to import, over the {budget:.0f}ms budget")
+            if res['interactions']:
+                failures.append(f"{m} imported discord-py-interactions")
+        if exists(data_dir):
+            failures.append(f"Importing created the data folder: {data_dir}")
+    except RuntimeError as e:
+        failures.append(str(e))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for f in failures:
+        print(f" [FAIL] {f}", file=sys.stderr)
+    if len(failures) > 0:
+        sys.exit(1)
+    print(f"OK - every module imported within {budget:.0f}ms, without side effects")
+
+
+if __name__ == '__main__':
+    main()
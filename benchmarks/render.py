@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark - rendering the poll message edit made after a vote
+
+Compares the two ways of building the edit for a poll message after a vote:
+
+  * ``template_approve + ctx.edit`` - building every embed with :func:`.template_approve`, then serializing them
+    (and the message's buttons) into a payload the way ``ComponentContext.edit`` does
+  * ``PollRenderer`` - :meth:`.PollRenderer.votes_payload`, which reuses the poll's serialized request embed and
+    only looks up the tally embeds for the new vote counts
+
+reporting the time taken per render, and the size of the JSON payload sent to Discord.
+
+Usage::
+
+    python3 benchmarks/render.py             # 20,000 renders
+    python3 benchmarks/render.py 100000      # 100,000 renders
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from os.path import dirname, abspath
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('DISCORD_TOKEN', 'benchmark')
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import interactions
+from approvalbot.objects import Approval, ApprovalOutcome, now_plus_minutes
+from approvalbot import bot as B
+
+_Context = importlib.import_module('interactions.client.context')._Context
+
+
+class FakeMessage:
+    content = embeds = attachments = components = None
+
+
+class FakeContext:
+    message = FakeMessage()
+
+
+async def ctx_edit_payload(aprv: Approval) -> dict:
+    """The payload ``ComponentContext.edit`` would send for a poll edit before :class:`.PollRenderer`"""
+    embeds = B.template_approve(aprv.action, aprv.url, aprv.reason, aprv.username, aprv.approvals,
+                                aprv.disapprovals, aprv.end_time, db_id=aprv.id)
+    return await _Context.edit(FakeContext(), embeds=embeds, components=[B.approve_button, B.disapprove_button])
+
+
+async def renderer_payload(aprv: Approval) -> dict:
+    return B.RENDERER.votes_payload(aprv)
+
+
+async def bench(name: str, render, aprv: Approval, n: int):
+    start = time.perf_counter()
+    for i in range(n):
+        # Each vote changes one of the counts
+        if i % 2 == 0:
+            aprv.approvals += 1
+        else:
+            aprv.disapprovals += 1
+        payload = await render(aprv)
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<28} {elapsed / n * 1e6:8.1f}us / render   {len(json.dumps(payload)):6} bytes / edit")
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"Rendering {n} poll edits:\n")
+    for name, render in [('template_approve + ctx.edit', ctx_edit_payload), ('PollRenderer', renderer_payload)]:
+        aprv = Approval(
+            id=1, message_id=2, action='delete', url='https://example.com/@user/post', reason='spam',
+            username='SomeUser#1234', outcome=ApprovalOutcome.UNKNOWN, end_time=now_plus_minutes(60),
+        )
+        await bench(name, render, aprv, n)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark - per-vote Approvals DB latency, with and without the persistent SQLite connection
+
+Runs the same sequence of votes (load the poll, apply the vote, save it) against a fresh
+Approvals DB twice - first with ``APPROVAL_DB_PERSISTENT`` disabled (a new connection for every
+query, which is how ApprovalsDB originally worked), then with it enabled - and prints the
+latency of each.
+
+Usage::
+
+    python3 benchmarks/vote_latency.py            # 500 votes
+    python3 benchmarks/vote_latency.py 2000       # 2000 votes
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from os.path import dirname, abspath, join
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix='approvalbot-bench-')
+os.environ.setdefault('DISCORD_TOKEN', 'benchmark')
+os.environ['DATA_DIR'] = TMP_DIR
+os.environ['CONFIG_FILE'] = join(TMP_DIR, 'config.yml')
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from approvalbot import settings
+from approvalbot.objects import APPROVAL_CACHE, Approval, ApprovalsDB, VoteChoice
+
+
+async def run_votes(db_name: str, votes: int, persistent: bool) -> list:
+    settings.APPROVAL_DB_PERSISTENT = persistent
+    APPROVAL_CACHE.clear()
+    # Approval creates it's own ApprovalsDB() instances, so point the default DB at this run's DB file
+    ApprovalsDB.DEFAULT_DB = join(TMP_DIR, db_name)
+    adb = ApprovalsDB()
+    await adb.create_schemas()
+    aprv = Approval(message_id=1, action='delete', url='https://example.com/@user/1', reason='spam', username='Bench#0001')
+    await aprv.save()
+
+    timings = []
+    for i in range(votes):
+        start = time.perf_counter()
+        a = await Approval.from_db(1)
+        user, choice = f"Voter{i % 50}#0001", VoteChoice.APPROVE if i % 3 else VoteChoice.DISAPPROVE
+        a.apply_vote(user, choice)
+        await a.save_votes([(user, choice)])
+        timings.append((time.perf_counter() - start) * 1000)
+    await ApprovalsDB.close_connections()
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p = lambda pct: timings[min(len(timings) - 1, int(len(timings) * pct))]
+    print(f"{name:<24} mean: {statistics.mean(timings):7.3f}ms   p50: {p(0.50):7.3f}ms   "
+          f"p99: {p(0.99):7.3f}ms   votes/sec: {1000 / statistics.mean(timings):8.1f}")
+
+
+async def main():
+    votes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"Running {votes} votes per configuration (DB folder: {TMP_DIR})\n")
+    report("connection per query", await run_votes('before.sqlite3', votes, persistent=False))
+    report("persistent connection", await run_votes('after.sqlite3', votes, persistent=True))
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Benchmark - simulated vote storm, driving the real ``/approval`` command and vote button handlers
+
+Creates M polls with the ``/approval`` command, then has N moderators click the Approve / Disapprove
+buttons on every poll at the same time (some of them changing their vote afterwards), using fake Discord
+contexts whose ``send`` / ``defer`` calls (and the poll message edits) are stubbed out. This is repeated for each cache adapter
+and Approvals DB configuration, reporting for each:
+
+  * throughput (votes/sec), and the p50 / p99 latency of each button click
+  * the smallest margin left of Discord's 3 second deadline when a click was acknowledged
+  * DB queries ran per vote
+  * Discord messages sent / poll edits made, and the average size of an edit's JSON payload
+  * correctness - every poll's final approve/disapprove tallies match the votes which were made, with no lost votes
+
+Exits with status 1 if any configuration lost or miscounted votes.
+
+Usage::
+
+    python3 benchmarks/vote_storm.py                          # 20 voters x 10 polls, memory + sqlite3 cache
+    python3 benchmarks/vote_storm.py -n 50 -m 20              # 50 voters x 20 polls
+    python3 benchmarks/vote_storm.py -a memory,redis -l 50    # Redis cache, with 50ms simulated Discord API latency
+
+Copyright::
+
+    +===================================================+
+    |                 © 2022 Someguy123                 |
+    |               https://github.com/Someguy123       |
+    +===================================================+
+    |                                                   |
+    |        Approval Bot for Discord                   |
+    |        License: GNU AGPL v3                       |
+    |                                                   |
+    |        https://github.com/Someguy123/approvalbot  |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123)                 |
+    |                                                   |
+    +===================================================+
+"""
+from os.path import dirname, abspath, join
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix='approvalbot-bench-')
+os.environ.setdefault('DISCORD_TOKEN', 'benchmark')
+os.environ['DATA_DIR'] = TMP_DIR
+os.environ['CONFIG_FILE'] = join(TMP_DIR, 'config.yml')
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import aiosqlite
+import interactions
+from privex.helpers.cache import adapter_get, adapter_set, async_adapter_set
+from approvalbot import settings
+from approvalbot.core import guild_config, CONFIG_WRITER
+from approvalbot.objects import APPROVAL_CACHE, DISCORD_EPOCH, Approval, ApprovalsDB
+from approvalbot import bot as B
+
+GUILD_ID = 1000
+CHANNEL_ID = 2000
+
+DB_CONFIGS = {
+    'per-query connection': dict(APPROVAL_DB_PERSISTENT=False, APPROVAL_DB_WRITE_BEHIND=False),
+    'persistent connection': dict(APPROVAL_DB_PERSISTENT=True, APPROVAL_DB_WRITE_BEHIND=False),
+    'persistent + write-behind': dict(APPROVAL_DB_PERSISTENT=True, APPROVAL_DB_WRITE_BEHIND=True),
+}
+"""The Approvals DB settings each storm is ran with"""
+
+
+class Storm:
+    """Counters shared by the fake contexts and the query counter for one run"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sends = self.edits = self.defers = self.queries = self.edit_bytes = 0
+        self.message_ids = itertools.count(10 ** 6)
+        self.interaction_ids = itertools.count()
+        self.ack_margins = []
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username, self.discriminator = f"Voter{user_id}", '0001'
+
+    async def get_guild_permissions(self, guild_id):
+        # None of the voters are server admins - they're only allowed to vote as bot moderators
+        return interactions.Permissions(0)
+
+
+class FakeMessage:
+    def __init__(self, msg_id: int):
+        self.id = msg_id
+
+
+async def api_call(storm: Storm):
+    if storm.latency > 0:
+        await asyncio.sleep(storm.latency)
+
+
+class FakeHTTP:
+    """
+    Stands in for ``bot._http`` - poll message edits are sent straight through the HTTP client with a raw
+    payload, so they're counted (along with their JSON size) here, and wait for the simulated Discord API latency.
+    """
+    def __init__(self, storm: Storm):
+        self.storm = storm
+
+    async def edit_interaction_response(self, data: dict, token: str, application_id: str, message_id: str = '@original'):
+        self.storm.edits += 1
+        self.storm.edit_bytes += len(json.dumps(data))
+        await api_call(self.storm)
+        return {}
+
+    async def edit_message(self, channel_id: int, message_id: int, payload: dict):
+        await api_call(self.storm)
+        return {}
+
+
+class _FakeContext:
+    """
+    Stands in for a :class:`.CommandContext` / :class:`.ComponentContext`, with ``send`` / ``defer``
+    stubbed out - each one is counted, and waits for the simulated Discord API latency.
+    """
+    def __init__(self, storm: Storm, user_id: int, message_id: int = None):
+        # A snowflake ID for the current time, like Discord gives each interaction
+        created = time.time()
+        interaction_id = ((int(created * 1000) - DISCORD_EPOCH) << 22) | (next(storm.interaction_ids) & 0xFFF)
+        object.__setattr__(self, '_fake', dict(
+            storm=storm, id=interaction_id, created=created, token=f"token{interaction_id}", application_id=1,
+            guild_id=GUILD_ID, channel_id=CHANNEL_ID,
+            author=FakeUser(user_id), user=FakeUser(user_id), message=FakeMessage(message_id),
+        ))
+
+    def __getattr__(self, name):
+        try:
+            return object.__getattribute__(self, '_fake')[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        object.__getattribute__(self, '_fake')[name] = value
+
+    async def send(self, *args, **kwargs):
+        self.storm.sends += 1
+        await api_call(self.storm)
+        return FakeMessage(next(self.storm.message_ids))
+
+    async def defer(self, *args, **kwargs):
+        self.storm.defers += 1
+        await api_call(self.storm)
+        self.storm.ack_margins.append(B.ACK_DEADLINE - (time.time() - self.created))
+
+
+class FakeCommandContext(_FakeContext, B.CommandContext):
+    pass
+
+
+class FakeComponentContext(_FakeContext, B.ComponentContext):
+    pass
+
+
+def count_queries(storm: Storm):
+    """Patch aiosqlite so every statement sent to SQLite (by any connection) is counted in ``storm.queries``"""
+    def counted(func):
+        def wrapper(*args, **kwargs):
+            storm.queries += 1
+            return func(*args, **kwargs)
+        wrapper.original = func
+        return wrapper
+    for cls in (aiosqlite.Connection, aiosqlite.Cursor):
+        for name in ('execute', 'executemany'):
+            setattr(cls, name, counted(getattr(cls, name)))
+
+
+def uncount_queries():
+    for cls in (aiosqlite.Connection, aiosqlite.Cursor):
+        for name in ('execute', 'executemany'):
+            setattr(cls, name, getattr(getattr(cls, name), 'original', getattr(cls, name)))
+
+
+def set_cache_adapter(name: str) -> bool:
+    """Switch the cache adapter used by ``MessageStore`` - returns ``False`` if the adapter isn't usable here"""
+    try:
+        adapter_set(name)
+        async_adapter_set(name)
+        adapter_get().set('approvalbot-bench', 1)
+        return adapter_get().get('approvalbot-bench') == 1
+    except Exception as e:
+        print(f"  (skipping cache adapter '{name}': {type(e).__name__} - {e!s})")
+        return False
+
+
+async def storm_run(name: str, voters: int, polls: int, revote: float, latency: float, db_config: dict) -> dict:
+    for k, v in db_config.items():
+        setattr(settings, k, v)
+    APPROVAL_CACHE.clear()
+    B.PERM_CACHE.clear()
+    ApprovalsDB.DEFAULT_DB = join(TMP_DIR, f"{name}.sqlite3")
+    await ApprovalsDB().create_schemas()
+
+    storm = Storm(latency)
+    B.bot._http = FakeHTTP(storm)
+    users = list(range(1, voters + 1))
+    cfg = guild_config(GUILD_ID)
+    cfg.moderators = [f"Voter{u}#0001" for u in users]
+    await B.config_changed(GUILD_ID)
+
+    # Create the polls through the /approval command, as the first moderator
+    for p in range(polls):
+        await B.approval.coro(
+            FakeCommandContext(storm, users[0]), action='delete', post=f"https://example.com/@user/{p}", reason='spam'
+        )
+    # With write-behind enabled, the polls' message IDs may still be queued
+    await ApprovalsDB.flush_all_updates()
+    rows = await ApprovalsDB().fetchall("SELECT id, message_id FROM approvals ORDER BY id;")
+    poll_msgs = [r['message_id'] for r in rows]
+
+    # Each voter's final choice on each poll, which the DB tallies are checked against afterwards
+    expected = {m: {} for m in poll_msgs}
+    latencies = []
+
+    async def voter(user_id: int):
+        rnd = random.Random(user_id)
+        order = list(poll_msgs)
+        rnd.shuffle(order)
+        for msg_id in order:
+            clicks = [rnd.random() < 0.5]
+            if rnd.random() < revote:
+                clicks.append(not clicks[0])
+            for approve in clicks:
+                ctx = FakeComponentContext(storm, user_id, msg_id)
+                start = time.perf_counter()
+                await (B.approve_handler if approve else B.disapprove_handler)(ctx)
+                latencies.append((time.perf_counter() - start) * 1000)
+                expected[msg_id][f"Voter{user_id}#0001"] = approve
+
+    sends_before = storm.sends
+    count_queries(storm)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[voter(u) for u in users])
+        elapsed = time.perf_counter() - start
+    finally:
+        uncount_queries()
+    await B.EDITS.close()
+    await ApprovalsDB.flush_all_updates()
+
+    # Check the tallies saved in the DB against the votes which were made
+    errors = []
+    APPROVAL_CACHE.clear()
+    for msg_id, votes in expected.items():
+        aprv = await Approval.from_db(msg_id)
+        want_a = sum(1 for v in votes.values() if v)
+        want_d = len(votes) - want_a
+        if (aprv.approvals, aprv.disapprovals) != (want_a, want_d):
+            errors.append(f"poll {aprv.id}: {aprv.approvals}/{aprv.disapprovals} (expected {want_a}/{want_d})")
+        elif set(aprv.approved_by) != {u for u, v in votes.items() if v}:
+            errors.append(f"poll {aprv.id}: approved_by doesn't match the votes made")
+    for aprv_id in [r['id'] for r in rows]:
+        B.EXPIRY.remove(aprv_id)
+    await ApprovalsDB.close_connections()
+
+    latencies.sort()
+    return dict(
+        votes=len(latencies), elapsed=elapsed, latencies=latencies, queries=storm.queries,
+        ack_margin=min(storm.ack_margins) * 1000,
+        sends=storm.sends - sends_before, edits=storm.edits, edit_bytes=storm.edit_bytes, errors=errors,
+    )
+
+
+def report(name: str, res: dict):
+    lat = res['latencies']
+    p = lambda pct: lat[min(len(lat) - 1, int(len(lat) * pct))]
+    status = 'OK' if len(res['errors']) == 0 else f"FAIL ({len(res['errors'])} polls wrong)"
+    print(f"  {name:<28} votes/sec: {res['votes'] / res['elapsed']:8.1f}   p50: {p(0.50):7.2f}ms   "
+          f"p99: {p(0.99):7.2f}ms   min ack margin: {res['ack_margin']:7.1f}ms   "
+          f"queries/vote: {res['queries'] / res['votes']:5.2f}   "
+          f"sends: {res['sends']:4}   edits: {res['edits']:4}   "
+          f"bytes/edit: {res['edit_bytes'] / max(res['edits'], 1):6.0f}   {status}")
+    for e in res['errors'][:5]:
+        print(f"      - {e}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Simulated vote storm benchmark for ApprovalBot")
+    parser.add_argument('-n', '--voters', type=int, default=20, help="Number of moderators voting at once (default: 20)")
+    parser.add_argument('-m', '--polls', type=int, default=10, help="Number of polls they each vote on (default: 10)")
+    parser.add_argument('-r', '--revote', type=float, default=0.1, help="Chance of a voter changing their vote (default: 0.1)")
+    parser.add_argument('-l', '--latency', type=float, default=0, help="Simulated Discord API latency in ms (default: 0)")
+    parser.add_argument('-a', '--adapters', default='memory,sqlite3', help="Cache adapters to test (default: memory,sqlite3)")
+    args = parser.parse_args()
+
+    print(f"Vote storm: {args.voters} voters x {args.polls} polls (DB folder: {TMP_DIR})\n")
+    failed = False
+    try:
+        for adapter in args.adapters.split(','):
+            print(f"Cache adapter: {adapter}")
+            if not set_cache_adapter(adapter):
+                continue
+            for i, (name, db_config) in enumerate(DB_CONFIGS.items()):
+                res = await storm_run(
+                    f"{adapter}-{i}", args.voters, args.polls, args.revote, args.latency / 1000, db_config
+                )
+                report(name, res)
+                failed = failed or len(res['errors']) > 0
+            print()
+        await CONFIG_WRITER.flush()
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
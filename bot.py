@@ -20,6 +20,6 @@ Copyright::
     |                                                   |
     +===================================================+
 """
-from approvalbot.bot import bot
+from approvalbot.bot import run
 
-bot.start()
+run()
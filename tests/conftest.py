@@ -0,0 +1,92 @@
+"""
+Shared test setup - points the bot's data folder / config file at a temporary folder before anything
+imports :mod:`approvalbot.settings`, so tests never touch a real deployment's files.
+
+Run the tests from the repo root with::
+
+    python3 -m pytest
+
+"""
+from os.path import dirname, abspath, join
+import asyncio
+import copy
+import os
+import sys
+import tempfile
+
+import pytest
+
+BASE_DIR = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix='approvalbot-tests-')
+os.environ.update(
+    DISCORD_TOKEN='test', DATA_DIR=join(TEST_DIR, 'data'), CONFIG_FILE=join(TEST_DIR, 'config.yml'),
+    CACHE_ADAPTER='memory', SLOW_LOG_MS='0',
+)
+
+
+class Clock:
+    """A ``time.monotonic`` replacement which only moves when :meth:`.advance` is called"""
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    c = Clock()
+    monkeypatch.setattr('time.monotonic', c)
+    return c
+
+
+@pytest.fixture
+def run_db():
+    """
+    Returns a function which runs a coroutine against a fresh, empty Approvals DB (and an empty
+    :data:`.APPROVAL_CACHE`), closing the DB connection in the same event loop afterwards
+    """
+    from approvalbot import settings
+    from approvalbot.core import init
+    from approvalbot.objects import APPROVAL_CACHE, ApprovalsDB
+    init('data_dir', 'cache')
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(f"{settings.APPROVAL_DB}{suffix}")
+        except FileNotFoundError:
+            pass
+    # privex-db remembers which tables it's created for the whole process
+    ApprovalsDB.tables_created.clear()
+    APPROVAL_CACHE.clear()
+
+    def run(coro):
+        async def wrapper():
+            await ApprovalsDB().create_schemas()
+            try:
+                return await coro
+            finally:
+                await ApprovalsDB.close_connections()
+        return asyncio.run(wrapper())
+    yield run
+    APPROVAL_CACHE.clear()
+
+
+@pytest.fixture
+def bot_config(monkeypatch):
+    """
+    Replace the bot's config with an empty one (so each server starts from ``CONFIG_DEFAULTS``), and clear
+    the cached :class:`.RoleIndex` of every server before and after the test
+    """
+    from privex.helpers import DictObject
+    from approvalbot import bot, settings
+    cfg = DictObject(copy.deepcopy(dict(settings.CONFIG_DEFAULTS)))
+    monkeypatch.setattr(settings, 'CONFIG', cfg)
+    monkeypatch.setattr(settings, 'SERVER_IDS', [])
+    bot.GUILD_ROLES.clear()
+    yield cfg
+    bot.GUILD_ROLES.clear()
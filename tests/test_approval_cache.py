@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from approvalbot.objects import APPROVAL_CACHE, Approval, ApprovalCache, ApprovalOutcome, ApprovalsDB, VoteChoice
+
+
+def make_approval(message_id: int, **kwargs) -> Approval:
+    kwargs = dict(
+        action='ban', url=f'https://example.com/@user/{message_id}', reason='spam', username='Mod#0001',
+        guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30), **kwargs
+    )
+    return Approval(message_id=message_id, **kwargs)
+
+
+def test_cache_hit(run_db):
+    async def main():
+        aprv = make_approval(100)
+        await aprv.save()
+        assert await Approval.from_db(100) is aprv
+        assert await Approval.from_db_id(aprv.id) is aprv
+        # Loaded from the DB (and cached) after the cache is cleared
+        APPROVAL_CACHE.clear()
+        loaded = await Approval.from_db(100)
+        assert loaded is not aprv and loaded.id == aprv.id
+        assert await Approval.from_db_id(aprv.id) is loaded
+    run_db(main())
+
+
+def test_create_caches_db_normalized_row(run_db):
+    async def main():
+        aprv = make_approval(101)
+        assert aprv.outcome == ApprovalOutcome.AUTO
+        await aprv.save()
+        row = await ApprovalsDB().find_approval(aprv.id)
+        assert row['outcome'] == ApprovalOutcome.TIE.value
+        cached = await Approval.from_db(101)
+        assert cached.outcome == ApprovalOutcome.TIE
+        # Saving the cached object mustn't write the pre-insert outcome back over the DB's
+        await cached.approve('Voter#0001', save=True)
+        row = await ApprovalsDB().find_approval(aprv.id)
+        assert row['outcome'] == ApprovalOutcome.TIE.value
+        assert row['approvals'] == 1
+    run_db(main())
+
+
+def test_save_updates_cached_object(run_db):
+    async def main():
+        aprv = make_approval(102)
+        await aprv.save()
+        aprv.outcome = ApprovalOutcome.APPROVE
+        await aprv.save()
+        assert (await Approval.from_db(102)).outcome == ApprovalOutcome.APPROVE
+        APPROVAL_CACHE.clear()
+        assert (await Approval.from_db(102)).outcome == ApprovalOutcome.APPROVE
+    run_db(main())
+
+
+def test_votes_update_cached_object(run_db):
+    async def main():
+        aprv = make_approval(103)
+        await aprv.save()
+        assert aprv.apply_vote('Voter#0001', VoteChoice.DISAPPROVE)
+        await aprv.save_votes([('Voter#0001', VoteChoice.DISAPPROVE)])
+        cached = await Approval.from_db(103)
+        assert cached.disapprovals == 1 and cached.disapproved_by == ['Voter#0001']
+    run_db(main())
+
+
+def test_ended_approvals_are_not_cached(run_db):
+    async def main():
+        aprv = make_approval(104)
+        await aprv.save()
+        assert APPROVAL_CACHE.get_msgid(104) is aprv
+        aprv.end_time = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await aprv.save()
+        assert APPROVAL_CACHE.get_msgid(104) is None
+        assert APPROVAL_CACHE.get_id(aprv.id) is None
+    run_db(main())
+
+
+def test_eviction():
+    cache = ApprovalCache(maxsize=2)
+    aprvs = [make_approval(200 + i, id=i + 1) for i in range(3)]
+    for a in aprvs:
+        cache.put(a)
+    assert cache.get_msgid(200) is None and cache.get_id(1) is None
+    assert cache.get_msgid(201) is aprvs[1] and cache.get_id(3) is aprvs[2]
+    cache.remove(aprvs[1])
+    assert cache.get_msgid(201) is None and cache.get_id(2) is None
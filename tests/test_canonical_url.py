@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from approvalbot.objects import Approval, ApprovalsDB, canonical_url
+
+CANONICAL = 'https://mastodon.social/@john/1234'
+
+
+@pytest.mark.parametrize('url', [
+    'https://mastodon.social/@john/1234',
+    # Trailing slashes
+    'https://mastodon.social/@john/1234/',
+    'https://mastodon.social/@john/1234//',
+    # /users/<user>/statuses/<id> vs /@<user>/<id>
+    'https://mastodon.social/users/john/statuses/1234',
+    'https://mastodon.social/users/john/statuses/1234/',
+    # Query strings and fragments
+    'https://mastodon.social/@john/1234?utm_source=share',
+    'https://mastodon.social/@john/1234#replies',
+    'https://mastodon.social/users/john/statuses/1234?a=1&b=2#x',
+    # Scheme, host case, www. and default ports
+    'http://mastodon.social/@john/1234',
+    'HTTPS://Mastodon.Social/@john/1234',
+    'https://www.mastodon.social/@john/1234',
+    'https://mastodon.social:443/@john/1234',
+    'http://mastodon.social:80/@john/1234',
+    # No scheme, surrounding whitespace, doubled slashes
+    'mastodon.social/@john/1234',
+    '  https://mastodon.social/@john/1234  ',
+    'https://mastodon.social//@john//1234',
+])
+def test_equivalent_forms(url):
+    assert canonical_url(url) == CANONICAL
+
+
+@pytest.mark.parametrize('url', [
+    'https://mastodon.social/@john/1235',
+    'https://mastodon.social/@jane/1234',
+    'https://example.com/@john/1234',
+    'https://mastodon.social:8443/@john/1234',
+    # Paths are case-sensitive
+    'https://mastodon.social/@John/1234',
+])
+def test_different_posts_stay_different(url):
+    assert canonical_url(url) != CANONICAL
+
+
+def test_user_urls():
+    assert canonical_url('https://mastodon.social/@john/') == canonical_url('https://mastodon.social/@john')
+    assert canonical_url('https://mastodon.social/users/john') == 'https://mastodon.social/users/john'
+
+
+def make_approval(message_id: int, url: str, guild_id: int = 7, **kwargs) -> Approval:
+    return Approval(
+        message_id=message_id, action='delete', url=url, reason='spam', username='Mod#0001', guild_id=guild_id,
+        end_time=datetime.now(timezone.utc) + timedelta(minutes=30), **kwargs
+    )
+
+
+def test_find_open_approval_matches_other_url_forms(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        aprv = make_approval(1, 'https://mastodon.social/@john/1234')
+        await aprv.save()
+        assert aprv.url_canonical == CANONICAL
+        for url in ['https://mastodon.social/users/john/statuses/1234/', 'http://www.mastodon.social/@john/1234?x=1']:
+            found = await adb.find_open_approval(url, guild_id=7)
+            assert found is not None and found['id'] == aprv.id and found['message_id'] == 1
+        assert await adb.find_open_approval('https://mastodon.social/@john/9999', guild_id=7) is None
+        # Other servers' approvals aren't duplicates
+        assert await adb.find_open_approval(CANONICAL, guild_id=8) is None
+        assert (await adb.find_open_approval(CANONICAL))['id'] == aprv.id
+    run_db(main())
+
+
+def test_find_open_approval_returns_newest(run_db):
+    async def main():
+        older, newer = make_approval(1, CANONICAL), make_approval(2, CANONICAL + '/')
+        await older.save()
+        await newer.save()
+        assert (await ApprovalsDB().find_open_approval(CANONICAL, guild_id=7))['id'] == newer.id
+    run_db(main())
+
+
+def test_find_open_approval_skips_closed_polls(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        ended = make_approval(1, CANONICAL)
+        ended.end_time = datetime.now(timezone.utc) - timedelta(minutes=1)
+        await ended.save()
+        finalized = make_approval(2, CANONICAL)
+        await finalized.save()
+        finalized.finalized = True
+        await finalized.save()
+        assert await adb.find_open_approval(CANONICAL, guild_id=7) is None
+    run_db(main())
+
+
+def test_find_open_approval_uses_index(run_db):
+    async def main():
+        plan = await ApprovalsDB().fetchall(
+            "EXPLAIN QUERY PLAN SELECT id FROM approvals WHERE guild_id = ? AND url_canonical = ? "
+            "AND finalized = 0 AND end_time > ? ORDER BY id DESC LIMIT 1;", [7, CANONICAL, 0]
+        )
+        detail = ' '.join(r['detail'] for r in plan)
+        assert 'idx_guild_url_canonical' in detail
+    run_db(main())
@@ -0,0 +1,96 @@
+import asyncio
+import copy
+import os
+import stat
+import pytest
+import yaml
+from approvalbot import core, settings
+from approvalbot.core import ConfigWriter, _write_config
+
+
+@pytest.fixture
+def config():
+    """The global config, restored after the test"""
+    saved = copy.deepcopy(dict(settings.CONFIG))
+    yield settings.CONFIG
+    settings.CONFIG.clear()
+    settings.CONFIG.update(saved)
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Counts the config writes made by :class:`.ConfigWriter`"""
+    calls = []
+
+    def counted(data, cfg_file):
+        calls.append(copy.deepcopy(data))
+        return _write_config(data, cfg_file)
+    monkeypatch.setattr(core, '_write_config', counted)
+    return calls
+
+
+def test_changes_are_coalesced_into_one_write(tmp_path, config, writes):
+    cfg_file = tmp_path / 'config.yml'
+
+    async def main():
+        w = ConfigWriter(delay=0.05, cfg_file=cfg_file)
+        for i in range(5):
+            config['moderators'] = [f'Mod{n}#0001' for n in range(i + 1)]
+            w.schedule()
+            await asyncio.sleep(0.001)
+        assert w.pending and writes == []
+        await asyncio.sleep(0.1)
+        assert not w.pending
+    asyncio.run(main())
+    assert len(writes) == 1
+    assert yaml.safe_load(cfg_file.read_text())['moderators'] == [f'Mod{n}#0001' for n in range(5)]
+
+
+def test_change_during_write_is_saved(tmp_path, config, writes):
+    async def main():
+        w = ConfigWriter(delay=0.01, cfg_file=tmp_path / 'config.yml')
+        config['moderators'] = ['First#0001']
+        w.schedule()
+        await asyncio.sleep(0.02)
+        config['moderators'] = ['Second#0001']
+        w.schedule()
+        await asyncio.sleep(0.05)
+    asyncio.run(main())
+    assert [d['moderators'] for d in writes] == [['First#0001'], ['Second#0001']]
+
+
+def test_flush_writes_immediately(tmp_path, config, writes):
+    cfg_file = tmp_path / 'config.yml'
+
+    async def main():
+        w = ConfigWriter(delay=60, cfg_file=cfg_file)
+        config['show_votes'] = True
+        w.schedule()
+        await w.flush()
+        assert len(writes) == 1 and not w.pending
+        # Nothing changed since, so flushing again doesn't write
+        await w.flush()
+        assert len(writes) == 1
+    asyncio.run(main())
+    assert yaml.safe_load(cfg_file.read_text())['show_votes'] is True
+
+
+def test_write_keeps_file_mode(tmp_path):
+    cfg_file = tmp_path / 'config.yml'
+    cfg_file.write_text('admins: []\n')
+    os.chmod(cfg_file, 0o640)
+    _write_config({'admins': ['Admin#0001']}, cfg_file)
+    assert stat.S_IMODE(os.stat(cfg_file).st_mode) == 0o640
+    assert yaml.safe_load(cfg_file.read_text()) == {'admins': ['Admin#0001']}
+    # The temporary file was renamed over the config, not left behind
+    assert os.listdir(tmp_path) == ['config.yml']
+
+
+def test_new_file_uses_umask(tmp_path):
+    cfg_file = tmp_path / 'config.yml'
+    old = os.umask(0o027)
+    try:
+        _write_config({'admins': []}, cfg_file)
+    finally:
+        os.umask(old)
+    assert stat.S_IMODE(os.stat(cfg_file).st_mode) == 0o640
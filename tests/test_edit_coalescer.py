@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from approvalbot.objects import EditCoalescer
+
+
+def recorder(log: list, value, fail=False):
+    async def edit():
+        if fail:
+            raise RuntimeError(f"edit {value} failed")
+        log.append(value)
+    return edit
+
+
+def test_burst_is_coalesced_into_latest_edit():
+    async def main():
+        edits = []
+        c = EditCoalescer(window=0.05)
+        for i in range(10):
+            c.schedule(1, recorder(edits, i))
+            await asyncio.sleep(0)
+        # The first edit runs straight away, the rest of the burst is held until the window is over
+        assert edits == [0]
+        assert c.pending == 1
+        await asyncio.sleep(0.08)
+        assert edits == [0, 9]
+        assert c.pending == 0
+    asyncio.run(main())
+
+
+def test_messages_are_coalesced_separately():
+    async def main():
+        edits = []
+        c = EditCoalescer(window=0.05)
+        for i in range(3):
+            c.schedule(1, recorder(edits, ('a', i)))
+            c.schedule(2, recorder(edits, ('b', i)))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.08)
+        assert sorted(edits) == [('a', 0), ('a', 2), ('b', 0), ('b', 2)]
+    asyncio.run(main())
+
+
+def test_failing_edit_is_logged_and_later_edits_still_run(caplog):
+    async def main():
+        edits = []
+        c = EditCoalescer(window=0.05)
+        c.schedule(1, recorder(edits, 'bad', fail=True))
+        await asyncio.sleep(0)
+        c.schedule(1, recorder(edits, 'good'))
+        await asyncio.sleep(0.08)
+        assert edits == ['good']
+    with caplog.at_level(logging.ERROR, logger='approvalbot.objects'):
+        asyncio.run(main())
+    errors = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert len(errors) == 1
+    assert 'message ID 1' in errors[0].getMessage()
+    assert 'edit bad failed' in str(errors[0].exc_info[1])
+
+
+def test_close_flushes_pending_edits():
+    async def main():
+        edits = []
+        c = EditCoalescer(window=10)
+        c.schedule(1, recorder(edits, 'first'))
+        await asyncio.sleep(0)
+        c.schedule(1, recorder(edits, 'second'))
+        c.schedule(1, recorder(edits, 'latest'))
+        await c.close()
+        assert edits == ['first', 'latest']
+        assert c.pending == 0
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from approvalbot.objects import ExpiryScheduler
+
+
+class Handled:
+    def __init__(self):
+        self.keys = []
+        self.done = asyncio.Event()
+
+    async def __call__(self, key):
+        self.keys.append(key)
+        if key == 'raise':
+            raise RuntimeError('handler failed')
+        if key == 'last':
+            self.done.set()
+
+
+def test_keys_handled_in_deadline_order():
+    async def main():
+        h = Handled()
+        s = ExpiryScheduler(h)
+        now = time.time()
+        for key, delay in [('c', 0.06), ('a', 0.02), ('last', 0.08), ('b', 0.04)]:
+            s.add(key, now + delay)
+        assert len(s) == 4
+        await asyncio.wait_for(h.done.wait(), 1)
+        assert h.keys == ['a', 'b', 'c', 'last']
+        assert len(s) == 0
+    asyncio.run(main())
+
+
+def test_past_deadlines_are_handled_immediately():
+    async def main():
+        h = Handled()
+        s = ExpiryScheduler(h)
+        s.add('last', time.time() - 60)
+        await asyncio.wait_for(h.done.wait(), 0.1)
+    asyncio.run(main())
+
+
+def test_readd_reschedules():
+    async def main():
+        h = Handled()
+        s = ExpiryScheduler(h)
+        now = time.time()
+        s.add('x', now + 0.02)
+        s.add('x', now + 0.06)
+        s.add('last', now + 0.04)
+        await asyncio.wait_for(h.done.wait(), 1)
+        assert h.keys == ['last']
+        await asyncio.sleep(0.04)
+        # Only handled once, at it's new deadline
+        assert h.keys == ['last', 'x']
+    asyncio.run(main())
+
+
+def test_remove_cancels():
+    async def main():
+        h = Handled()
+        s = ExpiryScheduler(h)
+        now = time.time()
+        s.add('x', now + 0.02)
+        s.add('last', now + 0.04)
+        s.remove('x')
+        assert len(s) == 1
+        await asyncio.wait_for(h.done.wait(), 1)
+        assert h.keys == ['last']
+    asyncio.run(main())
+
+
+def test_wakes_early_for_earlier_deadline():
+    async def main():
+        h = Handled()
+        s = ExpiryScheduler(h)
+        s.add('later', time.time() + 10)
+        # Let the scheduler start sleeping until 'later'
+        await asyncio.sleep(0.01)
+        start = time.time()
+        s.add('last', start + 0.02)
+        await asyncio.wait_for(h.done.wait(), 1)
+        assert time.time() - start < 0.5
+        assert h.keys == ['last']
+        assert len(s) == 1
+    asyncio.run(main())
+
+
+def test_handler_error_does_not_stop_scheduler():
+    async def main():
+        h = Handled()
+        s = ExpiryScheduler(h)
+        now = time.time()
+        s.add('raise', now + 0.01)
+        s.add('last', now + 0.03)
+        await asyncio.wait_for(h.done.wait(), 1)
+        assert h.keys == ['raise', 'last']
+    asyncio.run(main())
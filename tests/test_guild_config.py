@@ -0,0 +1,51 @@
+from approvalbot import settings
+from approvalbot.core import guild_config
+from privex.helpers import DictObject
+
+
+def legacy_config(guilds: dict = None) -> DictObject:
+    """A config from before it was split per server, with it's moderators/admins at the top-level"""
+    return DictObject(
+        moderators=['Mod#0001', 'Mod#0002'], admins=['Admin#0001'], show_votes=True, admins_can_vote=False,
+        majority_include_admins=True, guilds=dict(guilds or {})
+    )
+
+
+def test_legacy_config_moves_to_first_server(monkeypatch):
+    monkeypatch.setattr(settings, 'SERVER_IDS', [7, 8])
+    cfg = legacy_config()
+    other = guild_config(8, cfg)
+    assert other.moderators == [] and other.admins == [] and other.show_votes is False
+    first = guild_config(7, cfg)
+    assert first.moderators == ['Mod#0001', 'Mod#0002'] and first.admins == ['Admin#0001']
+    assert first.show_votes is True and first.admins_can_vote is False
+    # The top-level values were moved, not copied, so servers configured later don't inherit them
+    assert cfg.moderators == [] and cfg.admins == [] and cfg.show_votes is False
+    assert guild_config(9, cfg).moderators == []
+
+
+def test_legacy_config_moves_to_first_configured_server(monkeypatch):
+    monkeypatch.setattr(settings, 'SERVER_IDS', [])
+    cfg = legacy_config()
+    assert guild_config(8, cfg).moderators == ['Mod#0001', 'Mod#0002']
+    assert guild_config(7, cfg).moderators == []
+
+
+def test_saved_server_config_is_kept(monkeypatch):
+    monkeypatch.setattr(settings, 'SERVER_IDS', [7])
+    cfg = legacy_config({7: {'moderators': ['Saved#0001']}})
+    first = guild_config(7, cfg)
+    assert first.moderators == ['Saved#0001']
+    assert first.admins == ['Admin#0001']
+
+
+def test_server_configs_are_independent(monkeypatch):
+    monkeypatch.setattr(settings, 'SERVER_IDS', [7])
+    cfg = legacy_config()
+    guild_config(7, cfg).moderators.append('New#0001')
+    guild_config(8, cfg).admins.append('Other#0001')
+    assert 'New#0001' not in guild_config(8, cfg).moderators
+    assert guild_config(7, cfg).admins == ['Admin#0001']
+    assert settings.CONFIG_DEFAULTS.moderators == [] and settings.CONFIG_DEFAULTS.admins == []
+    assert guild_config(7, cfg) is guild_config('7', cfg)
+    assert guild_config(None, cfg) is cfg
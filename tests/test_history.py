@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from approvalbot.objects import Approval, ApprovalOutcome, ApprovalsDB
+
+
+async def top_level_plan(adb: ApprovalsDB, where: str, params: list) -> list:
+    """The outer query's steps from ``EXPLAIN QUERY PLAN`` of a history page - without the voter list subqueries'"""
+    rows = await adb.fetchall(
+        f"EXPLAIN QUERY PLAN {adb.SELECT_APPROVALS} WHERE {where} ORDER BY a.id DESC LIMIT 10;", params
+    )
+    return [r['detail'] for r in rows if r['parent'] == 0]
+
+
+@pytest.mark.parametrize('where, params, index', [
+    ("a.guild_id = ?", [7], 'idx_guild_id'),
+    ("a.guild_id = ? AND a.id < ?", [7, 100], 'idx_guild_id'),
+    ("a.guild_id = ? AND a.outcome = ? AND a.id < ?", [7, 'TIE', 100], 'idx_guild_outcome'),
+    ("a.guild_id = ? AND a.username = ? AND a.id < ?", [7, 'Mod#0001', 100], 'idx_guild_username'),
+    ("a.guild_id = ? AND a.action = ? AND a.id < ?", [7, 'ban', 100], 'idx_guild_action'),
+])
+def test_history_pages_use_index_order(run_db, where, params, index):
+    async def main():
+        plan = await top_level_plan(ApprovalsDB(), where, params)
+        assert any(index in step for step in plan), plan
+        assert not any('TEMP B-TREE' in step for step in plan), plan
+    run_db(main())
+
+
+def test_guild_history_pages(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        ids = {7: [], 8: []}
+        for i in range(25):
+            guild = 7 if i % 3 else 8
+            aprv = Approval(
+                message_id=1000 + i, action='ban', url=f'https://example.com/@user/{i}', reason='spam',
+                username='Mod#0001', guild_id=guild, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+            )
+            await aprv.save()
+            ids[guild].append(aprv.id)
+        pages, after_id = [], None
+        while True:
+            page = [r['id'] async for r in adb.iter_approvals({'guild_id': 7}, after_id=after_id, limit=5)]
+            if not page:
+                break
+            pages.append(page)
+            after_id = page[-1]
+        assert [i for p in pages for i in p] == sorted(ids[7], reverse=True)
+        assert all(len(p) == 5 for p in pages[:-1])
+    run_db(main())
@@ -0,0 +1,55 @@
+"""
+Importing ApprovalBot's modules must be fast, and have no side effects - see :func:`approvalbot.core.init`.
+Each module is imported in a fresh interpreter, without a ``DISCORD_TOKEN``, and with ``DATA_DIR`` /
+``CONFIG_FILE`` pointed at a folder which doesn't exist.
+"""
+from os.path import dirname, abspath, join
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+BASE_DIR = dirname(dirname(abspath(__file__)))
+
+BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', 100))
+"""
+ApprovalBot's own import time budget. Third-party dependencies are imported before the timer starts, as they're
+outside of ApprovalBot's control (``benchmarks/import_time.py`` reports the median over several runs).
+"""
+
+DEPENDENCIES = ['dotenv', 'yaml', 'aiosqlite', 'privex.helpers', 'privex.helpers.cache', 'privex.db']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+for m in sys.argv[2].split(','):
+    __import__(m)
+start = time.perf_counter()
+__import__(sys.argv[1])
+ms = (time.perf_counter() - start) * 1000
+print(json.dumps(dict(ms=ms, interactions='interactions' in sys.modules)))
+"""
+
+
+def snapshot(folder) -> set:
+    return {join(root, f) for root, dirs, files in os.walk(folder) for f in dirs + files}
+
+
+@pytest.mark.parametrize('module', ['approvalbot', 'approvalbot.objects', 'approvalbot.core', 'approvalbot.settings'])
+def test_import_is_fast_and_side_effect_free(module, tmp_path):
+    data_dir = tmp_path / 'data'
+    env = {k: v for k, v in os.environ.items() if k not in ('DISCORD_TOKEN', 'DATA_DIR', 'CONFIG_FILE')}
+    env.update(PYTHONPATH=BASE_DIR, DATA_DIR=str(data_dir), CONFIG_FILE=str(data_dir / 'config.yml'))
+    repo_before = snapshot(join(BASE_DIR, 'approvalbot'))
+    # Run from the temporary folder, so any files created relative to the working directory are caught too
+    proc = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT, module, ','.join(DEPENDENCIES)],
+        env=env, cwd=str(tmp_path), capture_output=True, text=True, timeout=60
+    )
+    assert proc.returncode == 0, f"Importing {module} exited with status {proc.returncode}: {proc.stderr}"
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert res['ms'] <= BUDGET_MS, f"{module} took {res['ms']:.1f}ms to import, over the {BUDGET_MS:.0f}ms budget"
+    assert not res['interactions'], f"{module} imported discord-py-interactions"
+    assert list(tmp_path.iterdir()) == [], f"Importing {module} created: {list(tmp_path.iterdir())}"
+    created = {p for p in snapshot(join(BASE_DIR, 'approvalbot')) - repo_before if '__pycache__' not in p}
+    assert created == set(), f"Importing {module} created: {created}"
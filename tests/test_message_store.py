@@ -0,0 +1,245 @@
+import asyncio
+import copy
+from datetime import datetime, timezone
+import pytest
+from approvalbot import objects, settings
+from approvalbot.objects import MessageStore
+
+NOW = 1_700_000_000.0
+
+
+class FakeCache:
+    """Records every write made to it, along with it's timeout - values are copied, like a real cache serializes them"""
+    def __init__(self):
+        self.data, self.writes = {}, []
+
+    def get(self, key, default=None):
+        return copy.deepcopy(self.data[key]) if key in self.data else default
+
+    def set(self, key, value, timeout=300):
+        self.writes.append((key, copy.deepcopy(value), timeout))
+        self.data[key] = copy.deepcopy(value)
+
+
+class FakeAsyncCache(FakeCache):
+    async def get(self, key, default=None):
+        return super().get(key, default)
+
+    async def set(self, key, value, timeout=300):
+        return super().set(key, value, timeout)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    c = FakeCache()
+    monkeypatch.setattr(objects, 'adapter_get', lambda: c)
+    monkeypatch.setattr(objects, 'async_adapter_get', lambda: c.aio)
+    c.aio = FakeAsyncCache()
+    monkeypatch.setattr('time.time', lambda: NOW)
+    return c
+
+
+def test_reading_does_not_write(cache):
+    MessageStore.create(1, action='ban', post='https://example.com/@user/1', reason='spam', end_time=NOW + 600)
+    cache.writes.clear()
+    m = MessageStore(1)
+    assert (m.action, m.post, m.reason, m.approvals, m.disapprovals) == ('ban', 'https://example.com/@user/1', 'spam', 0, 0)
+    assert m.approvals_list == [] and m.disapprovals_list == [] and m.end_time == NOW + 600
+    assert m.flush() is False
+    assert cache.writes == []
+
+
+def test_set_outside_block_writes_once_per_change(cache):
+    m = MessageStore(1, data={})
+    m.reason = 'spam'
+    m.post = 'https://example.com'
+    assert len(cache.writes) == 2
+    assert not m.dirty
+
+
+def test_several_sets_in_block_write_once(cache):
+    m = MessageStore(1, data={})
+    with m:
+        m.reason = 'spam'
+        m.post = 'https://example.com'
+        m.action = 'ban'
+        m.approve('Voter#0001')
+        assert cache.writes == []
+        assert m.dirty == {'reason', 'post', 'action', 'approvals', 'approvals_list'}
+    assert len(cache.writes) == 1
+    assert cache.writes[0][1]['approvals_list'] == ['Voter#0001']
+    assert not m.dirty
+
+
+def test_nested_blocks_write_once(cache):
+    m = MessageStore(1, data={})
+    with m:
+        with m:
+            m.reason = 'spam'
+        assert cache.writes == []
+        m.disapprove('Voter#0001')
+    assert len(cache.writes) == 1
+
+
+def test_switching_vote_writes_once(cache):
+    m = MessageStore(1, data={})
+    m.disapprove('Voter#0001')
+    cache.writes.clear()
+    assert m.approve('Voter#0001') == 1
+    assert len(cache.writes) == 1
+    assert (m.approvals, m.disapprovals, m.approvals_list, m.disapprovals_list) == (1, 0, ['Voter#0001'], [])
+    # Repeating a vote changes nothing, so nothing is written
+    m.approve('Voter#0001')
+    assert len(cache.writes) == 1
+
+
+def test_ttl_follows_poll_end(cache):
+    end = datetime.fromtimestamp(NOW + 1800, tz=timezone.utc)
+    m = MessageStore.create(1, action='ban', end_time=end)
+    assert m.end_time == NOW + 1800
+    assert cache.writes[-1][2] == 1800 + settings.MESSAGE_STORE_GRACE
+    # i.e. the entry expires at end_time + MESSAGE_STORE_GRACE
+    assert NOW + m.ttl == m.end_time + settings.MESSAGE_STORE_GRACE
+
+
+def test_ttl_of_ended_poll_and_without_end_time(cache):
+    assert MessageStore(1, data={'end_time': NOW - 60}).ttl == settings.MESSAGE_STORE_GRACE
+    assert MessageStore(2, data={}).ttl == settings.DEFAULT_APPROVAL_END + settings.MESSAGE_STORE_GRACE
+
+
+def test_async_api_flushes_once(cache):
+    async def main():
+        m = await MessageStore.acreate(1, action='ban', end_time=NOW + 600)
+        assert len(cache.aio.writes) == 1 and cache.aio.writes[0][2] == 600 + settings.MESSAGE_STORE_GRACE
+        m = await MessageStore(1, load=False).aload()
+        assert m.action == 'ban'
+        async with m:
+            m.reason = 'spam'
+            m.approve('Voter#0001')
+        assert len(cache.aio.writes) == 2
+        assert await m.aflush() is False
+        stores = await MessageStore.aload_many([1, 2])
+        assert stores[0].approvals_list == ['Voter#0001'] and stores[1].data == {}
+        # Only stores with changes are written
+        stores[1].dirty.add('reason')
+        assert await MessageStore.aflush_many(stores) == 1
+        assert len(cache.aio.writes) == 3
+    asyncio.run(main())
+    assert cache.writes == []
+
+
+def test_async_reading_does_not_write(cache):
+    async def main():
+        await MessageStore.acreate(1, action='ban', post='https://example.com/@user/1', reason='spam', end_time=NOW + 600)
+        cache.aio.writes.clear()
+        m = await MessageStore(1, load=False).aload()
+        assert (m.action, m.post, m.reason, m.approvals, m.disapprovals) == ('ban', 'https://example.com/@user/1', 'spam', 0, 0)
+        assert m.approvals_list == [] and m.disapprovals_list == [] and m.end_time == NOW + 600
+        assert await m.aflush() is False
+        async with m:
+            pass
+        assert cache.aio.writes == []
+    asyncio.run(main())
+    assert cache.writes == []
+
+
+def test_async_several_sets_in_block_write_once(cache):
+    async def main():
+        m = MessageStore(1, data={})
+        async with m:
+            m.reason = 'spam'
+            m.post = 'https://example.com'
+            m.action = 'ban'
+            m.approve('Voter#0001')
+            assert cache.aio.writes == []
+            assert m.dirty == {'reason', 'post', 'action', 'approvals', 'approvals_list'}
+        assert len(cache.aio.writes) == 1
+        assert cache.aio.writes[0][1]['approvals_list'] == ['Voter#0001']
+        assert not m.dirty
+    asyncio.run(main())
+    assert cache.writes == []
+
+
+def test_async_nested_blocks_write_once(cache):
+    async def main():
+        m = MessageStore(1, data={})
+        async with m:
+            async with m:
+                m.reason = 'spam'
+            # A sync block inside an async one leaves the write to the async block too
+            with m:
+                m.action = 'ban'
+            assert cache.aio.writes == []
+            m.disapprove('Voter#0001')
+        assert len(cache.aio.writes) == 1
+    asyncio.run(main())
+    assert cache.writes == []
+
+
+def test_async_switching_vote_writes_once(cache):
+    async def main():
+        m = MessageStore(1, data={})
+        async with m:
+            m.disapprove('Voter#0001')
+        cache.aio.writes.clear()
+        async with m:
+            assert m.approve('Voter#0001') == 1
+        assert len(cache.aio.writes) == 1
+        assert (m.approvals, m.disapprovals, m.approvals_list, m.disapprovals_list) == (1, 0, ['Voter#0001'], [])
+        # Repeating a vote changes nothing, so nothing is written
+        async with m:
+            m.approve('Voter#0001')
+        assert len(cache.aio.writes) == 1
+    asyncio.run(main())
+    assert cache.writes == []
+
+
+def test_async_aload_discards_unflushed_changes(cache):
+    async def main():
+        await MessageStore.acreate(1, reason='spam')
+        m = await MessageStore(1, load=False).aload()
+        async with m:
+            m.reason = 'changed'
+            await m.aload()
+            assert m.reason == 'spam' and not m.dirty
+        assert len(cache.aio.writes) == 1
+    asyncio.run(main())
+
+
+def test_async_ttl_follows_poll_end(cache):
+    async def main():
+        end = datetime.fromtimestamp(NOW + 1800, tz=timezone.utc)
+        m = await MessageStore.acreate(1, action='ban', end_time=end)
+        assert m.end_time == NOW + 1800
+        assert cache.aio.writes[-1][2] == 1800 + settings.MESSAGE_STORE_GRACE
+        await MessageStore.acreate(2, action='ban', end_time=NOW - 60)
+        await MessageStore.acreate(3, action='ban')
+        assert [w[2] for w in cache.aio.writes[-2:]] == [
+            settings.MESSAGE_STORE_GRACE, settings.DEFAULT_APPROVAL_END + settings.MESSAGE_STORE_GRACE
+        ]
+    asyncio.run(main())
+
+
+def test_async_many(cache):
+    async def main():
+        await MessageStore.acreate(1, action='ban', end_time=NOW + 600)
+        await MessageStore.acreate(2, action='delete', end_time=NOW + 1200)
+        cache.aio.writes.clear()
+        assert await MessageStore.aload_many([]) == []
+        stores = await MessageStore.aload_many([1, 2, 3])
+        assert [m.action for m in stores] == ['ban', 'delete', None]
+        assert stores[2].data == {}
+        assert await MessageStore.aflush_many(stores) == 0
+        # Each store is written with it's own TTL
+        for m in stores:
+            m.dirty.add('reason')
+            m.data['reason'] = 'spam'
+        assert await MessageStore.aflush_many(stores) == 3
+        assert sorted((k, t) for k, _, t in cache.aio.writes) == [
+            ('aprv:message:1', 600 + settings.MESSAGE_STORE_GRACE),
+            ('aprv:message:2', 1200 + settings.MESSAGE_STORE_GRACE),
+            ('aprv:message:3', settings.DEFAULT_APPROVAL_END + settings.MESSAGE_STORE_GRACE),
+        ]
+        assert not any(m.dirty for m in stores)
+    asyncio.run(main())
+    assert cache.writes == []
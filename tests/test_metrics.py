@@ -0,0 +1,131 @@
+import asyncio
+import socket
+import pytest
+from approvalbot import metrics
+from approvalbot.metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    """Keep the metrics created by a test out of the bot's registry"""
+    saved = list(metrics.REGISTRY)
+    yield
+    metrics.REGISTRY[:] = saved
+
+
+def samples(metric) -> dict:
+    """The metric's rendered ``name{labels} value`` lines, as a dict"""
+    lines = [line for line in metric.render().splitlines() if not line.startswith('#')]
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1]) for line in lines}
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram('test_seconds', "Test", ['step'], buckets=(0.5, 0.1, 1.0))
+    assert h.buckets == (0.1, 0.5, 1.0)
+    # Observations on a bucket's bound are counted in that bucket (le = less than or equal)
+    for v in (0.05, 0.1, 0.3, 0.5, 0.7, 2.0, 5.0):
+        h.observe(v, 'load')
+    h.observe(0.2, 'save')
+    assert samples(h) == {
+        'test_seconds_bucket{step="load",le="0.1"}': 2,
+        'test_seconds_bucket{step="load",le="0.5"}': 4,
+        'test_seconds_bucket{step="load",le="1.0"}': 5,
+        'test_seconds_bucket{step="load",le="+Inf"}': 7,
+        'test_seconds_sum{step="load"}': pytest.approx(8.65),
+        'test_seconds_count{step="load"}': 7,
+        'test_seconds_bucket{step="save",le="0.1"}': 0,
+        'test_seconds_bucket{step="save",le="0.5"}': 1,
+        'test_seconds_bucket{step="save",le="1.0"}': 1,
+        'test_seconds_bucket{step="save",le="+Inf"}': 1,
+        'test_seconds_sum{step="save"}': pytest.approx(0.2),
+        'test_seconds_count{step="save"}': 1,
+    }
+
+
+def test_render_format():
+    c = Counter('test_votes_total', "Votes", ['choice'])
+    c.inc('approve')
+    c.inc('approve', amount=2)
+    c.inc('disapprove')
+    unlabelled = Counter('test_polls_total', "Polls")
+    g = Gauge('test_queue_depth', "Queue")
+    g.set(3)
+    assert c.render().splitlines() == [
+        '# HELP test_votes_total Votes', '# TYPE test_votes_total counter',
+        'test_votes_total{choice="approve"} 3', 'test_votes_total{choice="disapprove"} 1',
+    ]
+    # An unlabelled counter is reported as 0 before it's first incremented
+    assert samples(unlabelled) == {'test_polls_total': 0}
+    assert samples(g) == {'test_queue_depth': 3}
+    g.set_function(lambda: 7)
+    assert samples(g) == {'test_queue_depth': 7}
+
+    text = metrics.render()
+    assert text.endswith('\n')
+    assert '# TYPE test_votes_total counter' in text and '# TYPE approvalbot_votes_total counter' in text
+
+
+def test_timed():
+    h = Histogram('test_handler_seconds', "Test", ['handler'])
+
+    @metrics.timed(h, 'sync')
+    def sync():
+        return 1
+
+    @metrics.timed(h, 'async')
+    async def coro():
+        return 2
+
+    async def fail():
+        raise ValueError
+
+    assert sync() == 1
+    assert asyncio.run(coro()) == 2
+    with pytest.raises(ValueError):
+        asyncio.run(metrics.timed_call(h, 'fail', fail()))
+    counts = samples(h)
+    assert [counts[f'test_handler_seconds_count{{handler="{k}"}}'] for k in ('sync', 'async', 'fail')] == [1, 1, 1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def http(port: int, request: bytes):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    lines = head.decode().split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    assert int(headers['Content-Length']) == len(body)
+    return lines[0], body.decode()
+
+
+def test_http_handler():
+    Counter('test_scraped_total', "Scraped").inc()
+
+    async def main():
+        assert await metrics.start_server('127.0.0.1', 0) is None
+        port = free_port()
+        server = await metrics.start_server('127.0.0.1', port)
+        try:
+            assert await metrics.start_server('127.0.0.1', port) is server
+            status, body = await http(port, b'GET /metrics?x=1 HTTP/1.1\r\nHost: localhost\r\nAccept: */*\r\n\r\n')
+            assert status == 'HTTP/1.1 200 OK'
+            assert body == metrics.render()
+            assert 'test_scraped_total 1' in body.splitlines()
+
+            for request in (b'GET / HTTP/1.1\r\n\r\n', b'GET /metricsx HTTP/1.1\r\n\r\n',
+                            b'POST /metrics HTTP/1.1\r\n\r\n', b'garbage\r\n\r\n'):
+                status, body = await http(port, request)
+                assert status == 'HTTP/1.1 404 Not Found', request
+                assert 'metrics are served at /metrics' in body
+        finally:
+            await metrics.stop_server()
+        assert metrics._server is None
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from approvalbot import bot
+from approvalbot.core import guild_config
+from approvalbot.objects import Approval, ApprovalOutcome, VoteChoice
+
+APPROVE, DISAPPROVE = VoteChoice.APPROVE, VoteChoice.DISAPPROVE
+MODS = [f"Mod#000{i}" for i in range(1, 6)]
+
+
+@pytest.fixture
+def five_mods(bot_config):
+    """Server 7 has 5 moderators - so 3 votes are a majority"""
+    guild_config(7).moderators = list(MODS)
+    assert bot.get_majority_number(7) == 3
+
+
+def outcome(approvals: int, disapprovals: int, previous=ApprovalOutcome.AUTO) -> ApprovalOutcome:
+    aprv = Approval(message_id=100, approvals=approvals, disapprovals=disapprovals, outcome=previous, guild_id=7)
+    return bot.update_outcome(aprv).outcome
+
+
+@pytest.mark.parametrize('approvals, disapprovals, expected', [
+    (0, 0, ApprovalOutcome.UNKNOWN),
+    (1, 0, ApprovalOutcome.APPROVED_NO_MAJORITY),
+    (0, 1, ApprovalOutcome.DISAPPROVED_NO_MAJORITY),
+    (1, 1, ApprovalOutcome.TIE),
+    (2, 2, ApprovalOutcome.TIE),
+    (3, 0, ApprovalOutcome.APPROVED),
+    (3, 2, ApprovalOutcome.APPROVED),
+    (0, 3, ApprovalOutcome.DISAPPROVED),
+    (2, 3, ApprovalOutcome.DISAPPROVED),
+])
+def test_outcome_from_counts(five_mods, approvals, disapprovals, expected):
+    assert outcome(approvals, disapprovals) == expected
+
+
+@pytest.mark.parametrize('previous', [
+    ApprovalOutcome.APPROVED, ApprovalOutcome.APPROVED_NO_MAJORITY,
+    ApprovalOutcome.DISAPPROVED, ApprovalOutcome.DISAPPROVED_NO_MAJORITY,
+])
+def test_previous_outcome_is_replaced(five_mods, previous):
+    assert outcome(1, 1, previous) == ApprovalOutcome.TIE
+    assert outcome(0, 0, previous) == ApprovalOutcome.UNKNOWN
+    assert outcome(2, 1, previous) == ApprovalOutcome.APPROVED_NO_MAJORITY
+
+
+def test_tie_after_switched_vote_is_finalized_as_tie(run_db, five_mods):
+    async def vote(aprv: Approval, user: str, choice: VoteChoice):
+        # The same steps as _process_votes
+        aprv.apply_vote(user, choice)
+        bot.update_outcome(aprv)
+        await aprv.save_votes([(user, choice)])
+
+    async def main():
+        aprv = Approval(
+            message_id=100, action='ban', url='https://example.com/@user/1', reason='spam', username='Mod#0001',
+            guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+        )
+        await aprv.save()
+        await vote(aprv, MODS[0], APPROVE)
+        assert aprv.outcome == ApprovalOutcome.APPROVED_NO_MAJORITY
+        await vote(aprv, MODS[1], DISAPPROVE)
+        assert (aprv.approvals, aprv.disapprovals) == (1, 1)
+        assert aprv.outcome == ApprovalOutcome.TIE
+
+        await bot._finalize_poll(aprv.id)
+        final = await Approval.from_db_id(aprv.id, cached=False)
+        assert final.finalized
+        assert final.outcome == ApprovalOutcome.TIE
+    run_db(main())
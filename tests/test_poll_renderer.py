@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from approvalbot import bot
+from approvalbot.objects import Approval
+
+
+def make_approval(id: int = 5, **kwargs) -> Approval:
+    data = dict(
+        id=id, message_id=100 + id, action='ban', url='https://mastodon.social/@john/1234', reason='spam',
+        username='Mod#0001', guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30)
+    )
+    data.update(kwargs)
+    return Approval(**data)
+
+
+def uncached(aprv: Approval) -> list:
+    embeds = bot.template_approve(
+        aprv.action, aprv.url, aprv.reason, aprv.username, aprv.approvals, aprv.disapprovals, aprv.end_time,
+        db_id=aprv.id
+    )
+    return [e._json for e in embeds]
+
+
+@pytest.mark.parametrize('approvals, disapprovals', [(0, 0), (1, 0), (0, 1), (3, 2), (12, 40)])
+def test_cached_render_matches_template(approvals, disapprovals):
+    renderer = bot.PollRenderer()
+    aprv = make_approval()
+    # Render once first, so the second render comes from the cached request embed / tally copies
+    renderer.votes_payload(aprv)
+    aprv.approvals, aprv.disapprovals = approvals, disapprovals
+    assert renderer.votes_payload(aprv) == dict(embeds=uncached(aprv))
+
+
+def test_request_embed_is_cached_per_approval():
+    renderer = bot.PollRenderer()
+    one, two = make_approval(5), make_approval(6, reason='abuse')
+    first = renderer.votes_payload(one)['embeds']
+    one.approvals = 1
+    second = renderer.votes_payload(one)['embeds']
+    assert second[0] is first[0]
+    assert renderer.votes_payload(two)['embeds'][0] == uncached(two)[0]
+    assert len(renderer) == 2
+
+    # Each render gets it's own copies of the tally embeds, so they can't change earlier payloads
+    assert second[1] is not first[1]
+    assert (first[1]['description'], second[1]['description']) == ('0', '1')
+
+    renderer.forget(5)
+    assert len(renderer) == 1
+    assert renderer.votes_payload(one)['embeds'][0] is not first[0]
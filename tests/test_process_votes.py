@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import sqlite3
+import pytest
+from approvalbot import bot
+from approvalbot.objects import APPROVAL_CACHE, Approval, ApprovalsDB, VoteChoice
+
+
+def click(user: str, choice: VoteChoice) -> bot.PendingVote:
+    return bot.PendingVote(ctx=None, auth=SimpleNamespace(user=user), choice=choice)
+
+
+async def make_approval(message_id: int = 100) -> Approval:
+    aprv = Approval(
+        message_id=message_id, action='ban', url=f'https://example.com/@user/{message_id}', reason='spam',
+        username='Mod#0001', guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+    )
+    await aprv.save()
+    return aprv
+
+
+def test_failed_save_drops_unsaved_votes(run_db, monkeypatch):
+    async def busy(self, *args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    async def main():
+        aprv = await make_approval()
+        await aprv.approve('a', save=False)
+        assert await Approval.from_db(100) is aprv
+
+        monkeypatch.setattr(ApprovalsDB, 'vote_many', busy)
+        with pytest.raises(sqlite3.OperationalError):
+            await bot._process_votes(100, [click('b', VoteChoice.APPROVE), click('c', VoteChoice.DISAPPROVE)])
+        monkeypatch.undo()
+
+        # The copy holding the unsaved votes is no longer cached, so the next batch sees what the DB has
+        assert APPROVAL_CACHE.get_msgid(100) is None
+        loaded = await Approval.from_db(100)
+        assert (loaded.approvals, loaded.disapprovals) == (1, 0)
+        assert loaded.approved_by == ['a'] and loaded.disapproved_by == []
+
+        # Votes saved after the failure are counted as usual
+        await loaded.approve('b', save=False)
+        assert (await Approval.from_db(100)).approved_by == ['a', 'b']
+    run_db(main())
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from approvalbot import bot
+from approvalbot.core import guild_config, CONFIG_WRITER
+from approvalbot.objects import RoleIndex
+
+MODS = ['Mod#0001', 'Mod#0002', 'Mod#0003']
+ADMINS = ['Admin#0001', 'Admin#0002']
+
+
+@pytest.mark.parametrize('mods, admins_can_vote, include_admins, eligible, majority', [
+    (0, True, True, 2, 2),
+    (1, True, True, 3, 2),
+    (3, True, True, 5, 3),
+    # Admins only count if they can vote, and majority_include_admins is on
+    (3, False, True, 3, 2),
+    (3, True, False, 3, 2),
+    (2, False, False, 2, 2),
+    (0, False, False, 0, 1),
+])
+def test_threshold(mods, admins_can_vote, include_admins, eligible, majority):
+    roles = RoleIndex(dict(
+        moderators=MODS[:mods], admins=ADMINS, admins_can_vote=admins_can_vote, majority_include_admins=include_admins
+    ))
+    assert (roles.eligible, roles.majority) == (eligible, majority)
+
+
+def test_lookups():
+    roles = RoleIndex(dict(moderators=MODS, admins=ADMINS + ['Mod#0001']))
+    assert roles.is_moderator('Mod#0002') and not roles.is_moderator('Admin#0001')
+    assert roles.is_admin('Admin#0002') and roles.is_admin('Mod#0001')
+    assert not roles.is_moderator('Someone#0001') and not roles.is_admin('Someone#0001')
+    # Someone who is both a moderator and an admin is only counted once
+    assert roles.mods_admins == frozenset(MODS + ADMINS)
+    # Missing / empty settings fall back to no moderators or admins
+    assert RoleIndex(dict(moderators=None)).eligible == 0
+
+
+def test_index_is_rebuilt_when_moderators_change(bot_config):
+    async def main():
+        cfg = guild_config(7)
+        cfg.moderators, cfg.admins, cfg.admins_can_vote = list(MODS), [], False
+        roles = bot.roles_for(7)
+        assert bot.roles_for('7') is roles
+        assert (bot.get_total_mods_admins_elig(7), bot.get_majority_number(7)) == (3, 2)
+
+        # Adding a moderator (the same way /add_mod does) raises the threshold
+        cfg.moderators.append('Mod#0004')
+        assert bot.get_majority_number(7) == 2, "the index is a snapshot until config_changed is called"
+        await bot.config_changed(7)
+        assert bot.roles_for(7) is not roles
+        assert bot.roles_for(7).is_moderator('Mod#0004')
+        assert (bot.get_total_mods_admins_elig(7), bot.get_majority_number(7)) == (4, 3)
+
+        # ... and removing two lowers it
+        cfg.moderators.remove('Mod#0004')
+        cfg.moderators.remove('Mod#0001')
+        await bot.config_changed(7)
+        assert not bot.roles_for(7).is_moderator('Mod#0001')
+        assert (bot.get_total_mods_admins_elig(7), bot.get_majority_number(7)) == (2, 2)
+        await CONFIG_WRITER.flush()
+    asyncio.run(main())
+
+
+def test_config_changed_only_drops_that_server(bot_config):
+    async def main():
+        guild_config(7).moderators = list(MODS)
+        guild_config(8).moderators = MODS[:1]
+        seven, eight = bot.roles_for(7), bot.roles_for(8)
+        await bot.config_changed(7)
+        assert bot.roles_for(8) is eight
+        assert bot.roles_for(7) is not seven
+        # No server ID - every server's index is rebuilt
+        await bot.config_changed()
+        assert bot.roles_for(8) is not eight
+        await CONFIG_WRITER.flush()
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+from approvalbot.objects import Approval, ApprovalsDB
+
+
+async def make_approval(message_id: int, reason: str, action: str = 'ban', url: str = None, guild_id: int = 7) -> int:
+    aprv = Approval(
+        message_id=message_id, action=action, url=url or f'https://example.com/@user/{message_id}', reason=reason,
+        username='Mod#0001', guild_id=guild_id, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+    )
+    await aprv.save()
+    return aprv.id
+
+
+async def search(adb: ApprovalsDB, text: str, **kwargs) -> list:
+    return [r['id'] for r in await adb.search_approvals(text, **kwargs)]
+
+
+def test_fts_query_quotes_words():
+    assert ApprovalsDB.fts_query('spam  https://example.com/@john') == '"spam" "https://example.com/@john"'
+    assert ApprovalsDB.fts_query('say "hi"') == '"say" """hi"""'
+    assert ApprovalsDB.fts_query('   ') == ''
+
+
+def test_index_follows_inserts_updates_and_deletes(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        spam = await make_approval(100, 'crypto spam bot', url='https://mastodon.social/@spammer/1')
+        abuse = await make_approval(101, 'abusive replies', action='silence')
+        # reason, action and url are all searchable
+        assert await search(adb, 'crypto') == [spam]
+        assert await search(adb, 'silence') == [abuse]
+        assert await search(adb, 'https://mastodon.social/@spammer/1') == [spam]
+        # Every word has to match
+        assert await search(adb, 'spam abusive') == []
+        # FTS5 operators are searched for as plain words
+        assert await search(adb, 'spam OR abusive') == []
+        assert await search(adb, 'NEAR(spam') == []
+        assert await search(adb, '') == []
+
+        await adb.update(spam, reason='phishing links')
+        assert await search(adb, 'crypto') == []
+        assert await search(adb, 'phishing') == [spam]
+        # Columns which aren't indexed can change without touching the index
+        await adb.update(spam, outcome='APPROVED')
+        assert await search(adb, 'phishing') == [spam]
+
+        await adb.action("DELETE FROM approvals WHERE id = ?;", [abuse])
+        assert await search(adb, 'abusive') == []
+        assert await search(adb, 'silence') == []
+        # The index is still consistent with the table
+        await adb.action("INSERT INTO approvals_fts (approvals_fts) VALUES ('integrity-check');")
+    run_db(main())
+
+
+def test_results_are_ranked_and_paged(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        weak = await make_approval(100, 'posted an advert for a shop along with lots of other unrelated text spam')
+        strong = await make_approval(101, 'spam spam spam')
+        middle = await make_approval(102, 'spam and more spam')
+        others = [await make_approval(103 + i, f'spam report number {i} with some extra words') for i in range(5)]
+        await make_approval(200, 'not a match')
+
+        ranked = await search(adb, 'spam', limit=100)
+        assert ranked[:2] == [strong, middle]
+        assert ranked[-1] == weak
+        assert sorted(ranked) == sorted([weak, strong, middle] + others)
+
+        pages = [await search(adb, 'spam', offset=offset, limit=3) for offset in range(0, 9, 3)]
+        assert [len(p) for p in pages] == [3, 3, 2]
+        assert [i for p in pages for i in p] == ranked
+        assert await search(adb, 'spam', offset=9, limit=3) == []
+    run_db(main())
+
+
+def test_search_by_server(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        ours = await make_approval(100, 'spam', guild_id=7)
+        theirs = await make_approval(101, 'spam', guild_id=8)
+        assert await search(adb, 'spam', guild_id=7) == [ours]
+        assert await search(adb, 'spam', guild_id=8) == [theirs]
+        assert sorted(await search(adb, 'spam')) == sorted([ours, theirs])
+    run_db(main())
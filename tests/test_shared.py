@@ -0,0 +1,210 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+import sys
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+from approvalbot import settings
+from approvalbot.core import guild_config
+from approvalbot.objects import Approval, ApprovalsDB, VoteChoice
+from approvalbot.shared import SharedState
+
+APPROVE, DISAPPROVE = VoteChoice.APPROVE, VoteChoice.DISAPPROVE
+
+
+def make_states(count: int = 2):
+    """``count`` SharedStates sharing one fake Redis server - like separate bot processes"""
+    server = fakeredis.FakeServer()
+    return [SharedState(fakeredis.FakeAsyncRedis(server=server), prefix='test') for _ in range(count)]
+
+
+async def close_all(states):
+    for s in states:
+        await s.close()
+
+
+def make_approval(**kwargs) -> Approval:
+    data = dict(
+        id=5, message_id=50, action='delete', url='https://mastodon.social/@john/1234', reason='spam',
+        username='Mod#0001', guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30)
+    )
+    data.update(kwargs)
+    return Approval(**data)
+
+
+def test_apply_votes_seeds_and_switches():
+    async def main():
+        state, = make_states(1)
+        aprv = make_approval(approved_by=['a'], disapproved_by=['b'], approvals=1, disapprovals=1)
+        changed = await state.apply_votes(aprv, [('b', APPROVE), ('c', DISAPPROVE)])
+        assert sorted(changed) == [('b', APPROVE), ('c', DISAPPROVE)]
+        assert (aprv.approvals, aprv.disapprovals) == (2, 1)
+        assert aprv.approved_by == ['a', 'b']
+        assert aprv.disapproved_by == ['c']
+        # Re-voting the same way changes nothing
+        assert await state.apply_votes(aprv, [('a', APPROVE)]) == []
+        await close_all([state])
+    asyncio.run(main())
+
+
+def test_apply_votes_saves_final_vote_only():
+    async def main():
+        state, = make_states(1)
+        aprv = make_approval()
+        changed = await state.apply_votes(aprv, [('a', APPROVE), ('a', DISAPPROVE), ('b', APPROVE)])
+        assert sorted(changed) == [('a', DISAPPROVE), ('b', APPROVE)]
+        assert (aprv.approvals, aprv.disapprovals) == (1, 1)
+        # Flip-flopping back to the stored vote within one batch isn't a change
+        assert await state.apply_votes(aprv, [('a', APPROVE), ('a', DISAPPROVE)]) == [('a', DISAPPROVE)]
+        await close_all([state])
+    asyncio.run(main())
+
+
+def test_apply_votes_keeps_voter_order():
+    async def main():
+        state, = make_states(1)
+        aprv = make_approval(approved_by=['z', 'm'], approvals=2)
+        await state.apply_votes(aprv, [('b', APPROVE), ('a', APPROVE)])
+        assert aprv.approved_by == ['z', 'm', 'a', 'b']
+        await close_all([state])
+    asyncio.run(main())
+
+
+def test_version_only_bumps_on_change():
+    async def main():
+        state, = make_states(1)
+        aprv = make_approval()
+        tally = state.key('tally', aprv.id)
+        await state.apply_votes(aprv, [])
+        assert int(await state.client.hget(tally, 'version')) == 0
+        await state.apply_votes(aprv, [('a', APPROVE)])
+        assert int(await state.client.hget(tally, 'version')) == 1
+        await state.apply_votes(aprv, [('a', APPROVE)])
+        assert int(await state.client.hget(tally, 'version')) == 1
+        await state.apply_votes(aprv, [('a', DISAPPROVE), ('b', APPROVE)])
+        assert int(await state.client.hget(tally, 'version')) == 2
+        await close_all([state])
+    asyncio.run(main())
+
+
+def test_claim_render():
+    async def main():
+        one, two = make_states()
+        aprv, stale = make_approval(), make_approval()
+        await one.apply_votes(aprv, [('a', APPROVE)])
+        await one.apply_votes(aprv, [('b', DISAPPROVE)])
+        # Each version of the tally is only rendered once, with the latest counts
+        assert await two.claim_render(stale)
+        assert (stale.approvals, stale.disapprovals) == (1, 1)
+        assert not await one.claim_render(aprv)
+        await one.apply_votes(aprv, [('c', APPROVE)])
+        assert await one.claim_render(aprv)
+        assert aprv.approvals == 2
+        assert not await two.claim_render(stale)
+        # A finalized poll isn't rendered again
+        await one.apply_votes(aprv, [('d', APPROVE)])
+        await one.forget(aprv.id)
+        assert not await two.claim_render(stale)
+        assert await one.client.exists(one.key('votes', aprv.id), one.key('tally', aprv.id)) == 0
+        await close_all([one, two])
+    asyncio.run(main())
+
+
+def test_concurrent_votes_from_two_processes(run_db):
+    voters = [f"User#{i:04d}" for i in range(12)]
+
+    async def vote(state: SharedState, aprv: Approval, votes, save_delay: float):
+        for voter, choice in votes:
+            async with state.voting(aprv, [(voter, choice)]) as changed:
+                # A slow DB write mustn't let the other process's later vote be saved before this one
+                await asyncio.sleep(save_delay)
+                await aprv.save_votes(changed)
+
+    async def main():
+        aprv = make_approval(id=None)
+        await aprv.save()
+        # Each process has it's own (soon stale) copy of the poll
+        copies = [Approval.from_dict(dict(aprv)).fix_fields() for _ in range(2)]
+        states = make_states()
+        # Both processes take opposite votes from every voter at the same time
+        first = [(v, APPROVE if i % 3 else DISAPPROVE) for i, v in enumerate(voters)]
+        second = [(v, DISAPPROVE if c == APPROVE else APPROVE) for v, c in first]
+        await asyncio.gather(vote(states[0], copies[0], first, 0.01), vote(states[1], copies[1], second, 0))
+        for state, copy in zip(states, copies):
+            await state.apply_votes(copy, [])
+
+        votes = await states[0].client.hgetall(states[0].key('votes', aprv.id))
+        votes = {k.decode(): v.decode() for k, v in votes.items()}
+        assert sorted(votes) == voters
+        approvals = sorted(v for v, c in votes.items() if c == 'approve')
+        disapprovals = sorted(v for v, c in votes.items() if c == 'disapprove')
+        for copy in copies:
+            assert (copy.approvals, copy.disapprovals) == (len(approvals), len(disapprovals))
+            assert sorted(copy.approved_by) == approvals
+            assert sorted(copy.disapproved_by) == disapprovals
+
+        rows = await ApprovalsDB().fetchall("SELECT voter_id, choice FROM votes WHERE approval_id = ?;", [aprv.id])
+        assert {r['voter_id']: r['choice'] for r in rows} == votes
+        row = await ApprovalsDB().find_approval(aprv.id)
+        assert (row['approvals'], row['disapprovals']) == (len(approvals), len(disapprovals))
+        await close_all(states)
+    run_db(main())
+
+
+def test_claim_finalize_is_exclusive():
+    async def main():
+        one, two = make_states()
+        assert await one.claim_finalize(5)
+        assert not await two.claim_finalize(5)
+        assert not await one.claim_finalize(5)
+        assert await two.claim_finalize(6)
+        assert 0 < await one.client.ttl(one.key('finalizing', 5)) <= 60
+        await close_all([one, two])
+    asyncio.run(main())
+
+
+def test_config_and_poll_messages():
+    old_config = settings.CONFIG
+
+    async def main():
+        one, two = make_states()
+        changed, polls, own = [], [], []
+
+        async def on_change(guild_id):
+            changed.append(guild_id)
+
+        await two.listen(on_change, lambda i, t: polls.append((i, t)))
+        await one.listen(lambda g: own.append(g), lambda i, t: own.append(i))
+        await asyncio.sleep(0.1)
+
+        guild_config(7)['show_votes'] = True
+        await one.publish_config(7)
+        await one.announce_poll(5, 1234.5)
+        for _ in range(50):
+            if changed and polls:
+                break
+            await asyncio.sleep(0.02)
+        assert changed == [7]
+        assert polls == [(5, 1234.5)]
+        # A process ignores the messages it published itself
+        assert own == []
+
+        guild_config(7)['show_votes'] = False
+        assert await two.load_configs() == [7]
+        assert guild_config(7)['show_votes'] is True
+        assert not await two.load_config(8)
+        await close_all([one, two])
+
+    settings.CONFIG = dict(settings.CONFIG, guilds={})
+    try:
+        asyncio.run(main())
+    finally:
+        settings.CONFIG = old_config
+
+
+def test_missing_redis_package(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    with pytest.raises(ImportError, match='redis>=4.2'):
+        SharedState()
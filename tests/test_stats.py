@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+from approvalbot.objects import Approval, ApprovalsDB, VoteChoice
+
+APPROVE, DISAPPROVE = VoteChoice.APPROVE, VoteChoice.DISAPPROVE
+
+# Each summary table, and the query over approvals / votes which it must always match
+SUMMARIES = {
+    'stats_outcomes': (
+        "SELECT guild_id, outcome, total FROM stats_outcomes WHERE total != 0;",
+        "SELECT IFNULL(guild_id, 0) AS guild_id, outcome, COUNT(*) AS total FROM approvals "
+        "GROUP BY IFNULL(guild_id, 0), outcome;",
+    ),
+    'stats_daily': (
+        "SELECT guild_id, day, outcome, total FROM stats_daily WHERE total != 0;",
+        "SELECT IFNULL(guild_id, 0) AS guild_id, date(timestamp) AS day, outcome, COUNT(*) AS total FROM approvals "
+        "GROUP BY IFNULL(guild_id, 0), date(timestamp), outcome;",
+    ),
+    'stats_actions': (
+        "SELECT guild_id, action, outcome, total FROM stats_actions WHERE total != 0;",
+        "SELECT IFNULL(guild_id, 0) AS guild_id, IFNULL(action, '') AS action, outcome, COUNT(*) AS total "
+        "FROM approvals GROUP BY IFNULL(guild_id, 0), IFNULL(action, ''), outcome;",
+    ),
+    'stats_voters': (
+        "SELECT guild_id, voter_id, approvals, disapprovals FROM stats_voters WHERE approvals + disapprovals != 0;",
+        "SELECT IFNULL(a.guild_id, 0) AS guild_id, v.voter_id, SUM(v.choice = 'approve') AS approvals, "
+        "SUM(v.choice = 'disapprove') AS disapprovals FROM votes v JOIN approvals a ON a.id = v.approval_id "
+        "GROUP BY IFNULL(a.guild_id, 0), v.voter_id;",
+    ),
+}
+
+
+async def assert_summaries_match(adb: ApprovalsDB):
+    for table, (summary, expected) in SUMMARIES.items():
+        got = sorted(tuple(r.values()) for r in await adb.fetchall(summary))
+        want = sorted(tuple(r.values()) for r in await adb.fetchall(expected))
+        assert got == want, table
+
+
+async def make_approvals(adb: ApprovalsDB) -> list:
+    ids = []
+    for i, (guild, action) in enumerate([(7, 'ban'), (7, 'ban'), (7, 'delete'), (8, 'ban'), (None, 'silence')]):
+        aprv = Approval(
+            message_id=100 + i, action=action, url=f'https://example.com/@user/{i}', reason='spam',
+            username='Mod#0001', guild_id=guild, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+        )
+        await aprv.save()
+        ids.append(aprv.id)
+    return ids
+
+
+def test_summaries_follow_inserts_and_outcome_changes(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        ids = await make_approvals(adb)
+        await assert_summaries_match(adb)
+        assert (await adb.get_stats(7)).outcomes == {'TIE': 3}
+
+        await adb.update(ids[0], outcome='APPROVED')
+        await adb.update(ids[1], outcome='APPROVED_NO_MAJORITY')
+        await adb.update(ids[3], outcome='APPROVED')
+        await assert_summaries_match(adb)
+        # Changing it again moves it from the previous outcome, not the original one
+        await adb.update(ids[1], outcome='DISAPPROVED')
+        # Setting the same outcome again doesn't count it twice
+        await adb.update(ids[0], outcome='APPROVED')
+        await assert_summaries_match(adb)
+
+        stats = await adb.get_stats(7)
+        assert stats.outcomes == {'APPROVED': 1, 'DISAPPROVED': 1, 'TIE': 1}
+        assert {a['action']: (a['total'], a['approved']) for a in stats.actions} == {'ban': (2, 1), 'delete': (1, 0)}
+        assert (await adb.get_stats(8)).outcomes == {'APPROVED': 1}
+        assert (await adb.get_stats(None)).outcomes == {'TIE': 1}
+    run_db(main())
+
+
+def test_summaries_follow_votes(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        ids = await make_approvals(adb)
+        await adb.vote_many(ids[0], [('a', APPROVE), ('b', DISAPPROVE)])
+        await adb.vote_many(ids[1], [('a', APPROVE)])
+        await adb.vote_many(ids[3], [('a', DISAPPROVE)])
+        await assert_summaries_match(adb)
+        await adb.vote(ids[0], 'a', DISAPPROVE)
+        await adb.vote(ids[0], 'a', DISAPPROVE)
+        await adb.action("DELETE FROM votes WHERE approval_id = ? AND voter_id = ?;", [ids[1], 'a'])
+        await assert_summaries_match(adb)
+        voters = {v['voter_id']: (v['approvals'], v['disapprovals']) for v in (await adb.get_stats(7)).voters}
+        assert voters == {'a': (0, 1), 'b': (0, 1)}
+    run_db(main())
+
+
+def test_backfill_rebuilds_summaries(run_db):
+    async def main():
+        adb = ApprovalsDB()
+        ids = await make_approvals(adb)
+        await adb.vote_many(ids[0], [('a', APPROVE), ('b', DISAPPROVE)])
+        await adb.update(ids[0], outcome='APPROVED')
+        # e.g. the DB was edited by hand, without the triggers
+        for table in SUMMARIES:
+            await adb.action(f"DELETE FROM {table};")
+        await adb.action("INSERT INTO stats_outcomes (guild_id, outcome, total) VALUES (7, 'CANCELLED', 5);")
+        await adb.backfill_stats()
+        await assert_summaries_match(adb)
+    run_db(main())
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+import asyncio
+import json
+import logging
+import time
+import pytest
+from approvalbot import settings, tracing
+
+
+@pytest.fixture
+def slow_log_file(tmp_path, monkeypatch):
+    """Write the slow log to a temporary file - returns it's path"""
+    path = tmp_path / 'slow.jsonl'
+    monkeypatch.setattr(settings, 'SLOW_LOG_FILE', path)
+    monkeypatch.setattr(tracing, '_slow_logger', None)
+    yield path
+    logger = logging.getLogger('approvalbot.slowlog')
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+
+def test_nested_spans():
+    with tracing.trace('approve', 123, guild=7) as t:
+        assert tracing.current() is t
+        with tracing.span('outer'):
+            with tracing.span('inner'):
+                time.sleep(0.002)
+        tracing.annotate(user='Mod#0001')
+    assert tracing.current() is None
+    # Spans are added as they end, so the inner one comes first - and lies within the outer one
+    (inner, i_start, i_end), (outer, o_start, o_end) = t.spans
+    assert (inner, outer) == ('inner', 'outer')
+    assert o_start <= i_start < i_end <= o_end
+    assert t.start <= o_start and o_end <= t.end
+    assert t.attrs == dict(guild=7, user='Mod#0001')
+
+
+def test_span_without_trace_is_a_no_op():
+    with tracing.span('nothing'):
+        pass
+    tracing.annotate(user='Mod#0001')
+    assert tracing.current() is None
+
+
+def test_span_is_added_to_each_trace_in_a_batch():
+    clicks = [tracing.Trace('approve', i) for i in range(3)]
+    with tracing.trace('poll_edit', 99) as own:
+        with tracing.span('save', clicks):
+            pass
+    assert own.spans == []
+    assert [[s[0] for s in c.spans] for c in clicks] == [['save'], ['save'], ['save']]
+    # The batch shares one timing
+    assert len({c.spans[0][1:] for c in clicks}) == 1
+    # An empty batch records nothing
+    with tracing.span('save', []):
+        pass
+
+
+def test_concurrent_traces_stay_separate():
+    async def handler(ctx, delay):
+        await asyncio.sleep(delay)
+        with tracing.span(f'step-{ctx.id}'):
+            await asyncio.sleep(delay)
+        return tracing.current()
+
+    async def main():
+        wrapped = tracing.traced('approve')(handler)
+        return await asyncio.gather(
+            wrapped(SimpleNamespace(id=1, guild_id=7), 0.02), wrapped(SimpleNamespace(id=2, guild_id=8), 0.01)
+        )
+
+    one, two = asyncio.run(main())
+    assert (one.id, one.attrs, [s[0] for s in one.spans]) == (1, dict(guild=7), ['step-1'])
+    assert (two.id, two.attrs, [s[0] for s in two.spans]) == (2, dict(guild=8), ['step-2'])
+
+
+def test_slow_traces_are_logged_as_json(slow_log_file, monkeypatch):
+    monkeypatch.setattr(settings, 'SLOW_LOG_MS', 20)
+    with tracing.trace('approve', 123, guild=7):
+        with tracing.span('db_load'):
+            pass
+    assert not slow_log_file.exists(), "the file is only created once something is slow"
+
+    with tracing.trace('approve', 456, guild=7) as t:
+        with tracing.span('db_load'):
+            time.sleep(0.03)
+        tracing.annotate(user='Mod#0001')
+    lines = slow_log_file.read_text().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry['trace'] == 'approve' and entry['id'] == '456'
+    assert entry['attrs'] == dict(guild=7, user='Mod#0001')
+    assert entry['total_ms'] == pytest.approx(t.total_ms, abs=0.001) and entry['total_ms'] >= 20
+    span, = entry['spans']
+    assert span['name'] == 'db_load' and span['ms'] >= 30 and 0 <= span['start_ms'] <= entry['total_ms']
+    assert entry['ts'].endswith('+00:00')
+
+
+def test_slow_log_disabled(slow_log_file, monkeypatch):
+    monkeypatch.setattr(settings, 'SLOW_LOG_MS', 0)
+    with tracing.trace('approve', 123):
+        time.sleep(0.005)
+    assert not slow_log_file.exists()
@@ -0,0 +1,72 @@
+from approvalbot.objects import TTLCache
+
+
+def test_get_set(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    assert c.get('a') is None
+    assert c.get('a', 'default') == 'default'
+    c.set('a', 1)
+    assert c.get('a') == 1
+    assert 'a' in c and 'b' not in c
+
+
+def test_expiry(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set('a', 1)
+    c.set('b', 2, ttl=120)
+    clock.advance(59.9)
+    assert c.get('a') == 1
+    clock.advance(0.1)
+    assert c.get('a') is None
+    assert 'a' not in c
+    assert c.get('b') == 2
+    clock.advance(60)
+    assert c.get('b') is None
+    assert len(c) == 0
+
+
+def test_set_refreshes_expiry(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set('a', 1)
+    clock.advance(50)
+    c.set('a', 2)
+    clock.advance(50)
+    assert c.get('a') == 2
+
+
+def test_lru_eviction(clock):
+    c = TTLCache(maxsize=3, ttl=60)
+    for k in 'abc':
+        c.set(k, k)
+    # Reading 'a' makes 'b' the least recently used entry
+    assert c.get('a') == 'a'
+    c.set('d', 'd')
+    assert len(c) == 3
+    assert 'b' not in c
+    assert all(k in c for k in 'acd')
+
+
+def test_falsy_values_are_cached(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set((1, 2), False)
+    assert (1, 2) in c
+    assert c.get((1, 2), 'missing') is False
+
+
+def test_remove(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set('a', 1)
+    assert c.remove('a') is True
+    assert c.remove('a') is False
+    assert c.get('a') is None
+
+
+def test_remove_where(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    for guild, user in [(1, 10), (1, 11), (2, 10)]:
+        c.set((guild, user), True)
+    assert c.remove_where(lambda k: k[0] == 1) == 2
+    assert (1, 10) not in c and (1, 11) not in c
+    assert (2, 10) in c
+    c.clear()
+    assert len(c) == 0
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from approvalbot.objects import VoteDispatcher
+
+
+class Recorder:
+    """A VoteDispatcher handler which records each batch, and how many batches ran at once"""
+    def __init__(self, delay: float = 0.01, fail_on=None):
+        self.batches, self.running, self.max_running = [], 0, 0
+        self.delay, self.fail_on = delay, fail_on
+
+    async def __call__(self, msg_id, batch):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            self.batches.append((msg_id, list(batch)))
+            if self.fail_on is not None and self.fail_on in batch:
+                raise ValueError(f"failed on {self.fail_on}")
+            return len(self.batches)
+        finally:
+            self.running -= 1
+
+
+def test_order_preserved_and_batched():
+    async def main():
+        rec = Recorder()
+        d = VoteDispatcher(rec)
+        await asyncio.gather(*[d.submit(1, i) for i in range(20)])
+        votes = [v for _, batch in rec.batches for v in batch]
+        assert votes == list(range(20))
+        # Votes which queued up while the first batch was running were handled together
+        assert len(rec.batches) < 20
+        assert d.active == 0
+    asyncio.run(main())
+
+
+def test_batches_for_one_message_never_overlap():
+    async def main():
+        rec = Recorder()
+        d = VoteDispatcher(rec)
+
+        async def clicks(start):
+            for i in range(start, start + 5):
+                await d.submit(1, i)
+        await asyncio.gather(*[clicks(n * 10) for n in range(5)])
+        assert rec.max_running == 1
+        assert sorted(v for _, b in rec.batches for v in b) == sorted(n * 10 + i for n in range(5) for i in range(5))
+    asyncio.run(main())
+
+
+def test_messages_are_processed_concurrently():
+    async def main():
+        rec = Recorder(delay=0.05)
+        d = VoteDispatcher(rec)
+        await asyncio.gather(d.submit(1, 'a'), d.submit(2, 'b'), d.submit(3, 'c'))
+        assert rec.max_running == 3
+    asyncio.run(main())
+
+
+def test_submit_returns_handler_result():
+    async def main():
+        d = VoteDispatcher(Recorder())
+        assert await d.submit(1, 'a') == 1
+    asyncio.run(main())
+
+
+def test_exception_in_batch_does_not_stop_worker():
+    async def main():
+        rec = Recorder(fail_on='bad')
+        d = VoteDispatcher(rec)
+        first = asyncio.ensure_future(d.submit(1, 'first'))
+        await asyncio.sleep(0)
+        # Both of these queue up behind 'first', so they're handled (and fail) as one batch
+        bad = asyncio.ensure_future(d.submit(1, 'bad'))
+        same_batch = asyncio.ensure_future(d.submit(1, 'same_batch'))
+        assert await first == 1
+        # Queued while the failing batch is running, so it's handled by the same consumer task
+        assert d.active == 1
+        after = asyncio.ensure_future(d.submit(1, 'after'))
+        with pytest.raises(ValueError):
+            await bad
+        with pytest.raises(ValueError):
+            await same_batch
+        assert await after == 3
+        assert [b for _, b in rec.batches] == [['first'], ['bad', 'same_batch'], ['after']]
+        assert d.active == 0
+    asyncio.run(main())
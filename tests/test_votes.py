@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+import sqlite3
+from approvalbot import settings
+from approvalbot.objects import Approval, ApprovalsDB, VoteChoice
+
+APPROVE, DISAPPROVE = VoteChoice.APPROVE, VoteChoice.DISAPPROVE
+
+
+async def make_approval(message_id: int = 100) -> Approval:
+    aprv = Approval(
+        message_id=message_id, action='ban', url=f'https://example.com/@user/{message_id}', reason='spam',
+        username='Mod#0001', guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+    )
+    await aprv.save()
+    return aprv
+
+
+async def counters(adb: ApprovalsDB, approval_id: int) -> tuple:
+    row = await adb.fetchone("SELECT approvals, disapprovals FROM approvals WHERE id = ?;", [approval_id])
+    return row['approvals'], row['disapprovals']
+
+
+async def votes(adb: ApprovalsDB, approval_id: int) -> dict:
+    rows = await adb.fetchall("SELECT voter_id, choice FROM votes WHERE approval_id = ?;", [approval_id])
+    return {r['voter_id']: r['choice'] for r in rows}
+
+
+def test_changed_vote_moves_between_counters(run_db):
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        await adb.vote(aprv.id, 'a', APPROVE)
+        await adb.vote(aprv.id, 'b', APPROVE)
+        assert await counters(adb, aprv.id) == (2, 0)
+        await adb.vote(aprv.id, 'a', DISAPPROVE)
+        assert await counters(adb, aprv.id) == (1, 1)
+        assert await votes(adb, aprv.id) == {'a': 'disapprove', 'b': 'approve'}
+        # Removing a vote takes it back off it's counter
+        await adb.action("DELETE FROM votes WHERE approval_id = ? AND voter_id = ?;", [aprv.id, 'b'])
+        assert await counters(adb, aprv.id) == (0, 1)
+    run_db(main())
+
+
+def test_repeated_vote_is_a_no_op(run_db):
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        assert await adb.vote(aprv.id, 'a', APPROVE) == 1
+        assert await adb.vote(aprv.id, 'a', APPROVE) == 0
+        assert await adb.vote_many(aprv.id, [('a', APPROVE), ('b', DISAPPROVE)]) == 1
+        assert await counters(adb, aprv.id) == (1, 1)
+        rows = await adb.fetchall("SELECT id FROM votes WHERE approval_id = ?;", [aprv.id])
+        assert len(rows) == 2
+    run_db(main())
+
+
+def test_legacy_votes_are_migrated(run_db):
+    # A DB from before the votes table - only the original approvals table, with the votes in JSON columns
+    with sqlite3.connect(str(settings.APPROVAL_DB)) as conn:
+        conn.execute(dict(ApprovalsDB.SCHEMAS)['approvals'])
+        conn.execute(
+            "INSERT INTO approvals (message_id, action, url, reason, username, approvals, disapprovals, "
+            "approved_by, disapproved_by) VALUES (100, 'ban', 'https://example.com/@user/1', 'spam', 'Mod#0001', "
+            "2, 1, '[\"a\", \"b\"]', '[\"c\"]');"
+        )
+        conn.execute(
+            "INSERT INTO approvals (message_id, action, url, reason, username) "
+            "VALUES (101, 'ban', 'https://example.com/@user/2', 'spam', 'Mod#0001');"
+        )
+    conn.close()
+
+    async def main():
+        adb = ApprovalsDB()
+        aprv = await Approval.from_db(100)
+        assert await votes(adb, aprv.id) == {'a': 'approve', 'b': 'approve', 'c': 'disapprove'}
+        # The counters already included these votes, so the migration mustn't add them again
+        assert await counters(adb, aprv.id) == (2, 1)
+        assert aprv.approved_by == ['a', 'b'] and aprv.disapproved_by == ['c']
+        assert await votes(adb, (await Approval.from_db(101)).id) == {}
+        # New votes are counted by the triggers as usual
+        await adb.vote(aprv.id, 'c', APPROVE)
+        assert await counters(adb, aprv.id) == (3, 0)
+    run_db(main())
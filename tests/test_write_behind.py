@@ -0,0 +1,155 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import asyncio
+import sqlite3
+import pytest
+from approvalbot import settings
+from approvalbot.objects import Approval, ApprovalsDB
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    """Enable write-behind mode, with a timer long enough that only the tests' own flushes run"""
+    monkeypatch.setattr(settings, 'APPROVAL_DB_WRITE_BEHIND', True)
+    monkeypatch.setattr(settings, 'APPROVAL_DB_WRITE_BEHIND_MS', 60000)
+    monkeypatch.setattr(settings, 'APPROVAL_DB_WRITE_BEHIND_ROWS', 100)
+    yield
+    ApprovalsDB._pending_updates.clear()
+    ApprovalsDB._flush_tasks.clear()
+
+
+def saved_row(approval_id: int) -> dict:
+    """Read a row through a separate connection - so only what's been committed is seen, without flushing"""
+    with sqlite3.connect(str(settings.APPROVAL_DB)) as conn:
+        conn.row_factory = sqlite3.Row
+        row = dict(conn.execute("SELECT * FROM approvals WHERE id = ?;", [approval_id]).fetchone())
+    conn.close()
+    return row
+
+
+async def make_approval(message_id: int = 100) -> Approval:
+    aprv = Approval(
+        message_id=message_id, action='ban', url=f'https://example.com/@user/{message_id}', reason='spam',
+        username='Mod#0001', guild_id=7, end_time=datetime.now(timezone.utc) + timedelta(minutes=30),
+    )
+    await aprv.save()
+    return aprv
+
+
+def pending(adb: ApprovalsDB) -> dict:
+    return ApprovalsDB._pending_updates.get(adb.db, {})
+
+
+def test_updates_to_one_row_are_merged(run_db, write_behind):
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        before = saved_row(aprv.id)
+        assert await adb.update(aprv.id, outcome='TIE') == 0
+        await adb.update(aprv.id, total_all_mods=4)
+        await adb.update(aprv.id, outcome='APPROVED')
+        assert pending(adb) == {aprv.id: {'outcome': 'APPROVED', 'total_all_mods': 4}}
+        assert saved_row(aprv.id) == before
+
+        assert await adb.flush_updates() == 1
+        assert pending(adb) == {}
+        row = saved_row(aprv.id)
+        assert (row['outcome'], row['total_all_mods']) == ('APPROVED', 4)
+    run_db(main())
+
+
+def test_reads_see_pending_updates(run_db, write_behind):
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        await adb.update(aprv.id, outcome='DISAPPROVED')
+        assert (await adb.find_approval(aprv.id))['outcome'] == 'DISAPPROVED'
+        assert pending(adb) == {}
+        assert saved_row(aprv.id)['outcome'] == 'DISAPPROVED'
+    run_db(main())
+
+
+def test_full_queue_is_flushed_immediately(run_db, write_behind, monkeypatch):
+    monkeypatch.setattr(settings, 'APPROVAL_DB_WRITE_BEHIND_ROWS', 2)
+
+    async def main():
+        adb, one, two = ApprovalsDB(), await make_approval(100), await make_approval(101)
+        before = saved_row(one.id)
+        await adb.update(one.id, outcome='CANCELLED')
+        assert saved_row(one.id) == before
+        await adb.update(two.id, outcome='CANCELLED')
+        assert pending(adb) == {}
+        assert saved_row(one.id)['outcome'] == saved_row(two.id)['outcome'] == 'CANCELLED'
+    run_db(main())
+
+
+def test_timer_flushes_queue(run_db, write_behind, monkeypatch):
+    monkeypatch.setattr(settings, 'APPROVAL_DB_WRITE_BEHIND_MS', 10)
+
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        await adb.update(aprv.id, outcome='TIE')
+        await asyncio.sleep(0.1)
+        assert pending(adb) == {}
+        assert saved_row(aprv.id)['outcome'] == 'TIE'
+    run_db(main())
+
+
+def test_failed_flush_is_requeued(run_db, write_behind, monkeypatch):
+    real_transaction = ApprovalsDB.transaction
+
+    @asynccontextmanager
+    async def busy(self):
+        # An update made while the flush is running takes priority over the one being flushed
+        await ApprovalsDB.update(self, aprv.id, outcome='DISAPPROVED')
+        raise sqlite3.OperationalError('database is locked')
+        yield
+
+    async def main():
+        nonlocal aprv
+        adb = ApprovalsDB()
+        aprv = await make_approval()
+        await adb.update(aprv.id, outcome='APPROVED', total_all_mods=4)
+
+        monkeypatch.setattr(ApprovalsDB, 'transaction', busy)
+        with pytest.raises(sqlite3.OperationalError):
+            await adb.flush_updates()
+        monkeypatch.setattr(ApprovalsDB, 'transaction', real_transaction)
+        assert pending(adb) == {aprv.id: {'outcome': 'DISAPPROVED', 'total_all_mods': 4}}
+        assert await adb.flush_updates() == 1
+        row = saved_row(aprv.id)
+        assert (row['outcome'], row['total_all_mods']) == ('DISAPPROVED', 4)
+
+    aprv = None
+    run_db(main())
+
+
+def test_failed_timer_flush_is_retried(run_db, write_behind, monkeypatch):
+    monkeypatch.setattr(settings, 'APPROVAL_DB_WRITE_BEHIND_MS', 10)
+    real_transaction, failures = ApprovalsDB.transaction, []
+
+    def busy_once(self):
+        if not failures:
+            failures.append(1)
+            raise sqlite3.OperationalError('database is locked')
+        return real_transaction(self)
+
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        monkeypatch.setattr(ApprovalsDB, 'transaction', busy_once)
+        await adb.update(aprv.id, outcome='TIE')
+        await asyncio.sleep(0.2)
+        assert failures == [1]
+        assert pending(adb) == {}
+        assert saved_row(aprv.id)['outcome'] == 'TIE'
+    run_db(main())
+
+
+def test_shutdown_flushes_queue(run_db, write_behind):
+    async def main():
+        adb, aprv = ApprovalsDB(), await make_approval()
+        await adb.update(aprv.id, outcome='TIE')
+        assert adb.db in ApprovalsDB._flush_tasks
+        await ApprovalsDB.close_connections()
+        assert ApprovalsDB._flush_tasks == {} and pending(adb) == {}
+        return aprv.id
+
+    assert saved_row(run_db(main()))['outcome'] == 'TIE'